@@ -23,6 +23,21 @@ CHECKSUM_CHOICES = (
     (CHECKSUM_TYPES.SHA512, CHECKSUM_TYPES.SHA512)
 )
 
+COMPRESSION_TYPES = SimpleNamespace(
+    GZ='gz',
+    XZ='xz',
+    ZSTD='zstd',
+    NONE='none',
+)
+
+# The same as above, but in a format that choice fields can use
+COMPRESSION_CHOICES = (
+    (COMPRESSION_TYPES.GZ, COMPRESSION_TYPES.GZ),
+    (COMPRESSION_TYPES.XZ, COMPRESSION_TYPES.XZ),
+    (COMPRESSION_TYPES.ZSTD, COMPRESSION_TYPES.ZSTD),
+    (COMPRESSION_TYPES.NONE, COMPRESSION_TYPES.NONE),
+)
+
 CR_PACKAGE_ATTRS = SimpleNamespace(
     ARCH='arch',
     CHANGELOGS='changelogs',
@@ -62,7 +77,10 @@ CR_PACKAGE_ATTRS = SimpleNamespace(
 )
 
 PACKAGE_REPODATA = ['primary', 'filelists', 'other']
+PACKAGE_ZCK_REPODATA = ['primary_zck', 'filelists_zck', 'other_zck']
 PACKAGE_DB_REPODATA = ['primary_db', 'filelists_db', 'other_db']
+# package repodata which is kept when files and changelogs of packages are deferred
+DEFERRED_DETAILS_REPODATA = ['filelists', 'other']
 UPDATE_REPODATA = ['updateinfo']
 MODULAR_REPODATA = ['modules']
 COMPS_REPODATA = ['group']
@@ -5,6 +5,7 @@ import os
 import solv
 
 from pulp_rpm.app import models
+from pulp_rpm.app.package_details import fill_package_details
 
 
 logger = logging.getLogger(__name__)
@@ -665,6 +666,7 @@ class Solver:
         package_ids = repo_version.content.filter(
             pulp_type=models.Package.get_pulp_type()
         ).only('pk')
+        fill_package_details(models.Package.objects.filter(pk__in=package_ids))
 
         nonmodular_rpms = models.Package.objects.filter(
             pk__in=package_ids, is_modular=False
@@ -1,9 +1,15 @@
+import asyncio
+import time
+
+from gettext import gettext as _
 from logging import getLogger
 from urllib.parse import urljoin
 
-from aiohttp.client_exceptions import ClientResponseError
+from aiohttp import ClientTimeout
+from aiohttp.client_exceptions import ClientError
 
-from pulpcore.plugin.download import HttpDownloader
+from pulpcore.plugin.download import DownloadResult, HttpDownloader
+from pulpcore.plugin.exceptions import DigestValidationError, SizeValidationError
 
 
 log = getLogger(__name__)
@@ -12,9 +18,27 @@ log = getLogger(__name__)
 class RpmDownloader(HttpDownloader):
     """
     Custom Downloader that automatically handles authentication token for SLES repositories.
+
+    It can also send conditional requests, if HTTP validators of a previous response are provided.
+    When a server responds that the resource hasn't been modified, nothing is downloaded and the
+    `path` of the returned result is None.
+
+    The time it took the server to respond is stored in `latency`.
+
+    If `mirrors` and `location_href` are passed in `extra_data`, the file is downloaded from the
+    mirrors instead of the `url`. Each mirror is tried by a new downloader with the same options,
+    so that nothing of a failed download is left in the next one. When a download from a mirror
+    fails, e.g. the connection is lost or the digest of the file doesn't match, the file is
+    downloaded from the next one.
+
+    If a `byte_range` tuple of the first and the last byte is provided, only that part of the file
+    is downloaded.
+
+    If a `timeout` in seconds is provided, each request fails with `asyncio.TimeoutError` when it
+    doesn't complete in time, instead of the timeouts of the session of the remote.
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, url, *args, **kwargs):
         """
         Initialize the downloader.
         """
@@ -22,7 +46,24 @@ class RpmDownloader(HttpDownloader):
             self.sles_auth_token = kwargs.pop('sles_auth_token')
         else:
             self.sles_auth_token = None
-        super().__init__(*args, **kwargs)
+        self.validators = kwargs.pop('validators', None) or {}
+        self.byte_range = kwargs.pop('byte_range', None)
+        self.timeout = kwargs.pop('timeout', None)
+        self.latency = None
+        # options of the downloaders of mirrors
+        self._args = args
+        self._options = dict(
+            kwargs, validators=self.validators, byte_range=self.byte_range, timeout=self.timeout
+        )
+        super().__init__(url, *args, **kwargs)
+
+    def _with_auth_token(self, url):
+        """
+        Add the SLES authentication token to a URL, if there is one.
+        """
+        if self.sles_auth_token:
+            return urljoin(url, f'?{self.sles_auth_token}')
+        return url
 
     async def _run(self, extra_data=None):
         """
@@ -32,21 +73,90 @@ class RpmDownloader(HttpDownloader):
         :meth:`~pulpcore.plugin.download.BaseDownloader._run`.
 
         """
-        if self.sles_auth_token:
-            auth_param = f'?{self.sles_auth_token}'
-            url = urljoin(self.url, auth_param)
+        extra_data = extra_data or {}
+        if extra_data.get('mirrors'):
+            to_return = await self._download_from_mirrors(
+                extra_data['mirrors'], extra_data['location_href']
+            )
         else:
-            url = self.url
+            headers = {}
+            if self.validators.get('etag'):
+                headers['If-None-Match'] = self.validators['etag']
+            if self.validators.get('last_modified'):
+                headers['If-Modified-Since'] = self.validators['last_modified']
+            if self.byte_range:
+                headers['Range'] = 'bytes={}-{}'.format(*self.byte_range)
+            to_return = await self._download(self._with_auth_token(self.url), headers)
+
+        if self._close_session_on_finalize:
+            await self.session.close()
+        return to_return
 
-        async with self.session.get(url) as response:
+    async def _download_from_mirrors(self, mirrors, location_href):
+        """
+        Download the file from the first mirror which doesn't fail.
+
+        This downloader already holds a slot of the download concurrency of the remote, so the
+        downloaders of the mirrors don't wait for another one.
+
+        Args:
+            mirrors (list): URLs of the mirrors, the first one is tried first
+            location_href (str): the location of the file relative to a mirror
+
+        Returns:
+            :class:`~pulpcore.plugin.download.DownloadResult`
+
+        """
+        for index, mirror in enumerate(mirrors, start=1):
+            url = self._with_auth_token(urljoin(mirror, location_href))
+            options = dict(self._options, semaphore=asyncio.Semaphore())
+            downloader = self.__class__(url, *self._args, **options)
             try:
-                response.raise_for_status()
-            except ClientResponseError:
-                raise
-            to_return = await self._handle_response(response)
+                result = await downloader.run()
+            except (
+                ClientError, asyncio.TimeoutError, DigestValidationError, SizeValidationError
+            ) as exc:
+                if index == len(mirrors):
+                    raise
+                log.warning(_("Failed to download {url}, trying another mirror: {exc}").format(
+                    url=url, exc=str(exc) or exc.__class__.__name__
+                ))
+            else:
+                self.latency = downloader.latency
+                self.response_headers = downloader.response_headers
+                return result._replace(url=self.url)
+
+    async def _download(self, url, headers):
+        """
+        Download the file from one url.
+
+        Args:
+            url (str): URL of the file
+            headers (dict): Headers of the request
+
+        Returns:
+            :class:`~pulpcore.plugin.download.DownloadResult`
+
+        """
+        self._receiving = False
+        options = {'headers': headers}
+        if self.timeout:
+            options['timeout'] = ClientTimeout(total=self.timeout)
+        start = time.monotonic()
+        async with self.session.get(url, **options) as response:
+            self.latency = time.monotonic() - start
+            response.raise_for_status()
+            if response.status == 304:
+                # the resource has not changed, there is nothing to download
+                to_return = DownloadResult(
+                    url=self.url, artifact_attributes={}, path=None, headers=response.headers
+                )
+            elif self.byte_range and response.status != 206:
+                raise ValueError(
+                    _("{url} does not support range requests").format(url=response.url)
+                )
+            else:
+                to_return = await self._handle_response(response)
             await response.release()
             self.response_headers = response.headers
-
-        if self._close_session_on_finalize:
-            self.session.close()
         return to_return
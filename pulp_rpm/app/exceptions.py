@@ -43,3 +43,25 @@ class DistributionTreeConflict(PulpException):
         Return a message for the exception.
         """
         return self.msg
+
+
+class PackageDetailsNotAvailable(PulpException):
+    """
+    Raised when files and changelogs of packages can't be filled in from the synced metadata.
+    """
+
+    def __init__(self, msg):
+        """
+        Set the exception identifier.
+
+        Args:
+            msg(str): Detailed message about the packages which details are not available
+        """
+        super().__init__("RPM0003")
+        self.msg = msg
+
+    def __str__(self):
+        """
+        Return a message for the exception.
+        """
+        return self.msg
@@ -0,0 +1,183 @@
+import json
+import resource
+import time
+
+from contextlib import contextmanager
+
+from pulpcore.plugin.models import ProgressReport
+
+
+def cpu_time():
+    """
+    Return the CPU time of the process and of its child processes which have finished.
+
+    Returns:
+        float: the user and system CPU time in seconds
+
+    """
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def current_rss():
+    """
+    Return the resident set size of the process.
+
+    Returns:
+        int: the resident set size in kilobytes
+
+    """
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize() // 1024
+
+
+class PhaseMetrics:
+    """
+    Wall time, CPU time, RSS and throughput of a phase of a task.
+
+    A phase can be measured several times, e.g. once per batch of content, the measurements are
+    summed up.
+
+    The RSS of the worker is sampled when each measurement starts and stops. The largest sample
+    and the sum of the increases between the samples are reported, child processes are left out.
+
+    The CPU time is the one of the whole worker process while the phase is measured, together
+    with the CPU time of the child processes which finished meanwhile, e.g. the ones which parse
+    repodata. It includes other phases which run at the same time, e.g. stages of the sync
+    pipeline, so it is reported as ``process_cpu_time``.
+    """
+
+    def __init__(self, code, message):
+        """
+        Initialize the metrics of a phase.
+
+        Args:
+            code (str): code of the phase, reported as "timing.<code>"
+            message (str): message of the phase shown to the user
+
+        """
+        self.code = code
+        self.message = message
+        self.wall_time = 0.0
+        self.process_cpu_time = 0.0
+        self.rss = 0
+        self.rss_increase = 0
+        self.items = 0
+        self.measurements = 0
+        self._started = None
+
+    def start(self):
+        """Start measuring the phase."""
+        self._started = (time.perf_counter(), cpu_time(), current_rss())
+
+    def stop(self, items=0):
+        """
+        Stop measuring the phase.
+
+        Args:
+            items (int): number of items processed since the phase was started
+
+        """
+        if self._started is None:
+            return
+        wall_started, cpu_started, rss_started = self._started
+        self.wall_time += time.perf_counter() - wall_started
+        self.process_cpu_time += cpu_time() - cpu_started
+        rss_stopped = current_rss()
+        self.rss = max(self.rss, rss_started, rss_stopped)
+        self.rss_increase += rss_stopped - rss_started
+        self.items += items
+        self.measurements += 1
+        self._started = None
+
+    @contextmanager
+    def measure(self, items=0):
+        """
+        Measure the phase while in the context.
+
+        Args:
+            items (int): number of items processed in the context
+
+        """
+        self.start()
+        try:
+            yield self
+        finally:
+            self.stop(items)
+
+    @contextmanager
+    def paused(self):
+        """
+        Leave the time spent in the context out of the measured phase.
+
+        It's meant for waiting for other parts of a task, e.g. for the next stage to take content.
+        """
+        if self._started is None:
+            yield self
+            return
+        self.stop()
+        try:
+            yield self
+        finally:
+            self.start()
+
+    async def measure_batches(self, batches):
+        """
+        Measure the processing of each batch, not the time spent waiting for the next one.
+
+        Args:
+            batches: an async iterator of batches of content, like `Stage.batches()`
+
+        Yields:
+            the batches
+
+        """
+        async for batch in batches:
+            self.start()
+            try:
+                yield batch
+            finally:
+                self.stop(len(batch))
+
+    def as_dict(self):
+        """
+        Return the metrics as a dict.
+
+        Returns:
+            dict: wall and process CPU time in seconds, RSS and its increase in kilobytes and
+                items per second
+
+        """
+        return {
+            'wall_time': round(self.wall_time, 3),
+            'process_cpu_time': round(self.process_cpu_time, 3),
+            'rss': self.rss,
+            'rss_increase': self.rss_increase,
+            'items_per_second': round(self.items / self.wall_time, 1) if self.wall_time else None,
+        }
+
+    def report(self):
+        """
+        Save the metrics as a completed progress report of the current task.
+
+        The number of processed items is reported as `done`. Progress reports have no field for
+        structured data, so the rest of the metrics are stored in `suffix` as a JSON object with
+        the keys of `as_dict()`, the format is documented for users of the API.
+        """
+        progress_data = dict(message=self.message, code=f'timing.{self.code}')
+        with ProgressReport(**progress_data) as metrics_pb:
+            metrics_pb.done = self.items
+            metrics_pb.suffix = json.dumps(self.as_dict())
+
+
+def report_metrics(phases_metrics):
+    """
+    Save the metrics of the phases which were measured as progress reports.
+
+    Args:
+        phases_metrics (iterable): PhaseMetrics of the phases of a task
+
+    """
+    for metrics in phases_metrics:
+        if metrics.measurements:
+            metrics.report()
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.15 on 2020-08-10 12:04
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpm', '0016_dist_tree_nofk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rpmremote',
+            name='metadata_validators',
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=dict),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.15 on 2020-08-12 08:21
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpm', '0017_rpmremote_metadata_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rpmremote',
+            name='mirror_ranking',
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=dict),
+        ),
+    ]
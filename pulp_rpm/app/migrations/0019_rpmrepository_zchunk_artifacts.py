@@ -0,0 +1,19 @@
+# Generated by Django 2.2.15 on 2020-08-14 10:37
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpm', '0018_rpmremote_mirror_ranking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rpmrepository',
+            name='zchunk_artifacts',
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=dict),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.15 on 2020-08-17 13:05
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpm', '0019_rpmrepository_zchunk_artifacts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='package',
+            name='deferred_details',
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=dict),
+        ),
+    ]
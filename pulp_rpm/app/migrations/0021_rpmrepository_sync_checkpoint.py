@@ -0,0 +1,19 @@
+# Generated by Django 2.2.15 on 2020-08-19 09:48
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpm', '0020_package_deferred_details'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rpmrepository',
+            name='sync_checkpoint',
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=dict),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.15 on 2020-08-24 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpm', '0021_rpmrepository_sync_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rpmpublication',
+            name='sqlite_metadata',
+            field=models.BooleanField(default=True),
+        ),
+    ]
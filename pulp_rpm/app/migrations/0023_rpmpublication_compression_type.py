@@ -0,0 +1,18 @@
+# Generated by Django 2.2.15 on 2020-08-25 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpm', '0022_rpmpublication_sqlite_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rpmpublication',
+            name='compression_type',
+            field=models.CharField(choices=[('gz', 'gz'), ('xz', 'xz'), ('zstd', 'zstd'), ('none', 'none')], max_length=4, null=True),
+        ),
+    ]
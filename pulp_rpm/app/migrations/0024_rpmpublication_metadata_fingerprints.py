@@ -0,0 +1,19 @@
+# Generated by Django 2.2.15 on 2020-08-27 14:21
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpm', '0023_rpmpublication_compression_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rpmpublication',
+            name='metadata_fingerprints',
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=dict),
+        ),
+    ]
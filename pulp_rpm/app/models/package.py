@@ -227,6 +227,10 @@ class Package(Content):
     # not part of createrepo_c metadata
     is_modular = models.BooleanField(default=False)
 
+    # SHA256 of the "filelists" and "other" metadata artifacts which files and changelogs of
+    # the package can be filled in from, empty if the package has them already
+    deferred_details = JSONField(default=dict)
+
     # createrepo_c treats 'nosrc' arch (opensuse specific use) as 'src' so it can seem that two
     # packages are the same when they are not. By adding 'location_href' here we can recognize this.
     # E.g. glibc-2.26.11.3.2.nosrc.rpm vs glibc-2.26.11.3.2.src.rpm
@@ -247,6 +251,13 @@ class Package(Content):
         return "{n}-{e}:{v}-{r}.{a}".format(
             n=self.name, e=self.epoch, v=self.version, r=self.release, a=self.arch)
 
+    @property
+    def has_deferred_details(self):
+        """
+        Whether files and changelogs of the package are not filled in yet.
+        """
+        return bool(self.deferred_details)
+
     @property
     def nvra(self):
         """
@@ -24,7 +24,7 @@ from pulpcore.plugin.models import (
 )
 from pulpcore.plugin.repo_version_utils import remove_duplicates, validate_repo_version
 
-from pulp_rpm.app.constants import CHECKSUM_CHOICES
+from pulp_rpm.app.constants import CHECKSUM_CHOICES, COMPRESSION_CHOICES
 from pulp_rpm.app.models import (
     DistributionTree,
     Package,
@@ -60,6 +60,10 @@ class RpmRepository(Repository):
             The repo version number of the last sync
         original_checksum_types (JSON):
             Checksum for each metadata type
+        zchunk_artifacts (JSON):
+            SHA256 of the artifact with the last synced zchunk metadata of each type
+        sync_checkpoint (JSON):
+            Progress of a failed sync, the metadata files it downloaded and the content it saved
     """
 
     TYPE = "rpm"
@@ -81,6 +85,8 @@ class RpmRepository(Repository):
     last_sync_repo_version = models.PositiveIntegerField(default=0)
     original_checksum_types = JSONField(default=dict)
     retain_package_versions = models.PositiveIntegerField(default=0)
+    zchunk_artifacts = JSONField(default=dict)
+    sync_checkpoint = JSONField(default=dict)
 
     def new_version(self, base_version=None):
         """
@@ -213,6 +219,15 @@ class RpmRepository(Repository):
 class RpmRemote(Remote):
     """
     Remote for "rpm" content.
+
+    Fields:
+
+        sles_auth_token (Text):
+            Authentication token for SLES repositories
+        metadata_validators (JSON):
+            HTTP validators of the last downloaded repomd.xml for each fetched URL
+        mirror_ranking (JSON):
+            Available mirrors of a mirror list feed, the best one first, and when they were ranked
     """
 
     TYPE = 'rpm'
@@ -220,6 +235,8 @@ class RpmRemote(Remote):
         max_length=512,
         null=True
     )
+    metadata_validators = JSONField(default=dict)
+    mirror_ranking = JSONField(default=dict)
 
     @property
     def download_factory(self):
@@ -255,7 +272,9 @@ class RpmRemote(Remote):
                 download.
             url (str): The URL to download.
             kwargs (dict): This accepts the parameters of
-                :class:`~pulpcore.plugin.download.BaseDownloader`.
+                :class:`~pulpcore.plugin.download.BaseDownloader`. Empty `validators` for
+                conditional requests of :class:`~pulp_rpm.app.downloaders.RpmDownloader` are
+                ignored.
         Raises:
             ValueError: If neither remote_artifact and url are passed, or if both are passed.
         Returns:
@@ -265,6 +284,8 @@ class RpmRemote(Remote):
         """
         if self.sles_auth_token:
             kwargs['sles_auth_token'] = self.sles_auth_token
+        if not kwargs.get('validators'):
+            kwargs.pop('validators', None)
         return super().get_downloader(remote_artifact=remote_artifact, url=url, **kwargs)
 
     class Meta:
@@ -279,6 +300,9 @@ class RpmPublication(Publication):
     TYPE = 'rpm'
     metadata_checksum_type = models.CharField(choices=CHECKSUM_CHOICES, max_length=10)
     package_checksum_type = models.CharField(choices=CHECKSUM_CHOICES, max_length=10)
+    sqlite_metadata = models.BooleanField(default=True)
+    compression_type = models.CharField(choices=COMPRESSION_CHOICES, max_length=4, null=True)
+    metadata_fingerprints = JSONField(default=dict)
 
     class Meta:
         default_related_name = "%(app_label)s_%(model_name)s"
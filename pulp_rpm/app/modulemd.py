@@ -1,3 +1,5 @@
+import asyncio
+import hashlib
 import os
 import tempfile
 
@@ -9,6 +11,9 @@ import gi
 gi.require_version('Modulemd', '2.0')
 from gi.repository import Modulemd as mmdlib  # noqa: E402
 
+# Number of modules parsed at once in one thread
+MODULEMD_CHUNK_SIZE = 50
+
 
 def resolve_module_packages(version, previous_version):
     """
@@ -47,27 +52,48 @@ def resolve_module_packages(version, previous_version):
     version.add_content(Package.objects.filter(pk__in=packages_to_add))
 
 
-def _create_snippet(snippet_string):
+def _create_snippets(snippet_strings):
     """
-    Create snippet of modulemd[-defaults] as artifact.
+    Create snippets of modulemd[-defaults] as artifacts.
+
+    Snippets are hashed in memory, only the ones which are not stored yet are written to files.
 
     Args:
-        snippet_string (string):
-            Snippet with modulemd[-defaults] yaml
+        snippet_strings (list):
+            Snippets with modulemd[-defaults] yaml
 
     Returns:
-        Snippet as unsaved Artifact object
+        List of Artifact objects, saved ones for already stored snippets and unsaved ones for
+        the new snippets
 
     """
-    tmp_file = tempfile.NamedTemporaryFile(dir=os.getcwd(), delete=False)
-    with open(tmp_file.name, 'w') as snippet:
-        snippet.write(snippet_string)
-    return Artifact.init_and_validate(tmp_file.name)
+    snippets = [snippet_string.encode('utf-8') for snippet_string in snippet_strings]
+    snippet_digests = [
+        {name: hashlib.new(name, snippet).hexdigest() for name in Artifact.DIGEST_FIELDS}
+        for snippet in snippets
+    ]
+    existing_artifacts = {
+        artifact.sha256: artifact for artifact in Artifact.objects.filter(
+            sha256__in=[digests['sha256'] for digests in snippet_digests]
+        )
+    }
 
+    artifacts = []
+    for snippet, digests in zip(snippets, snippet_digests):
+        artifact = existing_artifacts.get(digests['sha256'])
+        if not artifact:
+            with tempfile.NamedTemporaryFile(dir=os.getcwd(), delete=False) as tmp_file:
+                tmp_file.write(snippet)
+            artifact = Artifact(file=tmp_file.name, size=len(snippet), **digests)
+        artifacts.append(artifact)
+    return artifacts
 
-def parse_modulemd(module_names, module_index):
+
+def parse_module_streams(module_names, module_index):
     """
-    Get modulemd NSVCA, artifacts, dependencies.
+    Get modulemd NSVCA, artifacts, dependencies and a yaml snippet of each stream.
+
+    No database is accessed, so it can run in a separate thread.
 
     Args:
         module_names (list):
@@ -75,6 +101,9 @@ def parse_modulemd(module_names, module_index):
         module_index (mmdlib.ModuleIndex):
             libmodulemd index object
 
+    Returns:
+        list of modulemds as dict with the snippet under the "snippet" key
+
     """
     ret = list()
     for module in module_names:
@@ -99,12 +128,104 @@ def parse_modulemd(module_names, module_index):
             # create yaml snippet for this modulemd stream
             temp_index = mmdlib.ModuleIndex.new()
             temp_index.add_module_stream(stream)
-            artifact = _create_snippet(temp_index.dump_to_string())
-            modulemd["artifact"] = artifact
+            modulemd["snippet"] = temp_index.dump_to_string()
             ret.append(modulemd)
     return ret
 
 
+def _add_snippet_artifacts(modulemds):
+    """
+    Replace snippets of modulemds with artifacts.
+
+    Args:
+        modulemds (list):
+            modulemds as dict with the snippet under the "snippet" key
+
+    """
+    snippets = [modulemd.pop("snippet") for modulemd in modulemds]
+    for modulemd, artifact in zip(modulemds, _create_snippets(snippets)):
+        modulemd["artifact"] = artifact
+
+
+def parse_modulemd(module_names, module_index):
+    """
+    Get modulemd NSVCA, artifacts, dependencies.
+
+    Args:
+        module_names (list):
+            list of modulemd names
+        module_index (mmdlib.ModuleIndex):
+            libmodulemd index object
+
+    """
+    ret = parse_module_streams(module_names, module_index)
+    _add_snippet_artifacts(ret)
+    return ret
+
+
+def split_module_index(module_names, module_index):
+    """
+    Split modules into chunks, each with its own libmodulemd index.
+
+    A libmodulemd index must not be used by several threads at once, so every thread which parses
+    a chunk gets its own index with copies of the module streams.
+
+    Args:
+        module_names (list):
+            list of modulemd names
+        module_index (mmdlib.ModuleIndex):
+            libmodulemd index object
+
+    Returns:
+        list of tuples with modulemd names of a chunk and the index of the chunk
+
+    """
+    chunks = []
+    for start in range(0, len(module_names), MODULEMD_CHUNK_SIZE):
+        chunk_names = module_names[start:start + MODULEMD_CHUNK_SIZE]
+        chunk_index = mmdlib.ModuleIndex.new()
+        for module in chunk_names:
+            for stream in module_index.get_module(module).get_all_streams():
+                # the index stores a copy of the stream
+                chunk_index.add_module_stream(stream)
+        chunks.append((chunk_names, chunk_index))
+    return chunks
+
+
+async def parse_modulemd_in_chunks(module_names, module_index):
+    """
+    Get modulemd NSVCA, artifacts, dependencies, parsing chunks of modules in parallel threads.
+
+    Modules are parsed in `MODULEMD_CHUNK_SIZE` chunks by the default executor of the event loop,
+    so the event loop isn't blocked, neither by parsing nor by looking up the artifacts of the
+    snippets. Each chunk is parsed from its own copy of the index. Modulemds are yielded in the
+    order of `module_names`, those of a chunk as soon as it and the chunks before it are parsed.
+
+    Args:
+        module_names (list):
+            list of modulemd names
+        module_index (mmdlib.ModuleIndex):
+            libmodulemd index object
+
+    Yields:
+        modulemd as dict
+
+    """
+    loop = asyncio.get_event_loop()
+    chunks = await loop.run_in_executor(None, split_module_index, module_names, module_index)
+    futures = [
+        loop.run_in_executor(None, parse_modulemd, chunk_names, chunk_index)
+        for chunk_names, chunk_index in chunks
+    ]
+    try:
+        for future in futures:
+            for modulemd in await future:
+                yield modulemd
+    finally:
+        for future in futures:
+            future.cancel()
+
+
 def parse_defaults(module_index):
     """
     Get modulemd_defaults.
@@ -118,6 +239,7 @@ def parse_defaults(module_index):
 
     """
     ret = list()
+    snippets = list()
     modulemd_defaults = module_index.get_default_streams().keys()
     for module in modulemd_defaults:
         modulemd = module_index.get_module(module)
@@ -128,12 +250,14 @@ def parse_defaults(module_index):
             # create modulemd-default snippet
             temp_index = mmdlib.ModuleIndex.new()
             temp_index.add_defaults(defaults)
-            artifact = _create_snippet(temp_index.dump_to_string())
+            snippets.append(temp_index.dump_to_string())
             ret.append({
                 PULP_MODULEDEFAULTS_ATTR.MODULE: modulemd.get_module_name(),
                 PULP_MODULEDEFAULTS_ATTR.STREAM: default_stream,
                 PULP_MODULEDEFAULTS_ATTR.PROFILES: default_profile,
-                PULP_MODULEDEFAULTS_ATTR.DIGEST: artifact.sha256,
-                'artifact': artifact
             })
+
+    for default, artifact in zip(ret, _create_snippets(snippets)):
+        default[PULP_MODULEDEFAULTS_ATTR.DIGEST] = artifact.sha256
+        default['artifact'] = artifact
     return ret
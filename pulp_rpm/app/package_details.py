@@ -0,0 +1,137 @@
+import shutil
+import tempfile
+
+from collections import defaultdict
+from gettext import gettext as _
+from logging import getLogger
+
+import createrepo_c as cr
+
+from django.core.files.storage import default_storage as storage
+from django.db.models import Q
+
+from pulpcore.plugin.models import Artifact
+
+from pulp_rpm.app.constants import PULP_PACKAGE_ATTRS
+from pulp_rpm.app.exceptions import PackageDetailsNotAvailable
+from pulp_rpm.app.models import Package
+
+
+log = getLogger(__name__)
+
+
+def parse_package_details(filelists_xml_path, other_xml_path, pkgids):
+    """
+    Parse files and changelogs of packages.
+
+    Args:
+        filelists_xml_path(str): a path to filelists.xml
+        other_xml_path(str): a path to other.xml
+        pkgids(set): pkgIds of packages to parse
+
+    Returns:
+        dict: files and changelogs of packages with the pkgId as a key
+
+    """
+    packages = {}
+
+    def newpkgcb(pkgId, name, arch):
+        if pkgId not in pkgids:
+            return None
+        return packages.setdefault(pkgId, cr.Package())
+
+    cr.xml_parse_filelists(filelists_xml_path, newpkgcb=newpkgcb)
+    cr.xml_parse_other(other_xml_path, newpkgcb=newpkgcb)
+    return {
+        pkgId: {
+            PULP_PACKAGE_ATTRS.FILES: pkg.files,
+            PULP_PACKAGE_ATTRS.CHANGELOGS: pkg.changelogs,
+        }
+        for pkgId, pkg in packages.items()
+    }
+
+
+def save_package_details(packages, details):
+    """
+    Store parsed files and changelogs of packages.
+
+    Args:
+        packages(list): Package instances to update
+        details(dict): files and changelogs of packages with the pkgId as a key
+
+    """
+    for package in packages:
+        package_details = details.get(package.pkgId, {})
+        package.files = package_details.get(PULP_PACKAGE_ATTRS.FILES, [])
+        package.changelogs = package_details.get(PULP_PACKAGE_ATTRS.CHANGELOGS, [])
+        package.deferred_details = {}
+    Package.objects.bulk_update(
+        packages, ['files', 'changelogs', 'deferred_details'], batch_size=1000
+    )
+
+
+def fill_package_details(packages):
+    """
+    Fill in files and changelogs of packages which were synced without them.
+
+    The details are parsed from filelists.xml and other.xml which were kept as artifacts when
+    the packages were synced.
+
+    Args:
+        packages(django.db.models.QuerySet): packages to fill in, the ones which already have
+            their details are left out
+
+    Raises:
+        PackageDetailsNotAvailable: If the metadata files of some packages were removed.
+
+    """
+    pending_packages = packages.exclude(deferred_details={}).only('pk', 'pkgId', 'deferred_details')
+
+    packages_by_source = defaultdict(list)
+    for package in pending_packages.iterator():
+        source = (package.deferred_details['filelists'], package.deferred_details['other'])
+        packages_by_source[source].append(package)
+
+    for (filelists_sha256, other_sha256), source_packages in packages_by_source.items():
+        artifacts = {
+            artifact.sha256: artifact for artifact in Artifact.objects.filter(
+                sha256__in=[filelists_sha256, other_sha256]
+            )
+        }
+        if filelists_sha256 not in artifacts or other_sha256 not in artifacts:
+            raise PackageDetailsNotAvailable(
+                _("Files and changelogs of {count} packages are not available, the metadata "
+                  "they were synced from was removed. Sync the packages again without "
+                  "RPM_DEFER_PACKAGE_DETAILS to get them.").format(count=len(source_packages))
+            )
+
+        with tempfile.NamedTemporaryFile('wb') as filelists_file, \
+                tempfile.NamedTemporaryFile('wb') as other_file:
+            for artifact, temp_file in ((artifacts[filelists_sha256], filelists_file),
+                                        (artifacts[other_sha256], other_file)):
+                with storage.open(artifact.file.name) as artifact_file:
+                    shutil.copyfileobj(artifact_file, temp_file)
+                temp_file.flush()
+            details = parse_package_details(
+                filelists_file.name, other_file.name,
+                {package.pkgId for package in source_packages}
+            )
+        save_package_details(source_packages, details)
+
+
+def fill_package_details_from(sha256s):
+    """
+    Fill in files and changelogs of packages which refer to any of the given metadata files.
+
+    It's meant for the metadata files which are going to be removed from a repository.
+
+    Args:
+        sha256s(iterable): sha256 checksums of kept filelists.xml or other.xml
+
+    """
+    query = Q()
+    for sha256 in sha256s:
+        query |= Q(deferred_details__contains={'filelists': sha256})
+        query |= Q(deferred_details__contains={'other': sha256})
+    if query:
+        fill_package_details(Package.objects.filter(query))
@@ -0,0 +1,50 @@
+import importlib
+import multiprocessing
+import os
+
+import django
+
+from django.conf import settings
+
+# Worker processes are spawned rather than forked. A task runs in a process with other threads
+# and open database connections, which a forked process would share with its parent.
+context = multiprocessing.get_context('spawn')
+
+
+def _bootstrap(settings_module, target, args):
+    """
+    Set up Django in a spawned process and run the target function.
+
+    Args:
+        settings_module(str): the Django settings module of the parent process
+        target(str): a dotted path to the function to run
+        args(tuple): arguments of the function
+
+    """
+    os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+    django.setup()
+    module_name, function_name = target.rsplit('.', 1)
+    getattr(importlib.import_module(module_name), function_name)(*args)
+
+
+def start_process(target, *args):
+    """
+    Run a function in a new process with Django set up.
+
+    The function must be defined at the top level of a module. Queues which are passed to it
+    have to be created from the ``context`` of this module.
+
+    Args:
+        target(function): the function to run
+        args: arguments of the function
+
+    Returns:
+        multiprocessing.Process: the started process
+
+    """
+    process = context.Process(
+        target=_bootstrap,
+        args=(settings.SETTINGS_MODULE, f'{target.__module__}.{target.__qualname__}', args)
+    )
+    process.start()
+    return process
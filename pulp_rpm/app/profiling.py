@@ -0,0 +1,128 @@
+import cProfile
+import os
+import tempfile
+import uuid
+
+from functools import wraps
+from gettext import gettext as _
+from logging import getLogger
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage as storage
+
+from pulpcore.plugin.models import Task
+
+
+log = getLogger(__name__)
+
+# Directory in the storage where profiles of tasks are kept
+PROFILES_DIR = 'rpm-profiles'
+PROFILE_SUFFIX = '.prof'
+
+
+def profile_path(task_pk):
+    """
+    Get the path of a profile of a task in the storage.
+
+    Args:
+        task_pk (str): primary key of the profiled task
+
+    Returns:
+        str: the path of the profile
+
+    """
+    return os.path.join(PROFILES_DIR, f'{task_pk}{PROFILE_SUFFIX}')
+
+
+def profiled(task):
+    """
+    Profile a task with cProfile when its name is listed in the RPM_PROFILE_TASKS setting.
+
+    The profile is kept in the storage, it can be downloaded from the profiles endpoint by the
+    pk of the task. It is saved even when the task fails. Only the newest RPM_PROFILES_KEPT
+    profiles are kept. Only the thread which runs the task is
+    profiled, neither executor threads nor child processes started by the task are.
+
+    Args:
+        task (function): a task to profile
+
+    Returns:
+        function: the task which is profiled when it's enabled
+
+    """
+    @wraps(task)
+    def profiled_task(*args, **kwargs):
+        if task.__name__ not in settings.RPM_PROFILE_TASKS:
+            return task(*args, **kwargs)
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(task, *args, **kwargs)
+        finally:
+            try:
+                save_profile(profiler, task.__name__)
+            except Exception as exc:
+                # the profile must not hide the result of the task
+                log.warning(_("Unable to save the profile of the task {task}: {exc}").format(
+                    task=task.__name__, exc=exc
+                ))
+
+    return profiled_task
+
+
+def save_profile(profiler, name):
+    """
+    Save collected profiling data of the current task to the storage.
+
+    The file is in the pstats format, it can be loaded with `pstats.Stats` or tools like snakeviz.
+    The data are dumped to a temporary file in the working directory of the task first, which is
+    removed once the profile is stored. Profiles of old and deleted tasks are removed then.
+
+    Args:
+        profiler (cProfile.Profile): the profiler which collected the data
+        name (str): name of the profiled task
+
+    Returns:
+        str: the path of the profile in the storage, or None if it doesn't run in a task
+
+    """
+    task = Task.current()
+    if not task:
+        with tempfile.NamedTemporaryFile(prefix=f'{name}-', suffix='.prof', delete=False) as f:
+            profiler.dump_stats(f.name)
+        log.info(_("The profile of {name} was saved to {path}").format(name=name, path=f.name))
+        return None
+
+    stored_path = profile_path(task.pk)
+    with tempfile.NamedTemporaryFile(dir=os.getcwd(), suffix='.prof') as profile_file:
+        profiler.dump_stats(profile_file.name)
+        if storage.exists(stored_path):
+            storage.delete(stored_path)
+        with open(profile_file.name, 'rb') as dumped_file:
+            stored_path = storage.save(stored_path, File(dumped_file))
+    log.info(_("The profile of the task {pk} was saved").format(pk=task.pk))
+
+    remove_old_profiles()
+    return stored_path
+
+
+def remove_old_profiles():
+    """
+    Remove profiles of deleted tasks and all but the newest RPM_PROFILES_KEPT profiles.
+    """
+    if not storage.exists(PROFILES_DIR):
+        return
+    _dirs, files = storage.listdir(PROFILES_DIR)
+    task_pks = set()
+    for filename in files:
+        try:
+            task_pks.add(str(uuid.UUID(filename[:-len(PROFILE_SUFFIX)])))
+        except ValueError:
+            continue
+
+    kept_pks = Task.objects.filter(pk__in=task_pks).order_by('-pulp_created').values_list(
+        'pk', flat=True
+    )[:settings.RPM_PROFILES_KEPT]
+    for task_pk in task_pks - {str(pk) for pk in kept_pks}:
+        storage.delete(profile_path(task_pk))
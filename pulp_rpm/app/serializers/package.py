@@ -73,17 +73,24 @@ class PackageSerializer(
     )
 
     changelogs = serializers.JSONField(
-        help_text=_("Changelogs that package contains"),
+        help_text=_("Changelogs that package contains, empty while deferred_details is true"),
         default="[]",
         required=False,
         read_only=True,
     )
     files = serializers.JSONField(
-        help_text=_("Files that package contains"),
+        help_text=_("Files that package contains, empty while deferred_details is true"),
         default="[]",
         required=False,
         read_only=True,
     )
+    deferred_details = serializers.BooleanField(
+        help_text=_("Whether files and changelogs of the package were deferred by a sync and "
+                    "are not filled in yet. They are filled in when the package is published "
+                    "or copied with dependency solving."),
+        source="has_deferred_details",
+        read_only=True,
+    )
 
     requires = serializers.JSONField(
         help_text=_("Capabilities the package requires"),
@@ -276,6 +283,7 @@ class PackageSerializer(
             "url",
             "changelogs",
             "files",
+            "deferred_details",
             "requires",
             "provides",
             "conflicts",
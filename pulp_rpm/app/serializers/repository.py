@@ -16,7 +16,12 @@ from pulpcore.plugin.serializers import (
     validate_unknown_fields,
 )
 
-from pulp_rpm.app.constants import CHECKSUM_CHOICES, CHECKSUM_TYPES, SKIP_TYPES
+from pulp_rpm.app.constants import (
+    CHECKSUM_CHOICES,
+    CHECKSUM_TYPES,
+    COMPRESSION_CHOICES,
+    SKIP_TYPES,
+)
 from pulp_rpm.app.models import (
     RpmDistribution,
     RpmRemote,
@@ -97,11 +102,26 @@ class RpmPublicationSerializer(PublicationSerializer):
         choices=CHECKSUM_CHOICES,
         default=CHECKSUM_TYPES.SHA256,
     )
+    sqlite_metadata = serializers.BooleanField(
+        help_text=_("Whether to publish sqlite databases of the package metadata, which "
+                    "modern clients like dnf don't use."),
+        default=True,
+    )
+    compression_type = serializers.ChoiceField(
+        help_text=_("The compression of primary, filelists, other and updateinfo metadata and "
+                    "of sqlite databases. By default, xml metadata is compressed with gzip and "
+                    "sqlite databases with bzip2."),
+        choices=COMPRESSION_CHOICES,
+        required=False,
+        allow_null=True,
+    )
 
     class Meta:
         fields = PublicationSerializer.Meta.fields + (
             "metadata_checksum_type",
             "package_checksum_type",
+            "sqlite_metadata",
+            "compression_type",
         )
         model = RpmPublication
 
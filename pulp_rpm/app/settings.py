@@ -6,3 +6,35 @@ Check `Plugin Writer's Guide`_ for more details.
 """
 
 INSTALLED_APPS = ["django_readonly_field", "dynaconf_merge"]
+
+# The maximum number of repositories which are synced at the same time during one sync task,
+# e.g. sub-repositories of a distribution tree and its main repository
+RPM_SYNC_CONCURRENCY = 4
+
+# The number of seconds to wait for repomd.xml of a mirror of a mirror list feed, not counting
+# the time spent waiting for a free download slot
+RPM_MIRROR_PROBE_TIMEOUT = 30
+
+# The number of seconds for which a ranking of mirrors from a mirror list feed is reused
+RPM_MIRROR_RANKING_TTL = 3600
+
+# The number of the best mirrors of a mirror list feed which packages are downloaded from
+RPM_DOWNLOAD_MIRRORS = 3
+
+# Whether on_demand and streamed syncs store only primary data of packages. Files and changelogs
+# are filled in from the kept filelists and other metadata when they are needed.
+RPM_DEFER_PACKAGE_DETAILS = False
+
+# Names of tasks which are profiled with cProfile, e.g. ["synchronize", "publish", "copy_content"].
+# The profile can be downloaded from /pulp/api/v3/rpm/profiles/<pk of the task>/.
+RPM_PROFILE_TASKS = []
+
+# The number of the newest profiles of tasks which are kept, older ones are removed
+RPM_PROFILES_KEPT = 10
+
+# Whether primary, filelists and other metadata are written in separate processes during publish
+RPM_PARALLEL_PUBLISH = False
+
+# Whether a publish reuses metadata of the previous publication of the repository which was
+# created from the same content with the same options, instead of creating it again
+RPM_INCREMENTAL_PUBLISH = True
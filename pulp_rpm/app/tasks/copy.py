@@ -14,6 +14,7 @@ from pulp_rpm.app.models import (
     RpmRepository,
     Modulemd
 )
+from pulp_rpm.app.profiling import profiled
 
 
 def find_children_of_content(content, src_repo_version):
@@ -124,6 +125,7 @@ def find_children_of_content(content, src_repo_version):
     return Content.objects.filter(pk__in=children)
 
 
+@profiled
 @transaction.atomic
 def copy_content(config, dependency_solving):
     """
@@ -1,14 +1,20 @@
+import hashlib
 import os
+import pickle
 from gettext import gettext as _
 import logging
 import shutil
+from queue import Empty, Full
 from tempfile import NamedTemporaryFile
 
 import createrepo_c as cr
 import libcomps
 
+from django.conf import settings
 from django.core.files import File
 from django.core.files.storage import default_storage as storage
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
 
 from pulpcore.plugin.models import (
     AsciiArmoredDetachedSigningService,
@@ -21,7 +27,18 @@ from pulpcore.plugin.models import (
 from pulpcore.plugin.tasking import WorkingDirectory
 
 from pulp_rpm.app.comps import dict_to_strdict
-from pulp_rpm.app.constants import CHECKSUM_TYPES, PACKAGES_DIRECTORY
+from pulp_rpm.app.constants import (
+    CHECKSUM_TYPES,
+    COMPS_REPODATA,
+    COMPRESSION_TYPES,
+    MODULAR_REPODATA,
+    PACKAGE_DB_REPODATA,
+    PACKAGE_REPODATA,
+    PACKAGES_DIRECTORY,
+    PULP_PACKAGE_ATTRS,
+    UPDATE_REPODATA,
+)
+from pulp_rpm.app import processes
 from pulp_rpm.app.kickstart.treeinfo import PulpTreeInfo, TreeinfoData
 from pulp_rpm.app.models import (
     DistributionTree,
@@ -36,11 +53,61 @@ from pulp_rpm.app.models import (
     RpmPublication,
     UpdateRecord,
 )
+from pulp_rpm.app.package_details import fill_package_details
+from pulp_rpm.app.profiling import profiled
 
 log = logging.getLogger(__name__)
 
 REPODATA_PATH = 'repodata'
 
+# Types of repomd records of each group of metadata and types of content it is created from
+METADATA_GROUPS = {
+    'packages': (PACKAGE_REPODATA + PACKAGE_DB_REPODATA, [Package]),
+    'updateinfo': (UPDATE_REPODATA, [UpdateRecord]),
+    'modules': (MODULAR_REPODATA, [Modulemd, ModulemdDefaults]),
+    'group': (
+        COMPS_REPODATA, [PackageGroup, PackageCategory, PackageEnvironment, PackageLangpacks]
+    ),
+}
+
+# Fields of packages which are sent to the metadata writing processes
+PUBLISHED_PACKAGE_FIELDS = tuple(vars(PULP_PACKAGE_ATTRS).values())
+# Number of packages sent at once to a metadata writing process
+PUBLISH_BATCH_SIZE = 500
+# Number of batches a metadata writing process can receive ahead before the sender waits
+PUBLISH_QUEUE_SIZE = 8
+
+# Writers of the xml file and the sqlite database of each type of package metadata
+PACKAGE_METADATA_WRITERS = {
+    'primary': (cr.PrimaryXmlFile, cr.PrimarySqlite),
+    'filelists': (cr.FilelistsXmlFile, cr.FilelistsSqlite),
+    'other': (cr.OtherXmlFile, cr.OtherSqlite),
+}
+
+# Compressions of xml metadata and of sqlite databases for each of COMPRESSION_TYPES
+CR_COMPRESSION_TYPES = {
+    COMPRESSION_TYPES.GZ: (cr.GZ_COMPRESSION, cr.GZ_COMPRESSION),
+    COMPRESSION_TYPES.XZ: (cr.XZ_COMPRESSION, cr.XZ_COMPRESSION),
+    COMPRESSION_TYPES.ZSTD: (cr.ZSTD_COMPRESSION, cr.ZSTD_COMPRESSION),
+    COMPRESSION_TYPES.NONE: (cr.NO_COMPRESSION, cr.NO_COMPRESSION),
+}
+# The compressions used when a publication doesn't choose any, the same as createrepo_c uses
+DEFAULT_CR_COMPRESSION_TYPES = (cr.GZ_COMPRESSION, cr.BZ2_COMPRESSION)
+
+# Options of libcomps for writing comps.xml
+COMPS_XML_OPTIONS = {
+    "default_explicit": True,
+    "empty_groups": True,
+    "uservisible_explicit": True,
+}
+
+# Attributes of a repomd record which are passed from a metadata writing process
+REPOMD_RECORD_ATTRS = (
+    'type', 'location_href', 'location_base', 'checksum', 'checksum_type', 'checksum_open',
+    'checksum_open_type', 'checksum_header', 'checksum_header_type', 'timestamp', 'size',
+    'size_open', 'size_header', 'db_ver',
+)
+
 
 class PublicationData:
     """
@@ -80,8 +147,10 @@ class PublicationData:
 
         """
         repomdrecords = []
+        # filelists.xml and other.xml kept from a sync are generated anew
         repo_metadata_files = RepoMetadataFile.objects.filter(
-            pk__in=content).prefetch_related('contentartifact_set')
+            pk__in=content).exclude(data_type__in=PACKAGE_REPODATA).prefetch_related(
+            'contentartifact_set')
 
         for repo_metadata_file in repo_metadata_files:
             content_artifact = repo_metadata_file.contentartifact_set.get()
@@ -210,6 +279,191 @@ class PublicationData:
             self.publish_artifacts(content, name)
 
 
+class PreviousPublication:
+    """
+    The previous publication of a repository, which metadata can be reused by a new publication.
+
+    Each group of metadata, e.g. all package metadata or comps.xml, is reused when its
+    fingerprint didn't change, i.e. it was created from the same content with the same options.
+    """
+
+    def __init__(self, publication):
+        """
+        Setting the previous publication.
+
+        Args:
+            publication (pulp_rpm.app.models.RpmPublication): A complete previous publication.
+
+        """
+        self.publication = publication
+
+    @classmethod
+    def find(cls, publication):
+        """
+        Find the latest complete publication of the same repository.
+
+        Args:
+            publication (pulp_rpm.app.models.RpmPublication): A new publication.
+
+        Returns:
+            PreviousPublication: the previous publication, or None if there is no publication
+                with metadata fingerprints
+
+        """
+        previous_publication = RpmPublication.objects.filter(
+            repository_version__repository=publication.repository_version.repository,
+            complete=True,
+        ).exclude(pk=publication.pk).exclude(metadata_fingerprints={}).order_by(
+            '-pulp_created'
+        ).first()
+        if previous_publication:
+            return cls(previous_publication)
+        return None
+
+    def load_repomd_records(self, repomd_metadata):
+        """
+        Load repomd records from a published repomd.xml.
+
+        Args:
+            repomd_metadata (pulpcore.plugin.models.PublishedMetadata): A published repomd.xml.
+
+        Returns:
+            list: createrepo_c repomd records
+
+        """
+        artifact = repomd_metadata.contentartifact_set.get().artifact
+        with storage.open(artifact.file.name) as artifact_file, \
+                NamedTemporaryFile('wb') as temp_file:
+            shutil.copyfileobj(artifact_file, temp_file)
+            temp_file.flush()
+            return cr.Repomd(temp_file.name).records
+
+    def reuse_metadata(self, publication, fingerprints, sub_folder=None):
+        """
+        Publish unchanged metadata of the previous publication in a new one.
+
+        Args:
+            publication (pulp_rpm.app.models.RpmPublication): A new publication.
+            fingerprints (dict): Fingerprints of each of METADATA_GROUPS of the new publication.
+
+        Keyword Args:
+            sub_folder (str): name of the folder for sub repos
+
+        Returns:
+            dict: repomd records of the reused metadata for each reused group of METADATA_GROUPS
+
+        """
+        previous_fingerprints = self.publication.metadata_fingerprints.get(sub_folder or "", {})
+        groups = [
+            group for group, fingerprint in fingerprints.items()
+            if previous_fingerprints.get(group) == fingerprint
+        ]
+        if not groups:
+            return {}
+
+        repodata_path = os.path.join(sub_folder, REPODATA_PATH) if sub_folder else REPODATA_PATH
+        previous_metadata = self.publication.published_metadata.filter(
+            relative_path__startswith=f"{repodata_path}/"
+        )
+        published_metadata = {metadata.relative_path: metadata for metadata in previous_metadata}
+        repomd_metadata = published_metadata.get(os.path.join(repodata_path, "repomd.xml"))
+        if not repomd_metadata:
+            return {}
+        records = self.load_repomd_records(repomd_metadata)
+
+        reused = {}
+        for group in groups:
+            record_types = METADATA_GROUPS[group][0]
+            group_records = [record for record in records if record.type in record_types]
+            group_metadata = [
+                published_metadata.get(
+                    os.path.join(repodata_path, os.path.basename(record.location_href))
+                ) for record in group_records
+            ]
+            if None in group_metadata:
+                continue
+            with transaction.atomic():
+                for metadata in group_metadata:
+                    copy_published_metadata(metadata, publication)
+            reused[group] = group_records
+
+        log.info(_('Reused metadata of publication {pk}: {groups}').format(
+            pk=self.publication.pk, groups=", ".join(reused) or _("none")
+        ))
+        return reused
+
+
+def copy_published_metadata(published_metadata, publication):
+    """
+    Publish a metadata file of another publication, the file itself is shared.
+
+    Args:
+        published_metadata (pulpcore.plugin.models.PublishedMetadata): A metadata file to copy.
+        publication (pulpcore.plugin.models.Publication): A publication to copy it to.
+
+    """
+    relative_path = published_metadata.relative_path
+    artifact = published_metadata.contentartifact_set.get().artifact
+    metadata = PublishedMetadata(relative_path=relative_path, publication=publication)
+    metadata.save()
+    content_artifact = ContentArtifact(
+        relative_path=relative_path, content=metadata, artifact=artifact
+    )
+    content_artifact.save()
+    PublishedArtifact(
+        relative_path=relative_path, content_artifact=content_artifact, publication=publication
+    ).save()
+
+
+def get_metadata_fingerprints(content, checksum_types, sqlite_metadata, compression_type):
+    """
+    Get fingerprints of the content and the options each group of metadata is created with.
+
+    The options are the ones which change the bytes of the metadata files or of their repomd
+    records, including the version of createrepo_c which writes the files.
+
+    Args:
+        content (pulpcore.plugin.models.Content): content set.
+        checksum_types (dict): Checksum types for metadata and packages.
+        sqlite_metadata (bool): Whether sqlite databases of package metadata are created.
+        compression_type (str): Compression of metadata, one of COMPRESSION_TYPES, or None.
+
+    Returns:
+        dict: a sha256 hex digest for each of METADATA_GROUPS
+
+    """
+    xml_compression, db_compression = get_compression_types(compression_type)
+    group_options = {
+        'packages': [
+            cr.VERSION, xml_compression, sqlite_metadata and db_compression,
+            checksum_types.get("package"),
+        ],
+        'updateinfo': [cr.VERSION, xml_compression],
+        'modules': [],
+        'group': [sorted(COMPS_XML_OPTIONS.items())],
+    }
+
+    fingerprints = {}
+    for group, (record_types, models) in METADATA_GROUPS.items():
+        options = group_options[group] + [
+            get_checksum_type(name, checksum_types) for name in record_types
+        ]
+        group_content = content.filter(
+            pulp_type__in=[model.get_pulp_type() for model in models]
+        ).order_by('pk')
+        if group == 'packages':
+            # artifacts of on_demand packages can be downloaded later and change their pkgId
+            rows = group_content.values_list('pk', 'contentartifact__artifact')
+        else:
+            rows = group_content.values_list('pk', flat=True)
+
+        digest = hashlib.sha256(repr(options).encode())
+        for row in rows.iterator():
+            digest.update(repr(row).encode())
+        fingerprints[group] = digest.hexdigest()
+    return fingerprints
+
+
 def get_checksum_type(name, checksum_types):
     """
     Get checksum algorithm for publishing metadata.
@@ -229,7 +483,339 @@ def get_checksum_type(name, checksum_types):
     return getattr(cr, checksum_type.upper(), cr.SHA256)
 
 
-def publish(repository_version_pk, metadata_signing_service=None, checksum_types=None):
+def get_compression_types(compression_type):
+    """
+    Get compression algorithms for publishing metadata.
+
+    Args:
+        compression_type (str): One of COMPRESSION_TYPES, or None for the defaults.
+
+    Returns:
+        tuple: createrepo_c compression types of xml metadata and of sqlite databases
+
+    """
+    if not compression_type:
+        return DEFAULT_CR_COMPRESSION_TYPES
+    return CR_COMPRESSION_TYPES[compression_type]
+
+
+def compressed_path(path, compression):
+    """
+    Add the suffix of a compression to a path of a metadata file.
+
+    Args:
+        path (str): A path of an uncompressed metadata file.
+        compression (int): A createrepo_c compression type.
+
+    Returns:
+        str: the path with the suffix, or the original path if there is no compression
+
+    """
+    return path + (cr.compression_suffix(compression) or "")
+
+
+def annotate_package_pkgids(packages, checksum_type):
+    """
+    Annotate packages with a checksum of their artifact to publish as their pkgId.
+
+    The checksums are loaded together with the packages instead of by a query for each package.
+    The annotation is None for packages without a downloaded artifact.
+
+    Args:
+        packages(django.db.models.QuerySet): packages to publish
+        checksum_type(str): a checksum type to use for pkgIds, or None to keep the original ones
+
+    Returns:
+        django.db.models.QuerySet: the packages with a ``published_pkgid`` annotation, or the
+            original packages if the original pkgIds should be kept
+
+    """
+    if not checksum_type or checksum_type == CHECKSUM_TYPES.UNKNOWN:
+        return packages
+    checksums = ContentArtifact.objects.filter(
+        content=OuterRef('pk'), artifact__isnull=False
+    ).order_by('artifact').values(f'artifact__{checksum_type.lower()}')[:1]
+    return packages.annotate(published_pkgid=Subquery(checksums))
+
+
+def package_to_createrepo_c(package, checksum_type=None):
+    """
+    Convert a package to a createrepo_c package with its location in the publication.
+
+    Args:
+        package(pulp_rpm.app.models.Package): a package, possibly annotated with a
+            ``published_pkgid`` by annotate_package_pkgids()
+        checksum_type(str): a checksum type of the annotated pkgId
+
+    Returns:
+        createrepo_c.Package: the package to add to the metadata files
+
+    """
+    pkg = package.to_createrepo_c()
+    pkgid = getattr(package, 'published_pkgid', None)
+    if pkgid:
+        pkg.checksum_type = checksum_type
+        pkg.pkgId = pkgid
+    pkg_filename = os.path.basename(package.location_href)
+    # this can cause an issue when two same RPM package names appears
+    # a/name1.rpm b/name1.rpm
+    pkg.location_href = os.path.join(
+        PACKAGES_DIRECTORY,
+        pkg_filename[0].lower(),
+        pkg_filename
+    )
+    return pkg
+
+
+def open_package_metadata(name, paths, total_packages, compressions):
+    """
+    Open the xml file and the sqlite database of a type of package metadata.
+
+    Args:
+        name(str): one of PACKAGE_REPODATA
+        paths(tuple): paths of the xml file and the sqlite database, the database path is None
+            if the database shouldn't be created
+        total_packages(int): number of packages which will be added
+        compressions(tuple): compression types of the xml file and of the sqlite database
+
+    Returns:
+        tuple: the xml file and the sqlite database, or None instead of the database
+
+    """
+    xml_file_class, db_class = PACKAGE_METADATA_WRITERS[name]
+    xml_path, db_path = paths
+    xml_file = xml_file_class(xml_path, compressions[0])
+    xml_file.set_num_of_pkgs(total_packages)
+    db = db_class(db_path) if db_path else None
+    return xml_file, db
+
+
+def close_package_metadata(name, paths, xml_file, db, checksum_types, compressions):
+    """
+    Close the xml file and the sqlite database of a type of package metadata.
+
+    The sqlite database is compressed and both files are renamed to contain their checksums.
+
+    Args:
+        name(str): one of PACKAGE_REPODATA
+        paths(tuple): paths of the xml file and the sqlite database
+        xml_file: the xml file
+        db: the sqlite database, or None if it wasn't created
+        checksum_types(dict): checksum types to use for the metadata
+        compressions(tuple): compression types of the xml file and of the sqlite database
+
+    Returns:
+        list: repomd records of the xml file and of the compressed sqlite database
+
+    """
+    xml_path, db_path = paths
+    xml_file.close()
+    xml_record = cr.RepomdRecord(name, xml_path)
+    xml_record.fill(get_checksum_type(name, checksum_types))
+    xml_record.rename_file()
+    if db is None:
+        return [xml_record]
+
+    db.dbinfo_update(xml_record.checksum)
+    db.close()
+
+    db_name = f"{name}_db"
+    db_checksum_type = get_checksum_type(db_name, checksum_types)
+    db_record = cr.RepomdRecord(db_name, db_path)
+    if compressions[1] == cr.NO_COMPRESSION:
+        db_record.fill(db_checksum_type)
+    else:
+        db_record = db_record.compress_and_fill(db_checksum_type, compressions[1])
+        db_record.type = db_name
+    db_record.rename_file()
+    return [xml_record, db_record]
+
+
+def sort_package_repomdrecords(records):
+    """
+    Sort repomd records of package metadata in the order they are listed in repomd.xml.
+
+    Args:
+        records(list): repomd records of package metadata
+
+    Returns:
+        list: the sorted records
+
+    """
+    order = PACKAGE_REPODATA + PACKAGE_DB_REPODATA
+    return sorted(records, key=lambda record: order.index(record.type))
+
+
+def write_package_metadata(packages, total_packages, paths, checksum_types, compressions):
+    """
+    Write primary, filelists and other metadata of packages, as xml and as sqlite.
+
+    Args:
+        packages(django.db.models.QuerySet): packages to publish, annotated by
+            annotate_package_pkgids()
+        total_packages(int): number of the packages
+        paths(dict): paths of the xml file and the sqlite database of each of PACKAGE_REPODATA,
+            the database paths are None if the databases shouldn't be created
+        checksum_types(dict): checksum types to use for the metadata and for pkgIds
+        compressions(tuple): compression types of the xml files and of the sqlite databases
+
+    Returns:
+        list: repomd records of the written files
+
+    """
+    package_checksum_type = checksum_types.get("package")
+    writers = {
+        name: open_package_metadata(name, paths[name], total_packages, compressions)
+        for name in PACKAGE_REPODATA
+    }
+
+    for package in packages.iterator():
+        pkg = package_to_createrepo_c(package, package_checksum_type)
+        for xml_file, db in writers.values():
+            xml_file.add_pkg(pkg)
+            if db:
+                db.add_pkg(pkg)
+
+    records = []
+    for name, (xml_file, db) in writers.items():
+        records.extend(close_package_metadata(
+            name, paths[name], xml_file, db, checksum_types, compressions
+        ))
+    return sort_package_repomdrecords(records)
+
+
+def write_package_metadata_file(name, paths, total_packages, checksum_types, compressions,
+                                queue, results):
+    """
+    Write a type of package metadata from packages received from the queue.
+
+    It is meant to run in a separate process. Packages are received in pickled batches of dicts
+    of their PUBLISHED_PACKAGE_FIELDS and of the ``published_pkgid`` annotation, None is received
+    when there are no more packages. Repomd records of the written files are sent to
+    the results queue as dicts of their attributes, or an error message is sent if writing fails.
+
+    Args:
+        name(str): one of PACKAGE_REPODATA
+        paths(tuple): paths of the xml file and the sqlite database
+        total_packages(int): number of packages which will be received
+        checksum_types(dict): checksum types to use for the metadata and for pkgIds
+        compressions(tuple): compression types of the xml file and of the sqlite database
+        queue(multiprocessing.Queue): a queue to receive the packages from
+        results(multiprocessing.Queue): a queue to send the repomd records to
+
+    """
+    package_checksum_type = checksum_types.get("package")
+    try:
+        xml_file, db = open_package_metadata(name, paths, total_packages, compressions)
+        for batch in iter(queue.get, None):
+            for values in pickle.loads(batch):
+                published_pkgid = values.pop('published_pkgid', None)
+                package = Package(**values)
+                package.published_pkgid = published_pkgid
+                pkg = package_to_createrepo_c(package, package_checksum_type)
+                xml_file.add_pkg(pkg)
+                if db:
+                    db.add_pkg(pkg)
+        records = close_package_metadata(
+            name, paths, xml_file, db, checksum_types, compressions
+        )
+    except Exception as exc:
+        results.put((name, str(exc)))
+    else:
+        results.put((name, [
+            {attr: getattr(record, attr) for attr in REPOMD_RECORD_ATTRS} for record in records
+        ]))
+
+
+def write_package_metadata_in_parallel(packages, total_packages, paths, checksum_types,
+                                       compressions):
+    """
+    Write primary, filelists and other metadata of packages in separate processes.
+
+    Packages are loaded from the database only once and sent to all the processes, only the
+    fields which are published are sent. The processes are spawned, so they share no database
+    connections with the worker.
+
+    Args:
+        packages(django.db.models.QuerySet): packages to publish, annotated by
+            annotate_package_pkgids()
+        total_packages(int): number of the packages
+        paths(dict): paths of the xml file and the sqlite database of each of PACKAGE_REPODATA,
+            the database paths are None if the databases shouldn't be created
+        checksum_types(dict): checksum types to use for the metadata and for pkgIds
+        compressions(tuple): compression types of the xml files and of the sqlite databases
+
+    Returns:
+        list: repomd records of the written files
+
+    Raises:
+        createrepo_c.CreaterepoCError: If writing of the metadata fails
+
+    """
+    results = processes.context.Queue()
+    workers = []
+    for name in PACKAGE_REPODATA:
+        queue = processes.context.Queue(maxsize=PUBLISH_QUEUE_SIZE)
+        process = processes.start_process(
+            write_package_metadata_file,
+            name, paths[name], total_packages, checksum_types, compressions, queue, results
+        )
+        workers.append((queue, process))
+
+    def send(batch):
+        for queue, process in workers:
+            while True:
+                try:
+                    queue.put(batch, timeout=1)
+                    break
+                except Full:
+                    if process.exitcode is not None:
+                        # the process failed, its error is received with the results
+                        break
+
+    try:
+        fields = PUBLISHED_PACKAGE_FIELDS + tuple(packages.query.annotations)
+        batch = []
+        for values in packages.values(*fields).iterator():
+            batch.append(values)
+            if len(batch) >= PUBLISH_BATCH_SIZE:
+                send(pickle.dumps(batch))
+                batch.clear()
+        if batch:
+            send(pickle.dumps(batch))
+        send(None)
+
+        records = []
+        for _i in range(len(workers)):
+            while True:
+                try:
+                    name, worker_records = results.get(timeout=1)
+                    break
+                except Empty:
+                    if any(process.exitcode for _queue, process in workers):
+                        raise cr.CreaterepoCError(
+                            _("Writing of package metadata failed unexpectedly")
+                        )
+            if isinstance(worker_records, str):
+                raise cr.CreaterepoCError(worker_records)
+            for attrs in worker_records:
+                record = cr.RepomdRecord(attrs["type"], None)
+                for attr, value in attrs.items():
+                    setattr(record, attr, value)
+                records.append(record)
+    finally:
+        for queue, process in workers:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+            # batches which a failed process didn't receive are dropped
+            queue.cancel_join_thread()
+    return sort_package_repomdrecords(records)
+
+
+@profiled
+def publish(repository_version_pk, metadata_signing_service=None, checksum_types=None,
+            sqlite_metadata=True, compression_type=None):
     """
     Create a Publication based on a RepositoryVersion.
 
@@ -238,6 +824,9 @@ def publish(repository_version_pk, metadata_signing_service=None, checksum_types
         metadata_signing_service (pulpcore.app.models.AsciiArmoredDetachedSigningService):
             A reference to an associated signing service.
         checksum_types (dict): Checksum types for metadata and packages.
+        sqlite_metadata (bool): Whether to publish sqlite databases of package metadata.
+        compression_type (str): Compression of metadata, one of COMPRESSION_TYPES. By default,
+            xml metadata is compressed with gzip and sqlite databases with bzip2.
 
     """
     repository_version = RepositoryVersion.objects.get(pk=repository_version_pk)
@@ -258,6 +847,11 @@ def publish(repository_version_pk, metadata_signing_service=None, checksum_types
                 "package", CHECKSUM_TYPES.SHA256)
             publication.metadata_checksum_type = checksum_types.get(
                 "metadata", original_metadata_checksum_type)
+            publication.sqlite_metadata = sqlite_metadata
+            publication.compression_type = compression_type
+            previous_publication = None
+            if settings.RPM_INCREMENTAL_PUBLISH:
+                previous_publication = PreviousPublication.find(publication)
             publication_data = PublicationData(publication)
             publication_data.populate()
 
@@ -266,7 +860,10 @@ def publish(repository_version_pk, metadata_signing_service=None, checksum_types
             # Main repo
             create_repomd_xml(
                 content, publication, checksum_types, publication_data.repomdrecords,
-                metadata_signing_service=metadata_signing_service
+                metadata_signing_service=metadata_signing_service,
+                sqlite_metadata=sqlite_metadata,
+                compression_type=compression_type,
+                previous_publication=previous_publication
             )
 
             for sub_repo in publication_data.sub_repos:
@@ -276,12 +873,16 @@ def publish(repository_version_pk, metadata_signing_service=None, checksum_types
                 extra_repomdrecords = getattr(publication_data, f"{name}_repomdrecords")
                 create_repomd_xml(
                     content, publication, checksum_types, extra_repomdrecords, name,
-                    metadata_signing_service=metadata_signing_service
+                    metadata_signing_service=metadata_signing_service,
+                    sqlite_metadata=sqlite_metadata,
+                    compression_type=compression_type,
+                    previous_publication=previous_publication
                 )
 
 
 def create_repomd_xml(content, publication, checksum_types, extra_repomdrecords,
-                      sub_folder=None, metadata_signing_service=None):
+                      sub_folder=None, metadata_signing_service=None, sqlite_metadata=True,
+                      compression_type=None, previous_publication=None):
     """
     Creates a repomd.xml file.
 
@@ -292,13 +893,17 @@ def create_repomd_xml(content, publication, checksum_types, extra_repomdrecords,
         sub_folder(str): name of the folder for sub repos
         metadata_signing_service (pulpcore.app.models.AsciiArmoredDetachedSigningService):
             A reference to an associated signing service.
+        sqlite_metadata (bool): Whether to create sqlite databases of package metadata.
+        compression_type (str): Compression of metadata, one of COMPRESSION_TYPES, or None
+            for the defaults.
+        previous_publication (PreviousPublication): A publication to reuse unchanged metadata
+            from, or None to create all metadata.
 
     """
     cwd = os.getcwd()
     repodata_path = REPODATA_PATH
     has_modules = False
     has_comps = False
-    package_checksum_type = checksum_types.get("package")
 
     if sub_folder:
         cwd = os.path.join(cwd, sub_folder)
@@ -306,125 +911,115 @@ def create_repomd_xml(content, publication, checksum_types, extra_repomdrecords,
 
     # Prepare metadata files
     repomd_path = os.path.join(cwd, "repomd.xml")
-    pri_xml_path = os.path.join(cwd, "primary.xml.gz")
-    fil_xml_path = os.path.join(cwd, "filelists.xml.gz")
-    oth_xml_path = os.path.join(cwd, "other.xml.gz")
-    pri_db_path = os.path.join(cwd, "primary.sqlite")
-    fil_db_path = os.path.join(cwd, "filelists.sqlite")
-    oth_db_path = os.path.join(cwd, "other.sqlite")
-    upd_xml_path = os.path.join(cwd, "updateinfo.xml.gz")
+    compressions = get_compression_types(compression_type)
+    xml_compression = compressions[0]
+    pri_xml_path = compressed_path(os.path.join(cwd, "primary.xml"), xml_compression)
+    fil_xml_path = compressed_path(os.path.join(cwd, "filelists.xml"), xml_compression)
+    oth_xml_path = compressed_path(os.path.join(cwd, "other.xml"), xml_compression)
+    pri_db_path = os.path.join(cwd, "primary.sqlite") if sqlite_metadata else None
+    fil_db_path = os.path.join(cwd, "filelists.sqlite") if sqlite_metadata else None
+    oth_db_path = os.path.join(cwd, "other.sqlite") if sqlite_metadata else None
+    upd_xml_path = compressed_path(os.path.join(cwd, "updateinfo.xml"), xml_compression)
     mod_yml_path = os.path.join(cwd, "modules.yaml")
     comps_xml_path = os.path.join(cwd, "comps.xml")
 
-    pri_xml = cr.PrimaryXmlFile(pri_xml_path)
-    fil_xml = cr.FilelistsXmlFile(fil_xml_path)
-    oth_xml = cr.OtherXmlFile(oth_xml_path)
-    pri_db = cr.PrimarySqlite(pri_db_path)
-    fil_db = cr.FilelistsSqlite(fil_db_path)
-    oth_db = cr.OtherSqlite(oth_db_path)
-    upd_xml = cr.UpdateInfoXmlFile(upd_xml_path)
-
-    packages = Package.objects.filter(pk__in=content)
-    total_packages = packages.count()
-
-    pri_xml.set_num_of_pkgs(total_packages)
-    fil_xml.set_num_of_pkgs(total_packages)
-    oth_xml.set_num_of_pkgs(total_packages)
+    fingerprints = get_metadata_fingerprints(
+        content, checksum_types, sqlite_metadata, compression_type
+    )
+    publication.metadata_fingerprints[sub_folder or ""] = fingerprints
+    reused = {}
+    if previous_publication:
+        reused = previous_publication.reuse_metadata(publication, fingerprints, sub_folder)
 
     # Process all packages
-    for package in packages.iterator():
-        pkg = package.to_createrepo_c(package_checksum_type)
-        pkg_filename = os.path.basename(package.location_href)
-        # this can cause an issue when two same RPM package names appears
-        # a/name1.rpm b/name1.rpm
-        pkg.location_href = os.path.join(
-            PACKAGES_DIRECTORY,
-            pkg_filename[0].lower(),
-            pkg_filename
-        )
-        pri_xml.add_pkg(pkg)
-        fil_xml.add_pkg(pkg)
-        oth_xml.add_pkg(pkg)
-        pri_db.add_pkg(pkg)
-        fil_db.add_pkg(pkg)
-        oth_db.add_pkg(pkg)
+    if "packages" in reused:
+        package_repomdrecords = []
+    else:
+        packages = Package.objects.filter(pk__in=content)
+        fill_package_details(packages)
+        total_packages = packages.count()
+        packages = annotate_package_pkgids(packages, checksum_types.get("package"))
+
+        package_metadata_paths = {
+            "primary": (pri_xml_path, pri_db_path),
+            "filelists": (fil_xml_path, fil_db_path),
+            "other": (oth_xml_path, oth_db_path),
+        }
+        if settings.RPM_PARALLEL_PUBLISH:
+            package_repomdrecords = write_package_metadata_in_parallel(
+                packages, total_packages, package_metadata_paths, checksum_types, compressions
+            )
+        else:
+            package_repomdrecords = write_package_metadata(
+                packages, total_packages, package_metadata_paths, checksum_types, compressions
+            )
+
+    repomdrecords = []
 
     # Process update records
-    for update_record in UpdateRecord.objects.filter(pk__in=content).iterator():
-        upd_xml.add_chunk(cr.xml_dump_updaterecord(update_record.to_createrepo_c()))
+    if "updateinfo" not in reused:
+        upd_xml = cr.UpdateInfoXmlFile(upd_xml_path, xml_compression)
+        for update_record in UpdateRecord.objects.filter(pk__in=content).iterator():
+            upd_xml.add_chunk(cr.xml_dump_updaterecord(update_record.to_createrepo_c()))
+        upd_xml.close()
+        repomdrecords.append(("updateinfo", upd_xml_path))
 
     # Process modulemd and modulemd_defaults
-    with open(mod_yml_path, 'ab') as mod_yml:
-        for modulemd in Modulemd.objects.filter(pk__in=content).iterator():
-            mod_yml.write(modulemd._artifacts.get().file.read())
-            has_modules = True
-        for default in ModulemdDefaults.objects.filter(pk__in=content).iterator():
-            mod_yml.write(default._artifacts.get().file.read())
-            has_modules = True
+    if "modules" not in reused:
+        with open(mod_yml_path, 'ab') as mod_yml:
+            for modulemd in Modulemd.objects.filter(pk__in=content).iterator():
+                mod_yml.write(modulemd._artifacts.get().file.read())
+                has_modules = True
+            for default in ModulemdDefaults.objects.filter(pk__in=content).iterator():
+                mod_yml.write(default._artifacts.get().file.read())
+                has_modules = True
 
-    # Process comps
-    comps = libcomps.Comps()
-    for pkg_grp in PackageGroup.objects.filter(pk__in=content).iterator():
-        group = pkg_grp.pkg_grp_to_libcomps()
-        comps.groups.append(group)
-        has_comps = True
-    for pkg_cat in PackageCategory.objects.filter(pk__in=content).iterator():
-        cat = pkg_cat.pkg_cat_to_libcomps()
-        comps.categories.append(cat)
-        has_comps = True
-    for pkg_env in PackageEnvironment.objects.filter(pk__in=content).iterator():
-        env = pkg_env.pkg_env_to_libcomps()
-        comps.environments.append(env)
-        has_comps = True
-    for pkg_lng in PackageLangpacks.objects.filter(pk__in=content).iterator():
-        comps.langpacks = dict_to_strdict(pkg_lng.matches)
-        has_comps = True
-
-    comps.toxml_f(comps_xml_path, xml_options={"default_explicit": True,
-                                               "empty_groups": True,
-                                               "uservisible_explicit": True})
-
-    pri_xml.close()
-    fil_xml.close()
-    oth_xml.close()
-    upd_xml.close()
+    if has_modules:
+        repomdrecords.append(("modules", mod_yml_path))
 
-    repomd = cr.Repomd()
+    # Process comps
+    if "group" not in reused:
+        comps = libcomps.Comps()
+        for pkg_grp in PackageGroup.objects.filter(pk__in=content).iterator():
+            group = pkg_grp.pkg_grp_to_libcomps()
+            comps.groups.append(group)
+            has_comps = True
+        for pkg_cat in PackageCategory.objects.filter(pk__in=content).iterator():
+            cat = pkg_cat.pkg_cat_to_libcomps()
+            comps.categories.append(cat)
+            has_comps = True
+        for pkg_env in PackageEnvironment.objects.filter(pk__in=content).iterator():
+            env = pkg_env.pkg_env_to_libcomps()
+            comps.environments.append(env)
+            has_comps = True
+        for pkg_lng in PackageLangpacks.objects.filter(pk__in=content).iterator():
+            comps.langpacks = dict_to_strdict(pkg_lng.matches)
+            has_comps = True
+
+        comps.toxml_f(comps_xml_path, xml_options=COMPS_XML_OPTIONS)
 
-    repomdrecords = [("primary", pri_xml_path, pri_db),
-                     ("filelists", fil_xml_path, fil_db),
-                     ("other", oth_xml_path, oth_db),
-                     ("primary_db", pri_db_path, None),
-                     ("filelists_db", fil_db_path, None),
-                     ("other_db", oth_db_path, None),
-                     ("updateinfo", upd_xml_path, None)]
+    if has_comps:
+        repomdrecords.append(("group", comps_xml_path))
 
-    if has_modules:
-        repomdrecords.append(("modules", mod_yml_path, None))
+    repomdrecords.extend(record[:2] for record in extra_repomdrecords)
 
-    if has_comps:
-        repomdrecords.append(("group", comps_xml_path, None))
+    repomd = cr.Repomd()
 
-    repomdrecords.extend(extra_repomdrecords)
+    # the reused metadata is already published
+    for records in reused.values():
+        for record in records:
+            repomd.set_record(record)
 
-    sqlite_files = ("primary_db", "filelists_db", "other_db")
-    for name, path, db_to_update in repomdrecords:
+    filled_repomdrecords = list(package_repomdrecords)
+    for name, path in repomdrecords:
         record = cr.RepomdRecord(name, path)
-        checksum_type = get_checksum_type(name, checksum_types)
-        if name in sqlite_files:
-            record_bz = record.compress_and_fill(checksum_type, cr.BZ2)
-            record_bz.type = name
-            record_bz.rename_file()
-            path = record_bz.location_href.split('/')[-1]
-            repomd.set_record(record_bz)
-        else:
-            record.fill(checksum_type)
-            if (db_to_update):
-                db_to_update.dbinfo_update(record.checksum)
-                db_to_update.close()
-            record.rename_file()
-            path = record.location_href.split('/')[-1]
-            repomd.set_record(record)
+        record.fill(get_checksum_type(name, checksum_types))
+        record.rename_file()
+        filled_repomdrecords.append(record)
+
+    for record in filled_repomdrecords:
+        repomd.set_record(record)
+        path = record.location_href.split('/')[-1]
 
         if sub_folder:
             path = os.path.join(sub_folder, path)
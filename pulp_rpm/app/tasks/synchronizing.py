@@ -2,20 +2,29 @@ import asyncio
 import gzip
 import logging
 import os
+import pickle
 import re
+import shutil
+import tempfile
+import time
 
 from collections import defaultdict
-from functools import partial
+from contextlib import ExitStack
+from functools import partial, reduce
 from gettext import gettext as _  # noqa:F401
+from queue import Empty
 from urllib.parse import urljoin
 
-from django.db import transaction
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 
-from aiohttp.client_exceptions import ClientResponseError
+from aiohttp.client_exceptions import ClientError, ClientResponseError
 from aiohttp.web_exceptions import HTTPNotFound
 import createrepo_c as cr
 import libcomps
 
+from pulpcore.plugin.download import DownloadResult
 from pulpcore.plugin.models import (
     Artifact,
     ProgressReport,
@@ -24,25 +33,32 @@ from pulpcore.plugin.models import (
 from pulpcore.plugin.stages import (
     ArtifactDownloader,
     ArtifactSaver,
+    ContentAssociation,
     ContentSaver,
+    create_pipeline,
     DeclarativeArtifact,
     DeclarativeContent,
     DeclarativeVersion,
+    EndStage,
     RemoteArtifactSaver,
     Stage,
     QueryExistingArtifacts,
     QueryExistingContents
 )
+from pulpcore.plugin.tasking import WorkingDirectory
 
 from pulp_rpm.app.advisory import hash_update_record
 from pulp_rpm.app.constants import (
     CHECKSUM_TYPES,
     COMPS_REPODATA,
+    DEFERRED_DETAILS_REPODATA,
     DIST_TREE_MAIN_REPO_PATH,
     MODULAR_REPODATA,
     PACKAGE_DB_REPODATA,
     PACKAGE_REPODATA,
+    PACKAGE_ZCK_REPODATA,
     PULP_MODULE_ATTR,
+    PULP_PACKAGE_ATTRS,
     PULP_MODULEDEFAULTS_ATTR,
     SKIP_REPODATA,
     UPDATE_REPODATA
@@ -70,12 +86,21 @@ from pulp_rpm.app.models import (
 )
 from pulp_rpm.app.modulemd import (
     parse_defaults,
-    parse_modulemd,
+    parse_modulemd_in_chunks,
 )
 from pulp_rpm.app.kickstart.treeinfo import get_treeinfo_data
+from pulp_rpm.app.metrics import PhaseMetrics, report_metrics
+from pulp_rpm.app import processes
+from pulp_rpm.app.package_details import (
+    fill_package_details_from,
+    parse_package_details,
+    save_package_details,
+)
+from pulp_rpm.app.profiling import profiled
 
 from pulp_rpm.app.comps import strdict_to_dict, dict_digest
 from pulp_rpm.app.shared_utils import is_previous_version
+from pulp_rpm.app.zchunk import decompress_zchunk, download_zchunk
 
 import gi
 gi.require_version('Modulemd', '2.0')
@@ -83,16 +108,342 @@ from gi.repository import Modulemd as mmdlib  # noqa: E402
 
 log = logging.getLogger(__name__)
 
+# Package fields which are needed to sync a package which is already in Pulp
+KNOWN_PACKAGE_FIELDS = (
+    'pk', 'name', 'epoch', 'version', 'release', 'arch', 'pkgId', 'checksum_type',
+    'location_href', 'size_package', 'is_modular',
+)
+
+# Number of packages which are already in Pulp loaded from the database at once
+KNOWN_PACKAGES_BATCH_SIZE = 1000
+# Number of packages sent at once by a repodata parsing process
+PARSE_BATCH_SIZE = 500
+# Number of batches a repodata parsing process can send ahead before it waits
+PARSE_QUEUE_SIZE = 8
+
 
-def repodata_exists(remote, url):
+class FetchedMetadata:
     """
-    Check if repodata exists.
+    Metadata files which were already downloaded during a sync, with their URL as a key.
 
+    Metadata files, e.g. repomd.xml, are needed at several places during a sync. The cache allows
+    to download each of them only once.
     """
-    downloader = remote.get_downloader(url=urljoin(url, "repodata/repomd.xml"))
 
+    def __init__(self):
+        """Initialize an empty cache."""
+        self.results = {}
+
+    def get(self, url):
+        """
+        Get a result of an already finished download.
+
+        Args:
+            url (str): The URL of a metadata file
+
+        Returns:
+            pulpcore.plugin.download.DownloadResult: The result of the download or None
+
+        """
+        return self.results.get(url)
+
+    def add(self, result):
+        """
+        Store a result of a download, unless nothing was downloaded.
+
+        Args:
+            result (pulpcore.plugin.download.DownloadResult): The result of a download
+
+        """
+        if result.path is not None:
+            self.results[result.url] = result
+
+    def fetch(self, remote, url, **kwargs):
+        """
+        Download a metadata file, unless it has been downloaded already.
+
+        Args:
+            remote (RpmRemote): The remote to download from
+            url (str): The URL of a metadata file
+            kwargs (dict): Additional parameters for the downloader
+
+        Returns:
+            pulpcore.plugin.download.DownloadResult: The result of the download
+
+        """
+        result = self.get(url)
+        if result is None:
+            result = remote.get_downloader(url=url, **kwargs).fetch()
+            self.add(result)
+        return result
+
+    async def run(self, remote, url, **kwargs):
+        """
+        Download a metadata file, unless it has been downloaded already. This is a coroutine.
+
+        Args:
+            remote (RpmRemote): The remote to download from
+            url (str): The URL of a metadata file
+            kwargs (dict): Additional parameters for the downloader
+
+        Returns:
+            pulpcore.plugin.download.DownloadResult: The result of the download
+
+        """
+        result = self.get(url)
+        if result is None:
+            result = await remote.get_downloader(url=url, **kwargs).run()
+            self.add(result)
+        return result
+
+
+class SyncCheckpoint:
+    """
+    Progress of a sync of a repository, stored on the repository when the sync fails.
+
+    Metadata files listed in repomd.xml are downloaded into the task working directory as
+    usual. If the sync fails, the downloaded files are kept as artifacts and the content which
+    was saved in batches is recorded on the repository. A retried sync of the same repomd.xml
+    revision takes the kept files instead of downloading them again and reuses the recorded
+    advisories instead of hashing them again.
+
+    When a sync finishes, the kept files which no content refers to are deleted.
+    """
+
+    def __init__(self, repository, remote):
+        """
+        Initialize the checkpoint of a sync.
+
+        Args:
+            repository (RpmRepository): The repository being synced
+            remote (RpmRemote): The remote to download from
+
+        """
+        self.repository = repository
+        self.remote = remote
+        self.remote_url = None
+        self.revision = None
+        # results of the downloads of this sync with the URL as a key
+        self.downloaded = {}
+        # pks of the content saved by this sync
+        self.saved_content = []
+
+    def start(self, remote_url, revision):
+        """
+        Continue from the checkpoint of the repository if it is for the same metadata.
+
+        Args:
+            remote_url (str): The URL of the remote repository
+            revision (str): The revision of the remote repomd.xml
+
+        """
+        self.remote_url = remote_url
+        self.revision = revision
+        if self.resumed:
+            log.info(_('Resuming the sync of {url}, revision {revision}').format(
+                url=remote_url, revision=revision
+            ))
+
+    @property
+    def resumed(self):
+        """
+        The checkpoint of a failed sync which this sync continues from.
+
+        Returns:
+            dict: The stored checkpoint, empty if this sync doesn't continue from any
+
+        """
+        checkpoint = self.repository.sync_checkpoint
+        if self.revision is None or checkpoint.get('url') != self.remote_url or \
+                checkpoint.get('revision') != self.revision:
+            return {}
+        return checkpoint
+
+    def get_resumed_content(self):
+        """
+        Get pks of the content saved by the failed sync which this sync continues from.
+
+        Returns:
+            list: pks of the content
+
+        """
+        return self.resumed.get('content', [])
+
+    def record_saved(self, batch):
+        """
+        Record a batch of content which has been saved.
+
+        Args:
+            batch (list): DeclarativeContent of the saved content
+
+        """
+        self.saved_content.extend(str(d_content.content.pk) for d_content in batch)
+
+    def keep(self):
+        """
+        Store the checkpoint on the repository, so that a retried sync continues from it.
+
+        It is meant for a sync which has failed. The downloaded metadata files are saved as
+        artifacts from the working directory of the task, the ones which were saved by the sync
+        already are looked up by their sha256 checksum.
+        """
+        if self.revision is None:
+            # the sync failed before the revision of the metadata was known
+            return
+
+        resumed = self.resumed
+        metadata = dict(resumed.get('metadata', {}))
+        for url, result in self.downloaded.items():
+            sha256 = self._keep_file(result)
+            if sha256:
+                metadata[url] = sha256
+        content = list(dict.fromkeys(resumed.get('content', []) + self.saved_content))
+
+        self.repository.sync_checkpoint = {
+            'url': self.remote_url,
+            'revision': self.revision,
+            'metadata': metadata,
+            'content': content,
+        }
+        RpmRepository.objects.filter(pk=self.repository.pk).update(
+            sync_checkpoint=self.repository.sync_checkpoint
+        )
+
+    @staticmethod
+    def _keep_file(result):
+        """
+        Save a downloaded metadata file as an artifact.
+
+        Args:
+            result (pulpcore.plugin.download.DownloadResult): The result of the download
+
+        Returns:
+            str: The sha256 checksum of the artifact, or None if the file is gone
+
+        """
+        sha256 = result.artifact_attributes.get('sha256')
+        if not os.path.exists(result.path):
+            # the file was moved into the artifact storage by the sync
+            if sha256 and Artifact.objects.filter(sha256=sha256).exists():
+                return sha256
+            return None
+        if sha256:
+            artifact = Artifact(file=result.path, **result.artifact_attributes)
+        else:
+            artifact = Artifact.init_and_validate(result.path)
+        try:
+            with transaction.atomic():
+                artifact.save()
+        except IntegrityError:
+            pass
+        return artifact.sha256
+
+    @staticmethod
+    def clear(repositories):
+        """
+        Clear checkpoints of repositories which have finished their sync.
+
+        The kept files which no content refers to are deleted, unless a checkpoint of another
+        repository keeps them too.
+
+        Args:
+            repositories (list): RpmRepository instances
+
+        """
+        kept_sha256s = set()
+        for repository in repositories:
+            kept_sha256s.update(repository.sync_checkpoint.get('metadata', {}).values())
+            repository.sync_checkpoint = {}
+        RpmRepository.objects.filter(
+            pk__in=[repository.pk for repository in repositories]
+        ).update(sync_checkpoint={})
+
+        other_checkpoints = RpmRepository.objects.exclude(sync_checkpoint={}).values_list(
+            'sync_checkpoint', flat=True
+        )
+        for checkpoint in other_checkpoints:
+            kept_sha256s.difference_update(checkpoint.get('metadata', {}).values())
+        unused_artifacts = Artifact.objects.filter(
+            sha256__in=kept_sha256s, contentartifact__isnull=True
+        )
+        for artifact in unused_artifacts.iterator():
+            # deletes the file too
+            artifact.delete()
+
+    def get_downloader(self, url):
+        """
+        Get a downloader of a metadata file which takes the kept file if there is one.
+
+        Args:
+            url (str): The URL of a metadata file
+
+        Returns:
+            CheckpointDownloader: The downloader
+
+        """
+        return CheckpointDownloader(self, url)
+
+    def get_kept(self, url):
+        """
+        Get a metadata file kept by a failed sync.
+
+        Args:
+            url (str): The URL of a metadata file
+
+        Returns:
+            pulpcore.plugin.download.DownloadResult: The result with a copy of the file or None
+
+        """
+        sha256 = self.resumed.get('metadata', {}).get(url)
+        artifact = Artifact.objects.filter(sha256=sha256).first() if sha256 else None
+        if not artifact:
+            return None
+        path = tempfile.NamedTemporaryFile(dir=os.getcwd(), delete=False).name
+        with artifact.file.open('rb') as artifact_file, open(path, 'wb') as kept_file:
+            shutil.copyfileobj(artifact_file, kept_file)
+        return DownloadResult(url=url, artifact_attributes={}, path=path, headers=None)
+
+
+class CheckpointDownloader:
+    """
+    A downloader of a metadata file which takes the file kept by a failed sync if there is one.
+    """
+
+    def __init__(self, checkpoint, url):
+        """
+        Store the checkpoint and the URL of the file.
+
+        Args:
+            checkpoint (SyncCheckpoint): The checkpoint of the sync
+            url (str): The URL of a metadata file
+
+        """
+        self.checkpoint = checkpoint
+        self.url = url
+
+    async def run(self):
+        """
+        Download the metadata file, or take the kept one. This is a coroutine.
+
+        Returns:
+            pulpcore.plugin.download.DownloadResult: The result of the download
+
+        """
+        loop = asyncio.get_event_loop()
+        result = await loop.run_in_executor(None, self.checkpoint.get_kept, self.url)
+        if result is None:
+            result = await self.checkpoint.remote.get_downloader(url=self.url).run()
+            self.checkpoint.downloaded[self.url] = result
+        return result
+
+
+def repodata_exists(remote, url, fetched_metadata):
+    """
+    Check if repodata exists.
+
+    """
     try:
-        downloader.fetch()
+        fetched_metadata.fetch(remote, urljoin(url, "repodata/repomd.xml"))
     except ClientResponseError as exc:
         if 404 == exc.status:
             return False
@@ -102,36 +453,438 @@ def repodata_exists(remote, url):
     return True
 
 
-def fetch_mirror(remote):
-    """Fetch the first valid mirror from a list of all available mirrors from a mirror list feed.
+def read_mirror_list(remote):
+    """Get URLs of mirrors from a mirror list feed.
 
     URLs which are commented out or have any punctuations in front of them are being ignored.
+
+    Returns:
+        list: URLs of the mirrors
+
     """
     downloader = remote.get_downloader(url=remote.url.rstrip("/"))
     result = downloader.fetch()
 
+    mirror_urls = []
     url_pattern = re.compile(r"(^|^[\w\s=]+\s)((http(s)?)://.*)")
     with open(result.path) as mirror_list_file:
         for mirror in mirror_list_file:
             match = re.match(url_pattern, mirror)
-            if match and repodata_exists(remote, match.group(2)):
-                return match.group(2)
+            if match:
+                mirror_urls.append(match.group(2).strip().rstrip("/") + "/")
+    return mirror_urls
+
+
+async def probe_mirror(remote, mirror_url, fetched_metadata):
+    """Download repomd.xml of a mirror and measure how long the mirror took to respond.
+
+    Only the request is limited by `RPM_MIRROR_PROBE_TIMEOUT`, not the wait for a free slot of
+    the download concurrency of the remote.
+
+    Returns:
+        tuple: The URL of the mirror, its latency and the revision of its repomd.xml, or None if
+            the mirror isn't available or its repomd.xml is not valid
+
+    """
+    downloader = remote.get_downloader(
+        url=urljoin(mirror_url, "repodata/repomd.xml"), timeout=settings.RPM_MIRROR_PROBE_TIMEOUT
+    )
+    try:
+        result = await downloader.run()
+    except (ClientError, FileNotFoundError, asyncio.TimeoutError):
+        return None
+    try:
+        revision = cr.Repomd(result.path).revision
+    except cr.CreaterepoCError:
+        return None
+    if not revision:
+        # e.g. an HTML error page
+        return None
+    fetched_metadata.add(result)
+    return mirror_url, downloader.latency, revision
+
+
+def probe_mirrors(remote, mirror_urls, fetched_metadata):
+    """Probe mirrors at once.
+
+    Returns:
+        list: Results of probe_mirror() of the available mirrors, in the order of mirror_urls
+
+    """
+    loop = asyncio.get_event_loop()
+    probes = loop.run_until_complete(asyncio.gather(*[
+        probe_mirror(remote, url, fetched_metadata) for url in mirror_urls
+    ]))
+    return [probe for probe in probes if probe]
+
+
+def sort_probes(probes):
+    """Rank probed mirrors.
 
-    return None
+    Mirrors with the newest repomd.xml go first, ordered by the time they took to respond.
 
+    Returns:
+        list: URLs of the mirrors, the best one first
 
-def fetch_remote_url(remote):
-    """Fetch a single remote from which can be content synced."""
+    """
+    if not probes:
+        return []
+
+    newest_revision = reduce(
+        lambda newest, revision: revision if is_previous_version(newest, revision) else newest,
+        [probe[2] for probe in probes]
+    )
+    probes = sorted(probes, key=lambda probe: (
+        not is_previous_version(newest_revision, probe[2]), probe[1] or 0
+    ))
+    return [probe[0] for probe in probes]
+
+
+def rank_mirrors(remote, fetched_metadata):
+    """Get available mirrors from a mirror list feed, the best one first.
+
+    Mirrors which don't respond in `RPM_MIRROR_PROBE_TIMEOUT` seconds are left out. The ranking
+    of mirrors is stored on the remote and reused for `RPM_MIRROR_RANKING_TTL` seconds, the
+    ranked mirrors are probed again to leave out the ones which became unavailable.
+
+    Returns:
+        list: URLs of available mirrors, the best one first
+
+    """
+    ranking = remote.mirror_ranking
+    ranking_age = time.time() - ranking.get("ranked_at", 0)
+    if ranking.get("url") == remote.url and ranking_age < settings.RPM_MIRROR_RANKING_TTL:
+        probes = probe_mirrors(remote, ranking["mirrors"], fetched_metadata)
+        if probes:
+            return [probe[0] for probe in probes]
+
+    ranked_at = time.time()
+    probes = probe_mirrors(remote, read_mirror_list(remote), fetched_metadata)
+    mirrors = sort_probes(probes)
+    store_mirror_ranking(remote, {"url": remote.url, "ranked_at": ranked_at, "mirrors": mirrors})
+    return mirrors
+
+
+def store_mirror_ranking(remote, ranking):
+    """Store a ranking of mirrors on the remote, unless a concurrent sync stored a newer one.
+
+    Syncs from the same remote can rank its mirrors at the same time. The remote is locked while
+    the ranking is stored, and the ranking which was started last is kept.
+
+    Args:
+        remote (RpmRemote): The remote with a mirror list feed
+        ranking (dict): The URL of the remote, when the mirrors started to be probed and the URLs
+            of the available mirrors, the best one first
+
+    """
+    with transaction.atomic():
+        stored_ranking = RpmRemote.objects.select_for_update(of=("self",)).filter(
+            pk=remote.pk
+        ).values_list("mirror_ranking", flat=True).get()
+        if stored_ranking.get("url") == ranking["url"] and \
+                stored_ranking.get("ranked_at", 0) > ranking["ranked_at"]:
+            remote.mirror_ranking = stored_ranking
+            return
+        # update() doesn't change pulp_last_updated of the remote which is used to optimize sync
+        RpmRemote.objects.filter(pk=remote.pk).update(mirror_ranking=ranking)
+    remote.mirror_ranking = ranking
+
+
+def fetch_remote_urls(remote, fetched_metadata):
+    """Fetch URLs from which can be content synced, the best one first.
+
+    It is the URL of the remote itself, or available mirrors if the remote is a mirror list feed.
+    """
     remote_url = remote.url.rstrip("/") + "/"
-    downloader = remote.get_downloader(url=urljoin(remote_url, "repodata/repomd.xml"))
     try:
-        downloader.fetch()
+        fetched_metadata.fetch(remote, urljoin(remote_url, "repodata/repomd.xml"))
+    except (ClientResponseError, FileNotFoundError):
+        return rank_mirrors(remote, fetched_metadata)
+    else:
+        return [remote_url]
+
+
+def is_sync_optimizable(remote, repository):
+    """
+    Check whether nothing but the remote metadata can differ from the last sync of a repository.
+
+    Args:
+        remote (RpmRemote): The remote to sync from
+        repository (RpmRepository): The repository to sync into
+
+    Returns:
+        bool: True if the sync can be skipped when the remote metadata hasn't changed
+
+    """
+    # Caution: we are not storing when the remote was last updated, so the order of this
+    # logic must remain in this order where we first check the version number as other
+    # changes than sync could have taken place such that the date or repo version will be
+    # different from last sync
+    return bool(
+        repository.last_sync_remote and
+        remote.pk == repository.last_sync_remote.pk and
+        repository.last_sync_repo_version == repository.latest_version().number and
+        remote.pulp_last_updated <= repository.latest_version().pulp_created
+    )
+
+
+def get_repomd_validators(remote, repository, url):
+    """
+    Get HTTP validators of repomd.xml which was downloaded from the url before.
+
+    Validators are provided only when the sync can be optimized, because a conditional request
+    doesn't return any repomd.xml if it hasn't changed.
+
+    Args:
+        remote (RpmRemote): The remote to sync from
+        repository (RpmRepository): The repository to sync into
+        url (str): The URL of repomd.xml
+
+    Returns:
+        dict: ETag, Last-Modified and the revision of repomd.xml or None
+
+    """
+    if not url.startswith(('http://', 'https://')):
+        return None
+    if not is_sync_optimizable(remote, repository):
+        return None
+    return remote.metadata_validators.get(url)
+
+
+def store_repomd_validators(remote, url, result, revision):
+    """
+    Store HTTP validators of downloaded repomd.xml, so it can be requested conditionally.
+
+    Args:
+        remote (RpmRemote): The remote repomd.xml was downloaded from
+        url (str): The URL of repomd.xml
+        result (pulpcore.plugin.download.DownloadResult): The result of the download
+        revision (str): The revision of the downloaded repomd.xml
+
+    """
+    headers = result.headers or {}
+    validators = {}
+    if headers.get('ETag'):
+        validators['etag'] = headers['ETag']
+    if headers.get('Last-Modified'):
+        validators['last_modified'] = headers['Last-Modified']
+
+    if not validators and url not in remote.metadata_validators:
+        return
+
+    if validators:
+        validators['revision'] = revision
+        remote.metadata_validators[url] = validators
+    else:
+        del remote.metadata_validators[url]
+
+    # update() doesn't change pulp_last_updated of the remote which is used to optimize sync
+    RpmRemote.objects.filter(pk=remote.pk).update(
+        metadata_validators=remote.metadata_validators
+    )
+
+
+def repomd_not_modified(remote, repository, fetched_metadata):
+    """
+    Check with a conditional request that repomd.xml hasn't changed since the last sync.
+
+    Repositories with a distribution tree are never reported as not modified, because
+    the sub-repositories of the distribution tree need to be checked too.
+
+    Args:
+        remote (RpmRemote): The remote to sync from
+        repository (RpmRepository): The repository to sync into
+        fetched_metadata (FetchedMetadata): Metadata already downloaded during this sync
+
+    Returns:
+        bool: True if the whole sync can be skipped
+
+    """
+    url = urljoin(remote.url.rstrip("/") + "/", "repodata/repomd.xml")
+    validators = get_repomd_validators(remote, repository, url)
+    if not validators:
+        return False
+
+    disttree_pulp_type = DistributionTree.get_pulp_type()
+    if repository.latest_version().content.filter(pulp_type=disttree_pulp_type).exists():
+        return False
+
+    try:
+        result = fetched_metadata.fetch(remote, url, validators=validators)
     except (ClientResponseError, FileNotFoundError):
-        return fetch_mirror(remote)
+        return False
+
+    return result.path is None and is_previous_version(
+        validators['revision'], repository.last_sync_revision_number
+    )
+
+
+def parse_repodata_file(repodata_type, xml_path, pkgids, batch_size, queue):
+    """
+    Parse files or changelogs of packages from filelists.xml or other.xml.
+
+    It is meant to run in a separate process. Each message sent to the queue is a tuple of its
+    kind and a payload. The parsed data are sent as 'data' messages with batches of
+    (pkgId, data) tuples, the data of a package are a dict with only its files or only its
+    changelogs. A 'data' message with None is sent when the parsing is finished. Warnings and
+    a failure are sent as 'warning' and 'error' messages, so that they are logged by the parent
+    process.
+
+    Args:
+        repodata_type(str): 'filelists' or 'other'
+        xml_path(str): a path to a downloaded repodata file
+        pkgids(set): pkgIds of packages to parse, other packages are skipped
+        batch_size(int): number of packages sent at once
+        queue(multiprocessing.Queue): a queue to send the parsed data to
+
+    """
+    batch = []
+
+    def warningcb(warning_type, message):
+        """
+        A callback which is used when a non-fatal problem is encountered during parsing.
+
+        Args:
+            warning_type(int): a type of the warning, one of createrepo_c.XML_WARNING_*
+            message(str): a description of the warning
+
+        Returns:
+            bool: True, to continue parsing
+
+        """
+        queue.put(('warning', message))
+        return True
+
+    def newpkgcb(pkgId, name, arch):
+        """
+        A callback which is used when a new package entry is encountered.
+
+        Args:
+            pkgId(str): pkgId of a package
+            name(str): name of a package
+            arch(str): arch of a package
+
+        Returns:
+            createrepo_c.Package: a package which parsed data should be added to.
+
+            If None is returned, further parsing of a package will be skipped.
+
+        """
+        if pkgId not in pkgids:
+            return None
+        return cr.Package()
+
+    def pkgcb(pkg):
+        """
+        A callback which is used when a whole package entry in xml is parsed.
+
+        Args:
+            pkg(createrepo_c.Package): a parsed metadata for a package
+
+        Returns:
+            bool: True, to continue parsing
+
+        """
+        if repodata_type == 'filelists':
+            data = {PULP_PACKAGE_ATTRS.FILES: pkg.files}
+        else:
+            data = {PULP_PACKAGE_ATTRS.CHANGELOGS: pkg.changelogs}
+        batch.append((pkg.pkgId, data))
+        if len(batch) >= batch_size:
+            queue.put(('data', batch.copy()))
+            batch.clear()
+        return True
+
+    parse = cr.xml_parse_filelists if repodata_type == 'filelists' else cr.xml_parse_other
+    try:
+        parse(xml_path, newpkgcb=newpkgcb, pkgcb=pkgcb, warningcb=warningcb)
+    except Exception as exc:
+        queue.put(('error', str(exc)))
     else:
-        return remote_url
+        queue.put(('data', batch))
+        queue.put(('data', None))
 
 
+def spool_primary_file(xml_path, spool_path, skip_srpm, batch_size, queue):
+    """
+    Parse packages from primary.xml and write them to a spool file.
+
+    It is meant to run in a separate process. Packages are pickled to the spool file in batches
+    of (pkgId, data) tuples, the data of a package are a dict of Package fields. When the whole
+    file is parsed, a 'locations' message with location_href of the packages keyed by their
+    pkgId is sent to the queue. Warnings and a failure are sent the same way as by
+    parse_repodata_file().
+
+    The packages are spooled, so that primary.xml is parsed only once, even though pkgIds of all
+    the packages are needed before filelists.xml and other.xml are parsed.
+
+    Args:
+        xml_path(str): a path to a downloaded primary.xml
+        spool_path(str): a path to write the parsed packages to
+        skip_srpm(bool): whether SRPMs should be left out
+        batch_size(int): number of packages pickled at once
+        queue(multiprocessing.Queue): a queue to send the locations, warnings and errors to
+
+    """
+    batch = []
+    locations = {}
+
+    def warningcb(warning_type, message):
+        queue.put(('warning', message))
+        return True
+
+    with open(spool_path, 'wb') as spool:
+        def pkgcb(pkg):
+            if skip_srpm and pkg.arch == 'src':
+                return True
+            locations[pkg.pkgId] = pkg.location_href
+            batch.append((pkg.pkgId, Package.createrepo_to_dict(pkg)))
+            if len(batch) >= batch_size:
+                pickle.dump(batch, spool, pickle.HIGHEST_PROTOCOL)
+                batch.clear()
+            return True
+
+        try:
+            cr.xml_parse_primary(xml_path, pkgcb=pkgcb, do_files=False, warningcb=warningcb)
+            pickle.dump(batch, spool, pickle.HIGHEST_PROTOCOL)
+        except Exception as exc:
+            queue.put(('error', str(exc)))
+            return
+    queue.put(('locations', locations))
+
+
+async def receive_parsed(process, queue):
+    """
+    Receive the next message from a repodata parsing process, warnings are logged.
+
+    Args:
+        process(multiprocessing.Process): the parsing process
+        queue(multiprocessing.Queue): a queue the process sends messages to
+
+    Returns:
+        tuple: a kind of the message and its payload
+
+    Raises:
+        createrepo_c.CreaterepoCError: If the parsing failed or the process died.
+
+    """
+    loop = asyncio.get_event_loop()
+    while True:
+        try:
+            kind, payload = await loop.run_in_executor(None, partial(queue.get, timeout=1))
+        except Empty:
+            if process.exitcode is not None and queue.empty():
+                raise cr.CreaterepoCError(_("Parsing of repodata failed unexpectedly"))
+            continue
+        if kind == 'warning':
+            log.warning(_("Warning while parsing repodata: {}").format(payload))
+        elif kind == 'error':
+            raise cr.CreaterepoCError(payload)
+        else:
+            return kind, payload
+
+
+@profiled
 def synchronize(remote_pk, repository_pk, mirror, skip_types, optimize):
     """
     Sync content from the remote repository.
@@ -158,12 +911,27 @@ def synchronize(remote_pk, repository_pk, mirror, skip_types, optimize):
         r=repository.name, p=remote.name))
 
     deferred_download = (remote.policy != Remote.IMMEDIATE)  # Interpret download policy
+    fetched_metadata = FetchedMetadata()
 
-    remote_url = fetch_remote_url(remote)
-    if not remote_url:
+    if optimize and repomd_not_modified(remote, repository, fetched_metadata):
+        optimize_data = dict(message='Optimizing Sync', code='optimizing.sync')
+        with ProgressReport(**optimize_data) as optimize_pb:
+            optimize_pb.done = 1
+            optimize_pb.save()
+        return
+
+    remote_urls = fetch_remote_urls(remote, fetched_metadata)
+    if not remote_urls:
         raise ValueError(_("A no valid remote URL was provided."))
     else:
-        remote_url = remote_url.rstrip("/") + "/"
+        remote_url = remote_urls[0].rstrip("/") + "/"
+
+    # packages are downloaded from several mirrors of a mirror list feed at once
+    mirrors = []
+    if len(remote_urls) > 1:
+        mirrors = remote_urls[:settings.RPM_DOWNLOAD_MIRRORS]
+
+    declarative_versions = []
 
     treeinfo = get_treeinfo_data(remote, remote_url)
     if treeinfo:
@@ -182,7 +950,7 @@ def synchronize(remote_pk, repository_pk, mirror, skip_types, optimize):
             treeinfo["repositories"].update({directory: str(sub_repo.pk)})
             path = f"{repodata}/"
             new_url = urljoin(remote_url, path)
-            if repodata_exists(remote, new_url):
+            if repodata_exists(remote, new_url, fetched_metadata):
                 stage = RpmFirstStage(
                     remote,
                     sub_repo,
@@ -190,10 +958,12 @@ def synchronize(remote_pk, repository_pk, mirror, skip_types, optimize):
                     optimize=optimize,
                     skip_types=skip_types,
                     new_url=new_url,
+                    fetched_metadata=fetched_metadata,
+                    mirrors=[urljoin(mirror, path) for mirror in mirrors],
                 )
                 dv = RpmDeclarativeVersion(first_stage=stage,
                                            repository=sub_repo)
-                dv.create()
+                declarative_versions.append(dv)
 
     first_stage = RpmFirstStage(remote,
                                 repository,
@@ -201,16 +971,63 @@ def synchronize(remote_pk, repository_pk, mirror, skip_types, optimize):
                                 optimize=optimize,
                                 skip_types=skip_types,
                                 treeinfo=treeinfo,
-                                new_url=remote_url)
+                                new_url=remote_url,
+                                fetched_metadata=fetched_metadata,
+                                mirrors=mirrors)
     dv = RpmDeclarativeVersion(first_stage=first_stage,
                                repository=repository,
                                mirror=mirror)
-    dv.create()
+    declarative_versions.append(dv)
+
+    create_versions(declarative_versions)
+
+    # the sync has finished, nothing is going to be resumed
+    SyncCheckpoint.clear([dv.repository for dv in declarative_versions])
     repository.last_sync_remote = remote
     repository.last_sync_repo_version = repository.latest_version().number
     repository.save()
 
 
+def create_versions(declarative_versions):
+    """
+    Create new repository versions of several repositories at once.
+
+    Pipelines of all the declarative versions run concurrently in one event loop, at most
+    `RPM_SYNC_CONCURRENCY` of them at a time. If any of them fails, the rest is cancelled and
+    none of the new repository versions is created.
+
+    Args:
+        declarative_versions (list): RpmDeclarativeVersion instances to create
+
+    """
+    loop = asyncio.get_event_loop()
+    semaphore = asyncio.Semaphore(settings.RPM_SYNC_CONCURRENCY)
+
+    async def run_pipeline(dv, new_version):
+        async with semaphore:
+            await dv.create_pipeline(new_version)
+
+    with WorkingDirectory():
+        with ExitStack() as stack:
+            new_versions = [
+                stack.enter_context(dv.repository.new_version()) for dv in declarative_versions
+            ]
+            pipelines = [
+                asyncio.ensure_future(run_pipeline(dv, new_version))
+                for dv, new_version in zip(declarative_versions, new_versions)
+            ]
+            try:
+                loop.run_until_complete(asyncio.gather(*pipelines))
+            except Exception:
+                for pipeline in pipelines:
+                    pipeline.cancel()
+                loop.run_until_complete(asyncio.gather(*pipelines, return_exceptions=True))
+                # a retried sync continues from the downloaded files and the saved content
+                for dv in declarative_versions:
+                    dv.first_stage.checkpoint.keep()
+                raise
+
+
 class RpmDeclarativeVersion(DeclarativeVersion):
     """
     Subclassed Declarative version creates a custom pipeline for RPM sync.
@@ -236,12 +1053,29 @@ class RpmDeclarativeVersion(DeclarativeVersion):
             ArtifactDownloader(),
             ArtifactSaver(),
             QueryExistingContents(),
-            RpmContentSaver(),
+            RpmContentSaver(self.first_stage.checkpoint),
             RpmInterrelateContent(),
             RemoteArtifactSaver(),
         ]
         return pipeline
 
+    def create_pipeline(self, new_version):
+        """
+        Create the whole pipeline for a new repository version without running it.
+
+        Args:
+            new_version (:class:`~pulpcore.plugin.models.RepositoryVersion`): The
+                new repository version that is going to be built.
+
+        Returns:
+            A coroutine that runs the pipeline
+
+        """
+        stages = self.pipeline_stages(new_version)
+        stages.append(ContentAssociation(new_version, self.mirror))
+        stages.append(EndStage())
+        return create_pipeline(stages)
+
 
 class RpmFirstStage(Stage):
     """
@@ -252,7 +1086,7 @@ class RpmFirstStage(Stage):
     """
 
     def __init__(self, remote, repository, deferred_download, optimize=True, skip_types=None,
-                 new_url=None, treeinfo=None):
+                 new_url=None, treeinfo=None, fetched_metadata=None, mirrors=None):
         """
         The first stage of a pulp_rpm sync pipeline.
 
@@ -267,6 +1101,8 @@ class RpmFirstStage(Stage):
             new_url(str): URL to replace remote url
             treeinfo(dict): Treeinfo data
             optimize(bool): Optimize sync
+            fetched_metadata(FetchedMetadata): Metadata already downloaded during the sync
+            mirrors(list): URLs of mirrors to spread package downloads across
 
         """
         super().__init__()
@@ -278,8 +1114,23 @@ class RpmFirstStage(Stage):
         self.treeinfo = treeinfo
         self.skip_types = [] if skip_types is None else skip_types
         self.optimize = optimize
+        self.fetched_metadata = fetched_metadata or FetchedMetadata()
+        self.mirrors = mirrors or []
+        self.downloaded_packages = 0
+        # files and changelogs are filled in later from the kept filelists.xml and other.xml
+        self.defer_package_details = deferred_download and settings.RPM_DEFER_PACKAGE_DETAILS
 
         self.data = FirstStageData()
+        self.checkpoint = self.data.checkpoint = SyncCheckpoint(repository, remote)
+        self.metrics = {
+            code: PhaseMetrics(code, message) for code, message in (
+                ('downloading', 'Metadata Download Timing'),
+                ('parsing.packages', 'Packages Parsing Timing'),
+                ('parsing.advisories', 'Advisories Parsing Timing'),
+                ('parsing.modulemds', 'Modulemds Parsing Timing'),
+                ('parsing.comps', 'Comps Parsing Timing'),
+            )
+        }
 
     @staticmethod
     async def parse_updateinfo(updateinfo_xml_path):
@@ -300,60 +1151,144 @@ class RpmFirstStage(Stage):
         return uinfo.updates
 
     @staticmethod
-    async def parse_repodata(primary_xml_path, filelists_xml_path, other_xml_path):
+    def query_known_pkgids(pkgids):
         """
-        Parse repodata to extract package info.
+        Find out which packages are already in Pulp.
 
         Args:
-            primary_xml_path(str): a path to a downloaded primary.xml
-            filelists_xml_path(str): a path to a downloaded filelists.xml
-            other_xml_path(str): a path to a downloaded other.xml
+            pkgids(iterable): pkgIds of packages in the remote repository
 
         Returns:
-            dict: createrepo_c package objects with the pkgId as a key
+            set: pkgIds of the packages which are in Pulp
 
         """
-        def pkgcb(pkg):
-            """
-            A callback which is used when a whole package entry in xml is parsed.
+        return set(Package.objects.filter(pkgId__in=pkgids).values_list('pkgId', flat=True))
 
-            Args:
-                pkg(preaterepo_c.Package): a parsed metadata for a package
+    @staticmethod
+    async def spool_packages(primary_xml_path, spool_path, skip_srpm=False):
+        """
+        Parse packages from primary.xml into a spool file which parse_repodata() reads them from.
 
-            """
-            packages[pkg.pkgId] = pkg
+        Primary.xml is parsed in a separate process, so the parsing doesn't block the event loop.
+        Packages are not kept in memory, only their locations are returned.
 
-        def newpkgcb(pkgId, name, arch):
-            """
-            A callback which is used when a new package entry is encountered.
+        Args:
+            primary_xml_path(str): a path to a downloaded primary.xml
+            spool_path(str): a path to write the parsed packages to
+
+        Keyword Args:
+            skip_srpm(bool): whether SRPMs should be left out
+
+        Returns:
+            dict: location_href of packages with the pkgId as a key
+
+        """
+        queue = processes.context.Queue()
+        process = processes.start_process(
+            spool_primary_file, primary_xml_path, spool_path, skip_srpm, PARSE_BATCH_SIZE, queue
+        )
+        try:
+            kind, locations = await receive_parsed(process, queue)
+            return locations
+        finally:
+            if process.is_alive():
+                process.terminate()
+            process.join()
 
-            Only opening <package> element is parsed at that moment.
-            This function has to return a package which parsed data will be added to
-            or None if a package should be skipped.
+    @staticmethod
+    async def parse_repodata(spool_path, filelists_xml_path, other_xml_path, pkgids):
+        """
+        Parse repodata to extract package info.
 
-            pkgId, name and arch of a package can be used to skip further parsing. Available
-            only for filelists.xml and other.xml.
+        Packages from primary.xml are read from a spool file written by spool_packages().
+        Filelists.xml and other.xml are parsed in parallel, each in its own process, so the
+        parsing doesn't block the event loop. The parsed data are merged by pkgId and each
+        package is yielded as soon as all its data is received.
 
-            Args:
-                pkgId(str): pkgId of a package
-                name(str): name of a package
-                arch(str): arch of a package
+        The processes send the parsed data in batches, each through its own queue, and the batches
+        are taken from the files in turns, so a fast parser can't get far ahead of the others.
+        If metadata files don't list packages in the same order, the data of the packages which
+        are not complete yet are kept in memory until the rest arrives.
 
-            Returns:
-                createrepo_c.Package: a package which parsed data should be added to.
+        If filelists.xml or other.xml is not passed, the packages are yielded without files or
+        changelogs respectively.
 
-                If None is returned, further parsing of a package will be skipped.
+        Args:
+            spool_path(str): a path to the packages spooled from primary.xml
+            filelists_xml_path(str): a path to a downloaded filelists.xml, or None
+            other_xml_path(str): a path to a downloaded other.xml, or None
+            pkgids(set): pkgIds of packages to parse, other packages are skipped
 
-            """
-            return packages.get(pkgId, None)
+        Yields:
+            dict: all data of a package for Package creation
 
-        packages = {}
+        """
+        repodata_paths = {'filelists': filelists_xml_path, 'other': other_xml_path}
+        queues = {}
+        workers = {}
+        for repodata_type, path in repodata_paths.items():
+            if path:
+                queues[repodata_type] = processes.context.Queue(maxsize=PARSE_QUEUE_SIZE)
+                workers[repodata_type] = processes.start_process(
+                    parse_repodata_file, repodata_type, path, pkgids, PARSE_BATCH_SIZE,
+                    queues[repodata_type]
+                )
 
-        # TODO: handle parsing errors/warnings, warningcb callback can be used below
-        cr.xml_parse_primary(primary_xml_path, pkgcb=pkgcb, do_files=False)
-        cr.xml_parse_filelists(filelists_xml_path, newpkgcb=newpkgcb)
-        cr.xml_parse_other(other_xml_path, newpkgcb=newpkgcb)
-        return packages
+        loop = asyncio.get_event_loop()
+        spool = open(spool_path, 'rb')
+
+        def read_spool():
+            """Read the next batch of spooled packages, None when all of them are read."""
+            try:
+                batch = pickle.load(spool)
+            except EOFError:
+                return None
+            return [(pkgId, data) for pkgId, data in batch if pkgId in pkgids]
+
+        async def get_batch(repodata_type):
+            """Get the next batch of parsed data of a file, None when the whole file is parsed."""
+            if repodata_type == 'primary':
+                return await loop.run_in_executor(None, read_spool)
+            kind, batch = await receive_parsed(workers[repodata_type], queues[repodata_type])
+            return batch
+
+        seen_pkgids = defaultdict(set)
+        packages = defaultdict(dict)
+        parts = defaultdict(int)
+        running = ['primary', *workers]
+        total_parts = len(running)
+        try:
+            while running:
+                for repodata_type in running.copy():
+                    batch = await get_batch(repodata_type)
+                    if batch is None:
+                        running.remove(repodata_type)
+                        continue
+                    for pkgId, data in batch:
+                        if pkgId in seen_pkgids[repodata_type]:
+                            continue
+                        seen_pkgids[repodata_type].add(pkgId)
+                        if repodata_type == 'primary':
+                            # files and changelogs from filelists.xml and other.xml take precedence
+                            data.update(packages[pkgId])
+                            packages[pkgId] = data
+                        else:
+                            packages[pkgId].update(data)
+                        parts[pkgId] += 1
+                        if parts[pkgId] == total_parts:
+                            del parts[pkgId]
+                            yield packages.pop(pkgId)
+        finally:
+            spool.close()
+            for process in workers.values():
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+
+        # packages which are missing in filelists.xml or other.xml
+        for package in packages.values():
+            if PULP_PACKAGE_ATTRS.PKGID in package:
+                yield package
 
     async def run(self):
         """Build `DeclarativeContent` from the repodata."""
@@ -363,23 +1298,41 @@ class RpmFirstStage(Stage):
         with ProgressReport(**progress_data) as metadata_pb:
             self.data.metadata_pb = metadata_pb
 
-            downloader = self.remote.get_downloader(
-                url=urljoin(self.data.remote_url, 'repodata/repomd.xml')
-            )
-            result = await downloader.run()
+            repomd_url = urljoin(self.data.remote_url, 'repodata/repomd.xml')
+            validators = None
+            if self.optimize and not self.fetched_metadata.get(repomd_url):
+                validators = get_repomd_validators(self.remote, self.repository, repomd_url)
+
+            with self.metrics['downloading'].measure():
+                result = await self.fetched_metadata.run(
+                    self.remote, repomd_url, validators=validators
+                )
             metadata_pb.increment()
 
-            repomd_path = result.path
-            self.data.repomd = cr.Repomd(repomd_path)
+            if result.path is None:
+                # repomd.xml hasn't changed since it was downloaded last time
+                revision = validators['revision']
+            else:
+                self.data.repomd = cr.Repomd(result.path)
+                revision = self.data.repomd.revision
+                store_repomd_validators(self.remote, repomd_url, result, revision)
 
-            if self.should_optimize_sync():
+            if self.should_optimize_sync(revision):
                 optimize_data = dict(message='Optimizing Sync', code='optimizing.sync')
                 with ProgressReport(**optimize_data) as optimize_pb:
                     optimize_pb.done = 1
                     optimize_pb.save()
-                    return
+                self._report_metrics()
+                return
+
+            if self.data.repomd is None:
+                with self.metrics['downloading'].measure():
+                    result = await self.fetched_metadata.run(self.remote, repomd_url)
+                self.data.repomd = cr.Repomd(result.path)
+                store_repomd_validators(self.remote, repomd_url, result, self.data.repomd.revision)
 
             self.repository.last_sync_revision_number = self.data.repomd.revision
+            self.checkpoint.start(self.data.remote_url, self.data.repomd.revision)
 
             await self.parse_distribution_tree()
 
@@ -395,19 +1348,25 @@ class RpmFirstStage(Stage):
             for dc_group in self.data.dc_groups:
                 await self.put(dc_group)
 
-    def should_optimize_sync(self):
-        """Check whether it is possible to optimize the synchronization or not."""
-        # Caution: we are not storing when the remote was last updated, so the order of this
-        # logic must remain in this order where we first check the version number as other
-        # changes than sync could have taken place such that the date or repo version will be
-        # different from last sync
+        self._report_metrics()
+
+    def _report_metrics(self):
+        """Save the time and memory spent in each phase of the stage as progress reports."""
+        self.metrics['downloading'].items = self.data.metadata_pb.done
+        report_metrics(self.metrics.values())
+
+    def should_optimize_sync(self, revision):
+        """
+        Check whether it is possible to optimize the synchronization or not.
+
+        Args:
+            revision(str): the revision of the remote repomd.xml
+
+        """
         return (
-            self.optimize and self.repository.last_sync_remote and
-            self.remote.pk == self.repository.last_sync_remote.pk and
-            self.repository.last_sync_repo_version == self.repository.latest_version().number and
-            self.remote.pulp_last_updated <= self.repository.latest_version().pulp_created and
-            is_previous_version(self.data.repomd.revision,
-                                self.repository.last_sync_revision_number)
+            self.optimize and
+            is_sync_optimizable(self.remote, self.repository) and
+            is_previous_version(revision, self.repository.last_sync_revision_number)
         )
 
     async def parse_distribution_tree(self):
@@ -444,7 +1403,10 @@ class RpmFirstStage(Stage):
         repository_metadata_parser.parse()
 
         if repository_metadata_parser.modulemd_downloader:
-            self.data.modulemd_results = await repository_metadata_parser.modulemd_downloader.run()
+            with self.metrics['downloading'].measure():
+                self.data.modulemd_results = await (
+                    repository_metadata_parser.modulemd_downloader.run()
+                )
         if repository_metadata_parser.repomd_dcs:
             for dc in repository_metadata_parser.repomd_dcs:
                 await self.put(dc)
@@ -454,7 +1416,9 @@ class RpmFirstStage(Stage):
     async def parse_modules_metadata(self):
         """Parse modules' metadata which define what packages are built for specific releases."""
         modules_metadata_parser = ModulesMetadataParser(self.data)
-        modules_metadata_parser.parse()
+        with self.metrics['parsing.modulemds'].measure() as metrics:
+            await modules_metadata_parser.parse()
+            metrics.items += len(self.data.modulemd_list)
 
         if modules_metadata_parser.default_content_dcs:
             for default_content_dc in modules_metadata_parser.default_content_dcs:
@@ -463,9 +1427,16 @@ class RpmFirstStage(Stage):
     async def parse_packages_components(self):
         """Parse packages' components that define how are the packages bundled."""
         if self.data.comps_downloader:
-            comps_result = await self.data.comps_downloader.run()
+            with self.metrics['downloading'].measure():
+                comps_result = await self.data.comps_downloader.run()
             packages_components_parser = PackagesComponentsParser(self.data, comps_result)
-            packages_components_parser.parse()
+            with self.metrics['parsing.comps'].measure() as metrics:
+                packages_components_parser.parse()
+                metrics.items += (
+                    len(packages_components_parser.dc_categories) +
+                    len(packages_components_parser.dc_environments) +
+                    len(self.data.dc_groups)
+                )
 
             if packages_components_parser.package_language_pack_dc:
                 await self.put(packages_components_parser.package_language_pack_dc)
@@ -483,12 +1454,9 @@ class RpmFirstStage(Stage):
     async def parse_content(self):
         """Download and parse packages' content from the remote repository."""
         # to preserve order, downloaders are created after all repodata urls are identified
-        package_repodata_downloaders = []
-        for repodata_type in PACKAGE_REPODATA:
-            downloader = self.remote.get_downloader(
-                url=self.data.package_repodata_urls[repodata_type]
-            )
-            package_repodata_downloaders.append(downloader.run())
+        package_repodata_downloaders = [
+            self.download_package_repodata(repodata_type) for repodata_type in PACKAGE_REPODATA
+        ]
 
         self.data.downloaders.append(package_repodata_downloaders)
 
@@ -504,7 +1472,8 @@ class RpmFirstStage(Stage):
         )
 
         while pending:
-            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            with self.metrics['downloading'].measure():
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
             for downloader in done:
                 try:
                     results = downloader.result()
@@ -514,6 +1483,92 @@ class RpmFirstStage(Stage):
                     data_url = results[0].url
                     await data_type_handlers[data_url](results)
 
+    async def download_package_repodata(self, repodata_type):
+        """
+        Download package repodata of the given type.
+
+        If the remote repository provides zchunk metadata over HTTP, only chunks which changed
+        since the previous sync are downloaded. The regular metadata is downloaded if that fails.
+        The regular metadata is downloaded also when it's kept for deferred package details,
+        because the kept file has to be the one published at its URL.
+
+        Args:
+            repodata_type (str): one of PACKAGE_REPODATA
+
+        Returns:
+            pulpcore.plugin.download.DownloadResult: the result with the url of the regular
+                metadata
+
+        """
+        url = self.data.package_repodata_urls[repodata_type]
+        zck_record = self.data.zchunk_records.get(f'{repodata_type}_zck')
+        kept = self.defer_package_details and repodata_type in DEFERRED_DETAILS_REPODATA
+        # only HTTP supports the range requests zchunk depends on
+        if zck_record and not kept and url.startswith(('http://', 'https://')):
+            try:
+                path = await self.download_zchunk_repodata(zck_record)
+            except (asyncio.TimeoutError, ClientError, ValueError) as exc:
+                log.warning(_("Unable to download zchunk metadata, downloading {url}: "
+                              "{exc}").format(url=url, exc=exc))
+            else:
+                return DownloadResult(url=url, artifact_attributes={}, path=path, headers=None)
+
+        downloader = self.data.checkpoint.get_downloader(url)
+        return await downloader.run()
+
+    async def download_zchunk_repodata(self, record):
+        """
+        Download zchunk metadata, reusing the chunks of the file from the previous sync.
+
+        The downloaded file is kept as an artifact for the next sync.
+
+        Args:
+            record (createrepo_c.RepomdRecord): the repomd record of the zchunk metadata
+
+        Returns:
+            str: path to the decompressed metadata
+
+        """
+        url = urljoin(self.data.remote_url, record.location_href)
+        loop = asyncio.get_event_loop()
+        sha256 = self.repository.zchunk_artifacts.get(record.type)
+        previous = None
+        if sha256:
+            previous = await loop.run_in_executor(
+                None, Artifact.objects.filter(sha256=sha256).first
+            )
+        if previous:
+            with previous.file.open('rb') as previous_file:
+                zck_path = await download_zchunk(self.remote, url, record, previous_file)
+        else:
+            zck_path = await download_zchunk(self.remote, url, record)
+        return await loop.run_in_executor(None, self.keep_zchunk_repodata, zck_path, record)
+
+    def keep_zchunk_repodata(self, zck_path, record):
+        """
+        Decompress downloaded zchunk metadata and keep the zchunk file for the next sync.
+
+        Args:
+            zck_path (str): path to the downloaded zchunk metadata
+            record (createrepo_c.RepomdRecord): the repomd record of the zchunk metadata
+
+        Returns:
+            str: path to the decompressed metadata
+
+        """
+        path = decompress_zchunk(zck_path, record)
+        artifact = Artifact.init_and_validate(zck_path)
+        try:
+            with transaction.atomic():
+                artifact.save()
+        except IntegrityError:
+            artifact = Artifact.objects.get(sha256=artifact.sha256)
+        self.repository.zchunk_artifacts[record.type] = artifact.sha256
+        RpmRepository.objects.filter(pk=self.repository.pk).update(
+            zchunk_artifacts=self.repository.zchunk_artifacts
+        )
+        return path
+
     async def parse_packages(self, results):
         """Parse packages from the remote repository."""
         primary_xml_path = results[0].path
@@ -523,15 +1578,128 @@ class RpmFirstStage(Stage):
         self.data.metadata_pb.done += 3
         self.data.metadata_pb.save()
 
-        packages = await RpmFirstStage.parse_repodata(
-            primary_xml_path, filelists_xml_path, other_xml_path
-        )
+        with self.metrics['parsing.packages'].measure() as metrics, \
+                tempfile.NamedTemporaryFile(dir=os.getcwd()) as spool:
+            loop = asyncio.get_event_loop()
+            package_locations = await RpmFirstStage.spool_packages(
+                primary_xml_path, spool.name, skip_srpm='srpm' in self.skip_types
+            )
+            metrics.items += len(package_locations)
+
+            # packages which are already in Pulp don't need their files and changelogs to be parsed
+            known_pkgids = await loop.run_in_executor(
+                None, RpmFirstStage.query_known_pkgids, package_locations.keys()
+            )
+            known_packages = {pkgId: package_locations[pkgId] for pkgId in known_pkgids}
+            new_pkgids = package_locations.keys() - known_pkgids
+            known_deferred_packages = Package.objects.filter(pkgId__in=known_pkgids).exclude(
+                deferred_details={}
+            )
+
+            if self.defer_package_details:
+                # files and changelogs are filled in later from the kept filelists.xml and other.xml
+                details_dcs = await loop.run_in_executor(
+                    None, self._package_details_to_dcs, filelists_xml_path, other_xml_path
+                )
+                deferred_details = {
+                    repodata_type: dc.d_artifacts[0].artifact.sha256
+                    for repodata_type, dc in zip(DEFERRED_DETAILS_REPODATA, details_dcs)
+                }
+                # the artifacts are saved already, so the packages can refer to them
+                await loop.run_in_executor(
+                    None, partial(known_deferred_packages.update, deferred_details=deferred_details)
+                )
+                packages = RpmFirstStage.parse_repodata(spool.name, None, None, new_pkgids)
+                packages = (
+                    {**pkg, 'deferred_details': deferred_details} async for pkg in packages
+                )
+            else:
+                details_dcs = []
+                deferred_details = {}
+                # packages synced without files and changelogs before get them from this sync
+                known_deferred_packages = await loop.run_in_executor(
+                    None, list, known_deferred_packages.only('pk', 'pkgId')
+                )
+                if known_deferred_packages:
+                    details = await loop.run_in_executor(
+                        None, parse_package_details, filelists_xml_path, other_xml_path,
+                        {package.pkgId for package in known_deferred_packages}
+                    )
+                    await loop.run_in_executor(
+                        None, save_package_details, known_deferred_packages, details
+                    )
+                packages = RpmFirstStage.parse_repodata(
+                    spool.name, filelists_xml_path, other_xml_path, new_pkgids
+                )
+
+            # the kept metadata files which this sync doesn't keep are replaced or removed in the
+            # new repository version, the packages which still refer to them get their details now
+            await loop.run_in_executor(
+                None, self._fill_replaced_package_details, set(deferred_details.values())
+            )
+
+            await self._parse_packages(packages, len(package_locations), known_packages)
+
+            with metrics.paused():
+                for dc in details_dcs:
+                    await self.put(dc)
+
+    def _package_details_to_dcs(self, filelists_xml_path, other_xml_path):
+        """
+        Keep filelists.xml and other.xml as metadata files of the repository.
+
+        Files and changelogs of packages which are synced without them are filled in from these
+        files later. The artifacts are saved right away, so that packages can refer to them.
 
-        # skip SRPM if defined
-        if 'srpm' in self.skip_types:
-            packages = {pkgId: pkg for pkgId, pkg in packages.items() if pkg.arch != 'src'}
+        Args:
+            filelists_xml_path(str): a path to a downloaded filelists.xml
+            other_xml_path(str): a path to a downloaded other.xml
 
-        await self._parse_packages(packages)
+        Returns:
+            list: DeclarativeContent for filelists.xml and other.xml
+
+        """
+        dcs = []
+        paths = (filelists_xml_path, other_xml_path)
+        for repodata_type, path in zip(DEFERRED_DETAILS_REPODATA, paths):
+            url = self.data.package_repodata_urls[repodata_type]
+            artifact = Artifact.init_and_validate(path)
+            try:
+                with transaction.atomic():
+                    artifact.save()
+            except IntegrityError:
+                artifact = Artifact.objects.get(sha256=artifact.sha256)
+            da = DeclarativeArtifact(
+                artifact=artifact,
+                url=url,
+                relative_path=os.path.join('repodata', os.path.basename(url)),
+                remote=self.remote,
+                deferred_download=False
+            )
+            repo_metadata_file = RepoMetadataFile(
+                data_type=repodata_type,
+                checksum_type='sha256',
+                checksum=artifact.sha256,
+                relative_path=da.relative_path
+            )
+            dcs.append(DeclarativeContent(content=repo_metadata_file, d_artifacts=[da]))
+        return dcs
+
+    def _fill_replaced_package_details(self, kept_sha256s):
+        """
+        Fill in details of packages from the kept metadata files which are going to be replaced.
+
+        Args:
+            kept_sha256s(set): sha256 checksums of filelists.xml and other.xml kept by this sync
+
+        """
+        latest_version = self.repository.latest_version()
+        if not latest_version:
+            return
+        replaced_sha256s = set(RepoMetadataFile.objects.filter(
+            pk__in=latest_version.content, data_type__in=DEFERRED_DETAILS_REPODATA
+        ).values_list('checksum', flat=True)) - kept_sha256s
+        fill_package_details_from(replaced_sha256s)
 
     async def parse_advisories(self, results):
         """Parse advisories from the remote repository."""
@@ -539,50 +1707,125 @@ class RpmFirstStage(Stage):
 
         self.data.metadata_pb.increment()
 
-        updates = await RpmFirstStage.parse_updateinfo(updateinfo_xml_path)
-        await self._parse_advisories(updates)
+        with self.metrics['parsing.advisories'].measure() as metrics:
+            updates = await RpmFirstStage.parse_updateinfo(updateinfo_xml_path)
+            await self._parse_advisories(updates)
+            metrics.items += len(updates)
 
-    async def _parse_packages(self, packages):
+    async def _parse_packages(self, packages, total_packages, known_packages=None):
         progress_data = {
             'message': 'Parsed Packages',
             'code': 'parsing.packages',
-            'total': len(packages),
+            'total': total_packages,
         }
 
         with ProgressReport(**progress_data) as packages_pb:
-            for pkg in packages.values():
-                package = Package(**Package.createrepo_to_dict(pkg))
-                artifact = Artifact(size=package.size_package)
-                checksum_type = getattr(
-                    CHECKSUM_TYPES, package.checksum_type.upper()
-                )
-                setattr(artifact, checksum_type, package.pkgId)
-                url = urljoin(self.data.remote_url, package.location_href)
-                filename = os.path.basename(package.location_href)
-                da = DeclarativeArtifact(
-                    artifact=artifact,
-                    url=url,
-                    relative_path=filename,
-                    remote=self.remote,
-                    deferred_download=self.deferred_download
-                )
-                dc = DeclarativeContent(content=package, d_artifacts=[da])
-                dc.extra_data = defaultdict(list)
+            async for package_data in packages:
+                package = Package(**package_data)
+                dc = self._package_to_dc(package, package.location_href)
+                packages_pb.increment()
+                with self.metrics['parsing.packages'].paused():
+                    await self.put(dc)
+
+            # Known packages are sent as they are stored, without files and changelogs, which
+            # are not needed to add them to a repository version.
+            known_pkgids = list(known_packages or {})
+            loop = asyncio.get_event_loop()
+            for start in range(0, len(known_pkgids), KNOWN_PACKAGES_BATCH_SIZE):
+                existing_packages = Package.objects.filter(
+                    pkgId__in=known_pkgids[start:start + KNOWN_PACKAGES_BATCH_SIZE]
+                ).only(*KNOWN_PACKAGE_FIELDS)
+                for package in await loop.run_in_executor(None, list, existing_packages):
+                    dc = self._package_to_dc(package, known_packages[package.pkgId])
+                    packages_pb.increment()
+                    with self.metrics['parsing.packages'].paused():
+                        await self.put(dc)
+
+    def _package_to_dc(self, package, location_href):
+        """
+        Create a DeclarativeContent for a package and relate it to modulemds and groups.
 
-                # find if a package relates to a modulemd
-                if dc.content.nevra in self.data.nevra_to_module.keys():
-                    dc.content.is_modular = True
-                    for dc_modulemd in self.data.nevra_to_module[dc.content.nevra]:
-                        dc.extra_data['modulemd_relation'].append(dc_modulemd)
-                        dc_modulemd.extra_data['package_relation'].append(dc)
+        Args:
+            package(Package): a new or an already saved package
+            location_href(str): location of the package in the remote repository
 
-                if dc.content.name in self.data.pkgname_to_groups.keys():
-                    for dc_group in self.data.pkgname_to_groups[dc.content.name]:
-                        dc.extra_data['group_relations'].append(dc_group)
-                        dc_group.extra_data['related_packages'].append(dc)
+        Returns:
+            DeclarativeContent: a declarative content for the package
 
-                packages_pb.increment()
-                await self.put(dc)
+        """
+        artifact = Artifact(size=package.size_package)
+        checksum_type = getattr(
+            CHECKSUM_TYPES, package.checksum_type.upper()
+        )
+        setattr(artifact, checksum_type, package.pkgId)
+        url = urljoin(self.data.remote_url, location_href)
+        filename = os.path.basename(location_href)
+        da = DeclarativeArtifact(
+            artifact=artifact,
+            url=url,
+            relative_path=filename,
+            remote=self.remote,
+            deferred_download=self.deferred_download,
+            extra_data=self._mirrors_extra_data(location_href),
+        )
+        dc = DeclarativeContent(content=package, d_artifacts=[da])
+        dc.extra_data = defaultdict(list)
+
+        # find if a package relates to a modulemd
+        if dc.content.nevra in self.data.nevra_to_module.keys():
+            dc.content.is_modular = True
+            for dc_modulemd in self.data.nevra_to_module[dc.content.nevra]:
+                dc.extra_data['modulemd_relation'].append(dc_modulemd)
+
+        if dc.content.name in self.data.pkgname_to_groups.keys():
+            for dc_group in self.data.pkgname_to_groups[dc.content.name]:
+                dc.extra_data['group_relations'].append(dc_group)
+                dc_group.extra_data['related_packages'].append(dc)
+
+        return dc
+
+    def _mirrors_extra_data(self, location_href):
+        """
+        Get extra data for RpmDownloader to download a package from one of the mirrors.
+
+        Each package starts with a different mirror, so downloads are spread across all of them.
+        The other mirrors are used if a download fails.
+
+        Args:
+            location_href(str): location of the package in the remote repository
+
+        Returns:
+            dict: mirrors in the order they should be tried and the location of the package
+
+        """
+        if not self.mirrors or self.deferred_download:
+            return None
+
+        first = self.downloaded_packages % len(self.mirrors)
+        self.downloaded_packages += 1
+        return {
+            'mirrors': self.mirrors[first:] + self.mirrors[:first],
+            'location_href': location_href,
+        }
+
+    def _existing_advisories(self):
+        """
+        Index advisories by their digest.
+
+        The advisories are the ones of the latest version of the repository and the ones saved by
+        the failed sync which this sync continues from.
+
+        Returns:
+            dict: UpdateRecords with their digest as a key
+
+        """
+        query = Q(pk__in=self.checkpoint.get_resumed_content())
+        latest_version = self.repository.latest_version()
+        if latest_version:
+            query |= Q(pk__in=latest_version.content)
+
+        update_records = UpdateRecord.objects.filter(query).only('pk', 'digest')
+        return {update_record.digest: update_record for update_record in update_records.iterator()}
 
     async def _parse_advisories(self, updates):
         progress_data = {
@@ -590,12 +1833,26 @@ class RpmFirstStage(Stage):
             'code': 'parsing.advisories',
             'total': len(updates),
         }
+        existing_advisories = self._existing_advisories()
         with ProgressReport(**progress_data) as advisories_pb:
             for update in updates:
+                # an advisory which hasn't changed is taken as it is stored, the id, updated date
+                # and version can stay the same when an advisory changes, so only the digest
+                # tells whether it has
+                digest = hash_update_record(update)
+                existing_update_record = existing_advisories.get(digest)
+                if existing_update_record:
+                    advisories_pb.increment()
+                    dc = DeclarativeContent(content=existing_update_record)
+                    dc.extra_data = {'collections': {}, 'references': []}
+                    with self.metrics['parsing.advisories'].paused():
+                        await self.put(dc)
+                    continue
+
                 update_record = UpdateRecord(
                     **UpdateRecord.createrepo_to_dict(update)
                 )
-                update_record.digest = hash_update_record(update)
+                update_record.digest = digest
                 future_relations = {
                     'collections': defaultdict(list), 'references': []
                 }
@@ -619,7 +1876,8 @@ class RpmFirstStage(Stage):
                 advisories_pb.increment()
                 dc = DeclarativeContent(content=update_record)
                 dc.extra_data = future_relations
-                await self.put(dc)
+                with self.metrics['parsing.advisories'].paused():
+                    await self.put(dc)
 
 
 class FirstStageData:
@@ -634,8 +1892,10 @@ class FirstStageData:
         self.repomd = None
         self.remote_url = None
         self.metadata_pb = None
+        self.checkpoint = None
 
         self.package_repodata_urls = {}
+        self.zchunk_records = {}
         self.downloaders = []
 
         self.nevra_to_module = defaultdict(dict)
@@ -668,6 +1928,7 @@ class RepositoryMetadataParser:
         record_types_op = defaultdict(lambda: self._set_repomd_file)
 
         record_types_op.update(dict.fromkeys(PACKAGE_REPODATA, self._update_repodata_urls))
+        record_types_op.update(dict.fromkeys(PACKAGE_ZCK_REPODATA, self._set_zchunk_record))
         record_types_op.update(dict.fromkeys(UPDATE_REPODATA, self._append_downloader))
         record_types_op.update(dict.fromkeys(COMPS_REPODATA, self._set_comps_downloader))
         record_types_op.update(dict.fromkeys(MODULAR_REPODATA, self._get_modulemd_results))
@@ -688,18 +1949,21 @@ class RepositoryMetadataParser:
         repodata_url = urljoin(self.data.remote_url, record.location_href)
         self.data.package_repodata_urls[record.type] = repodata_url
 
+    def _set_zchunk_record(self, record):
+        self.data.zchunk_records[record.type] = record
+
     def _append_downloader(self, record):
         self.data.updateinfo_url = urljoin(self.data.remote_url, record.location_href)
-        downloader = self.remote.get_downloader(url=self.data.updateinfo_url)
+        downloader = self.data.checkpoint.get_downloader(self.data.updateinfo_url)
         self.data.downloaders.append([downloader.run()])
 
     def _set_comps_downloader(self, record):
         comps_url = urljoin(self.data.remote_url, record.location_href)
-        self.data.comps_downloader = self.remote.get_downloader(url=comps_url)
+        self.data.comps_downloader = self.data.checkpoint.get_downloader(comps_url)
 
     def _get_modulemd_results(self, record):
         self.data.modules_url = urljoin(self.data.remote_url, record.location_href)
-        self.modulemd_downloader = self.remote.get_downloader(url=self.data.modules_url)
+        self.modulemd_downloader = self.data.checkpoint.get_downloader(self.data.modules_url)
 
     def _set_repomd_file(self, record):
         if '_zck' not in record.type and record.type not in PACKAGE_DB_REPODATA:
@@ -730,54 +1994,53 @@ class ModulesMetadataParser:
 
         self.default_content_dcs = []
 
-    def parse(self):
+    async def parse(self):
         """Parse module.yaml, if exists, to create relations between packages."""
         if self.data.modulemd_results:
-            modulemd_index = mmdlib.ModuleIndex.new()
-            open_func = gzip.open if self.data.modulemd_results.url.endswith('.gz') else open
-            with open_func(self.data.modulemd_results.path, 'r') as moduleyaml:
-                content = moduleyaml.read()
-                module_content = content if isinstance(content, str) else content.decode()
-                modulemd_index.update_from_string(module_content, True)
-
-            self._parse_modulemd_list(modulemd_index)
+            modulemd_index = await asyncio.get_event_loop().run_in_executor(
+                None, self._load_modulemd_index
+            )
+
+            await self._parse_modulemd_list(modulemd_index)
             self._parse_modulemd_default_names(modulemd_index)
 
-    def _parse_modulemd_list(self, modulemd_index):
-        modulemd_names = modulemd_index.get_module_names() or []
-        modulemd_all = parse_modulemd(modulemd_names, modulemd_index)
+    def _load_modulemd_index(self):
+        modulemd_index = mmdlib.ModuleIndex.new()
+        open_func = gzip.open if self.data.modulemd_results.url.endswith('.gz') else open
+        with open_func(self.data.modulemd_results.path, 'r') as moduleyaml:
+            content = moduleyaml.read()
+            module_content = content if isinstance(content, str) else content.decode()
+            modulemd_index.update_from_string(module_content, True)
+        return modulemd_index
 
-        # Parsing modules happens all at one time, and from here on no useful work happens.
-        # So just report that it finished this stage.
+    async def _parse_modulemd_list(self, modulemd_index):
+        modulemd_names = modulemd_index.get_module_names() or []
         modulemd_pb_data = {'message': 'Parsed Modulemd', 'code': 'parsing.modulemds'}
         with ProgressReport(**modulemd_pb_data) as modulemd_pb:
-            modulemd_total = len(modulemd_all)
-            modulemd_pb.total = modulemd_total
-            modulemd_pb.done = modulemd_total
-
-        for modulemd in modulemd_all:
-            artifact = modulemd.pop('artifact')
-            relative_path = '{}{}{}{}{}snippet'.format(
-                modulemd[PULP_MODULE_ATTR.NAME], modulemd[PULP_MODULE_ATTR.STREAM],
-                modulemd[PULP_MODULE_ATTR.VERSION], modulemd[PULP_MODULE_ATTR.CONTEXT],
-                modulemd[PULP_MODULE_ATTR.ARCH]
-            )
-            da = DeclarativeArtifact(
-                artifact=artifact,
-                relative_path=relative_path,
-                url=self.data.modules_url
-            )
-            modulemd_content = Modulemd(**modulemd)
-            dc = DeclarativeContent(content=modulemd_content, d_artifacts=[da])
-            dc.extra_data = defaultdict(list)
-
-            # dc.content.artifacts are Modulemd artifacts
-            for artifact in dc.content.artifacts:
-                self.data.nevra_to_module.setdefault(artifact, set()).add(dc)
-            self.data.modulemd_list.append(dc)
+            async for modulemd in parse_modulemd_in_chunks(modulemd_names, modulemd_index):
+                self._add_modulemd(modulemd)
+                modulemd_pb.increment()
+
+    def _add_modulemd(self, modulemd):
+        artifact = modulemd.pop('artifact')
+        relative_path = '{}{}{}{}{}snippet'.format(
+            modulemd[PULP_MODULE_ATTR.NAME], modulemd[PULP_MODULE_ATTR.STREAM],
+            modulemd[PULP_MODULE_ATTR.VERSION], modulemd[PULP_MODULE_ATTR.CONTEXT],
+            modulemd[PULP_MODULE_ATTR.ARCH]
+        )
+        da = DeclarativeArtifact(
+            artifact=artifact,
+            relative_path=relative_path,
+            url=self.data.modules_url
+        )
+        modulemd_content = Modulemd(**modulemd)
+        dc = DeclarativeContent(content=modulemd_content, d_artifacts=[da])
+        dc.extra_data = defaultdict(list)
 
-        # delete list now that we're done with it for memory savings
-        del modulemd_all
+        # dc.content.artifacts are Modulemd artifacts
+        for artifact in dc.content.artifacts:
+            self.data.nevra_to_module.setdefault(artifact, set()).add(dc)
+        self.data.modulemd_list.append(dc)
 
     def _parse_modulemd_default_names(self, modulemd_index):
         modulemd_default_names = parse_defaults(modulemd_index)
@@ -920,49 +2183,74 @@ class RpmInterrelateContent(Stage):
     """
     A stage that creates relationships between Packages and other related types.
 
-    This stage creates relationships Packages and Modulemd, PackageGroup, PackageCatagory and
-    PackageEnvironment models.
+    This stage creates relationships between Packages and Modulemd models. The relations of all
+    the content of a sync are collected and created at once, when all the content is saved.
     """
 
+    def __init__(self):
+        """Initialize the metrics of the stage."""
+        super().__init__()
+        self.metrics = PhaseMetrics('interrelating', 'Content Interrelating Timing')
+
     async def run(self):
         """
         Create all the relationships.
         """
-        async for batch in self.batches():
-            with transaction.atomic():
-                ModulemdPackages = Modulemd.packages.through
-
-                modulemd_pkgs_to_save = []
+        modulemd_nevras = {}
+        package_pks = {}
 
-                for d_content in batch:
-                    if d_content is None:
-                        continue
+        async for batch in self.metrics.measure_batches(self.batches()):
+            for d_content in batch:
+                if d_content is None:
+                    continue
 
-                    if isinstance(d_content.content, Modulemd):
-                        for pkg in d_content.extra_data['package_relation']:
-                            if not pkg.content._state.adding:
-                                module_package = ModulemdPackages(
-                                    package_id=pkg.content.pk,
-                                    modulemd_id=d_content.content.pk,
-                                )
-                                modulemd_pkgs_to_save.append(module_package)
-
-                    elif isinstance(d_content.content, Package):
-                        for modulemd in d_content.extra_data['modulemd_relation']:
-                            if not modulemd.content._state.adding:
-                                module_package = ModulemdPackages(
-                                    package_id=d_content.content.pk,
-                                    modulemd_id=modulemd.content.pk,
-                                )
-                                modulemd_pkgs_to_save.append(module_package)
-
-                if modulemd_pkgs_to_save:
-                    ModulemdPackages.objects.bulk_create(modulemd_pkgs_to_save,
-                                                         ignore_conflicts=True)
+                if isinstance(d_content.content, Modulemd):
+                    modulemd_nevras[d_content.content.pk] = d_content.content.artifacts
+                elif isinstance(d_content.content, Package):
+                    if d_content.extra_data['modulemd_relation']:
+                        package_pks[d_content.content.nevra] = d_content.content.pk
 
             for declarative_content in batch:
                 await self.put(declarative_content)
 
+        with self.metrics.measure():
+            self._relate_modulemd_packages(modulemd_nevras, package_pks)
+        self.metrics.report()
+
+    @staticmethod
+    def _relate_modulemd_packages(modulemd_nevras, package_pks):
+        """
+        Create relations between modulemds and their packages which don't exist yet.
+
+        Args:
+            modulemd_nevras(dict): NEVRAs of packages of a modulemd with its pk as a key
+            package_pks(dict): pks of packages with their NEVRA as a key
+
+        """
+        if not modulemd_nevras or not package_pks:
+            return
+
+        ModulemdPackages = Modulemd.packages.through
+
+        existing_relations = set(ModulemdPackages.objects.filter(
+            modulemd_id__in=modulemd_nevras.keys()
+        ).values_list('modulemd_id', 'package_id'))
+
+        modulemd_pkgs_to_save = []
+        for modulemd_pk, nevras in modulemd_nevras.items():
+            for nevra in set(nevras).intersection(package_pks):
+                relation = (modulemd_pk, package_pks[nevra])
+                if relation not in existing_relations:
+                    modulemd_pkgs_to_save.append(ModulemdPackages(
+                        modulemd_id=modulemd_pk, package_id=package_pks[nevra]
+                    ))
+
+        if modulemd_pkgs_to_save:
+            # another sync can create the same relations at the same time
+            ModulemdPackages.objects.bulk_create(
+                modulemd_pkgs_to_save, batch_size=1000, ignore_conflicts=True
+            )
+
 
 class RpmContentSaver(ContentSaver):
     """
@@ -972,6 +2260,42 @@ class RpmContentSaver(ContentSaver):
     the UpdateRecord content unit.
     """
 
+    def __init__(self, checkpoint=None):
+        """
+        Initialize the metrics of the stage.
+
+        Args:
+            checkpoint (SyncCheckpoint): The checkpoint to record the saved batches in
+
+        """
+        super().__init__()
+        self.checkpoint = checkpoint
+        self.metrics = PhaseMetrics('saving', 'Content Saving Timing')
+
+    async def run(self):
+        """
+        Save the content and report the time and memory spent saving it.
+        """
+        await super().run()
+        self.metrics.report()
+
+    async def batches(self, minsize=500):
+        """
+        Asynchronous iterator yielding batches of content, measuring the saving of each batch.
+
+        Args:
+            minsize (int): The minimum batch size to yield (unless it is the final batch)
+
+        Yields:
+            A list of :class:`~pulpcore.plugin.stages.DeclarativeContent` instances
+
+        """
+        async for batch in self.metrics.measure_batches(super().batches(minsize)):
+            yield batch
+            # the next batch is requested once this one is committed
+            if self.checkpoint:
+                self.checkpoint.record_saved(batch)
+
     async def _post_save(self, batch):
         """
         Save a batch of UpdateCollection, UpdateCollectionPackage, UpdateReference objects.
@@ -1037,7 +2361,24 @@ class RpmContentSaver(ContentSaver):
         update_record_collections_to_save = []
         update_references_to_save = []
         update_collection_packages_to_save = []
-        seen_updaterecords = []
+        seen_updaterecords = set()
+
+        # existing content which was retrieved from the db at earlier stages has its relations
+        update_record_pks = [
+            declarative_content.content.pk for declarative_content in batch
+            if declarative_content and isinstance(declarative_content.content, UpdateRecord)
+        ]
+        update_records_with_relations = set()
+        if update_record_pks:
+            update_records_with_relations.update(
+                UpdateRecordCollections.objects.filter(
+                    updaterecord_id__in=update_record_pks
+                ).values_list('updaterecord_id', flat=True).union(
+                    UpdateReference.objects.filter(
+                        update_record_id__in=update_record_pks
+                    ).values_list('update_record_id', flat=True)
+                )
+            )
 
         for declarative_content in batch:
             if declarative_content is None:
@@ -1049,11 +2390,7 @@ class RpmContentSaver(ContentSaver):
             elif isinstance(declarative_content.content, UpdateRecord):
                 update_record = declarative_content.content
 
-                relations_exist = (
-                    update_record.collections.count() or update_record.references.count()
-                )
-                if relations_exist:
-                    # existing content which was retrieved from the db at earlier stages
+                if update_record.pk in update_records_with_relations:
                     continue
 
                 # if there are same update_records in a batch, the relations to the references
@@ -1062,7 +2399,7 @@ class RpmContentSaver(ContentSaver):
                 # It can happen easily during pulp 2to3 migration, or in case of a bad repo.
                 if update_record.digest in seen_updaterecords:
                     continue
-                seen_updaterecords.append(update_record.digest)
+                seen_updaterecords.add(update_record.digest)
 
                 future_relations = declarative_content.extra_data
                 update_collections = future_relations.get('collections', {})
@@ -1,8 +1,12 @@
 from django.conf.urls import url
 
-from .viewsets import CopyViewSet
+from .viewsets import CopyViewSet, ProfileViewSet
 
 
 urlpatterns = [
-    url(r'^pulp/api/v3/rpm/copy/$', CopyViewSet.as_view({'post': 'create'}))
+    url(r'^pulp/api/v3/rpm/copy/$', CopyViewSet.as_view({'post': 'create'})),
+    url(
+        r'^pulp/api/v3/rpm/profiles/(?P<pk>[0-9a-f-]+)/$',
+        ProfileViewSet.as_view({'get': 'retrieve'})
+    ),
 ]
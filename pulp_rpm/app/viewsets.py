@@ -1,6 +1,9 @@
+from django.core.files.storage import default_storage as storage
+from django.http import FileResponse, Http404
 from django_filters import CharFilter
 from gettext import gettext as _
 
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema
 from rest_framework import viewsets, mixins
 from rest_framework.decorators import action
@@ -22,6 +25,7 @@ from pulpcore.plugin.viewsets import (
     RepositoryViewSet,
     RepositoryVersionViewSet,
     SingleArtifactContentUploadViewSet,
+    TaskViewSet,
 )
 
 from pulp_rpm.app import tasks
@@ -41,6 +45,7 @@ from pulp_rpm.app.models import (
     RpmPublication,
     UpdateRecord,
 )
+from pulp_rpm.app.profiling import profile_path
 from pulp_rpm.app.serializers import (
     CopySerializer,
     DistributionTreeSerializer,
@@ -227,6 +232,8 @@ class RpmPublicationViewSet(PublicationViewSet):
             metadata=metadata_checksum_type,
             package=package_checksum_type,
         )
+        sqlite_metadata = serializer.validated_data.get('sqlite_metadata', True)
+        compression_type = serializer.validated_data.get('compression_type')
 
         result = enqueue_with_reservation(
             tasks.publish,
@@ -235,6 +242,8 @@ class RpmPublicationViewSet(PublicationViewSet):
                 'repository_version_pk': repository_version.pk,
                 'metadata_signing_service': repository.metadata_signing_service,
                 'checksum_types': checksum_types,
+                'sqlite_metadata': sqlite_metadata,
+                'compression_type': compression_type,
             }
         )
         return OperationPostponedResponse(result, request)
@@ -250,6 +259,32 @@ class RpmDistributionViewSet(BaseDistributionViewSet):
     serializer_class = RpmDistributionSerializer
 
 
+class ProfileViewSet(viewsets.ViewSet):
+    """
+    ViewSet for profiles of tasks.
+    """
+
+    @extend_schema(
+        description="Download the cProfile profile of a task which was profiled because its "
+                    "name is listed in the RPM_PROFILE_TASKS setting.",
+        summary="Download a task profile",
+        operation_id="rpm_profile_read",
+        responses={200: OpenApiTypes.BINARY}
+    )
+    def retrieve(self, request, pk):
+        """Download the profile of a task, the access rules of the task apply."""
+        task_viewset = TaskViewSet(
+            request=request, args=(), kwargs={'pk': pk}, action='retrieve', format_kwarg=None
+        )
+        task_viewset.check_permissions(request)
+        task = task_viewset.get_object()
+
+        path = profile_path(task.pk)
+        if not storage.exists(path):
+            raise Http404(_("The task {pk} has no profile.").format(pk=pk))
+        return FileResponse(storage.open(path), as_attachment=True, filename=f'{pk}.prof')
+
+
 class CopyViewSet(viewsets.ViewSet):
     """
     ViewSet for Content Copy.
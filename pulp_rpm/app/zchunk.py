@@ -0,0 +1,394 @@
+"""
+Support for the zchunk metadata of RPM repositories.
+
+A zchunk file is split into independently compressed chunks, so a new version of the file can be
+put together from the chunks of a previous version and only the changed chunks downloaded. The
+file format is described at https://github.com/zchunk/zchunk/blob/main/zchunk_format.txt.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+
+from collections import namedtuple
+from gettext import gettext as _
+from logging import getLogger
+
+import zstandard
+
+
+log = getLogger(__name__)
+
+ZCK_MAGIC = b'\0ZCK1'
+
+# hashlib name and the size of a digest in bytes for each zchunk checksum type
+ZCK_CHECKSUM_TYPES = {
+    0: ('sha1', 20),
+    1: ('sha256', 32),
+    2: ('sha512', 64),
+    3: ('sha512', 16),  # SHA-512/128, the first 128 bits of a SHA-512 digest
+}
+
+ZCK_FLAG_STREAMS = 1
+ZCK_FLAG_OPTIONAL_ELEMENTS = 2
+ZCK_FLAG_UNCOMPRESSED_CHECKSUMS = 4
+ZCK_FLAGS = ZCK_FLAG_STREAMS | ZCK_FLAG_OPTIONAL_ELEMENTS | ZCK_FLAG_UNCOMPRESSED_CHECKSUMS
+
+ZCK_COMPRESSION_NONE = 0
+ZCK_COMPRESSION_ZSTD = 2
+
+# the magic, the checksum type, the header size and the longest header checksum
+ZCK_MAX_LEAD_SIZE = len(ZCK_MAGIC) + 10 + 10 + 64
+
+ZchunkChunk = namedtuple('ZchunkChunk', ['checksum', 'start', 'length', 'uncompressed_length'])
+
+
+def read_compressed_int(data, offset):
+    """
+    Read an integer stored in the zchunk format.
+
+    The integer is stored in little endian order, 7 bits per byte. The highest bit is set in the
+    last byte only.
+
+    Args:
+        data (bytes): data to read the integer from
+        offset (int): position of the integer in the data
+
+    Returns:
+        tuple: the integer and the position right after it
+
+    """
+    value = 0
+    for position in range(offset, len(data)):
+        value |= (data[position] & 0x7f) << (7 * (position - offset))
+        if data[position] & 0x80:
+            return value, position + 1
+    raise ValueError(_("zchunk header is truncated"))
+
+
+def zchunk_digest(checksum_type, data):
+    """
+    Compute a digest of the data as zchunk does.
+
+    Args:
+        checksum_type (int): zchunk checksum type
+        data (bytes): data to compute the digest of
+
+    Returns:
+        bytes: the digest
+
+    """
+    try:
+        name, size = ZCK_CHECKSUM_TYPES[checksum_type]
+    except KeyError:
+        raise ValueError(_("Unknown zchunk checksum type: {}").format(checksum_type))
+    return hashlib.new(name, data).digest()[:size]
+
+
+class ZchunkHeader:
+    """
+    The header of a zchunk file.
+
+    It consists of the lead with the header checksum, the preface and the index of chunks.
+    The first chunk in the index is the compression dictionary, `chunks` are the chunks with data.
+    """
+
+    def __init__(self, data):
+        """
+        Parse the header.
+
+        Args:
+            data (bytes): the beginning of a zchunk file, at least the whole header
+
+        Raises:
+            ValueError: If the data are not a valid zchunk header.
+
+        """
+        if not data.startswith(ZCK_MAGIC):
+            raise ValueError(_("Not a zchunk file"))
+        self.checksum_type, offset = read_compressed_int(data, len(ZCK_MAGIC))
+        header_size, offset = read_compressed_int(data, offset)
+        lead_end = offset + len(zchunk_digest(self.checksum_type, b''))
+        self.size = lead_end + header_size
+        if len(data) < self.size:
+            raise ValueError(_("zchunk header is truncated"))
+
+        self.data = data[:self.size]
+        self.checksum = data[offset:lead_end].hex()
+        digest = zchunk_digest(self.checksum_type, data[:offset] + data[lead_end:self.size])
+        if digest.hex() != self.checksum:
+            raise ValueError(_("zchunk header checksum does not match"))
+
+        offset = lead_end + len(digest)  # skip the checksum of the data
+        flags, offset = read_compressed_int(data, offset)
+        if flags & ~ZCK_FLAGS:
+            raise ValueError(_("Unknown zchunk flags: {}").format(flags))
+        self.compression_type, offset = read_compressed_int(data, offset)
+        if flags & ZCK_FLAG_OPTIONAL_ELEMENTS:
+            count, offset = read_compressed_int(data, offset)
+            for element in range(count):
+                element_id, offset = read_compressed_int(data, offset)
+                element_size, offset = read_compressed_int(data, offset)
+                offset += element_size
+
+        index_size, offset = read_compressed_int(data, offset)
+        self.chunk_checksum_type, offset = read_compressed_int(data, offset)
+        chunk_digest_size = len(zchunk_digest(self.chunk_checksum_type, b''))
+        count, offset = read_compressed_int(data, offset)
+        if not count:
+            raise ValueError(_("zchunk index does not contain a dictionary"))
+
+        chunks = []
+        start = self.size
+        for index in range(count):
+            if flags & ZCK_FLAG_STREAMS:
+                stream, offset = read_compressed_int(data, offset)
+            checksum = data[offset:offset + chunk_digest_size]
+            offset += chunk_digest_size
+            if flags & ZCK_FLAG_UNCOMPRESSED_CHECKSUMS:
+                offset += chunk_digest_size
+            length, offset = read_compressed_int(data, offset)
+            uncompressed_length, offset = read_compressed_int(data, offset)
+            chunks.append(ZchunkChunk(checksum, start, length, uncompressed_length))
+            start += length
+        if offset > self.size:
+            raise ValueError(_("zchunk header is truncated"))
+
+        self.dict_chunk = chunks[0]
+        self.chunks = chunks[1:]
+        self.file_size = start
+
+    @classmethod
+    def from_file(cls, zck_file):
+        """
+        Read the header from the beginning of a zchunk file.
+
+        Args:
+            zck_file (file): a zchunk file opened in binary mode
+
+        Returns:
+            ZchunkHeader: the header of the file
+
+        """
+        zck_file.seek(0)
+        data = zck_file.read(ZCK_MAX_LEAD_SIZE)
+        if not data.startswith(ZCK_MAGIC):
+            raise ValueError(_("Not a zchunk file"))
+        checksum_type, offset = read_compressed_int(data, len(ZCK_MAGIC))
+        header_size, offset = read_compressed_int(data, offset)
+        size = offset + len(zchunk_digest(checksum_type, b'')) + header_size
+        data += zck_file.read(max(size - len(data), 0))
+        return cls(data)
+
+    def all_chunks(self):
+        """
+        Return the dictionary and data chunks in the order they are stored in the file.
+        """
+        return [self.dict_chunk] + self.chunks
+
+
+def missing_ranges(header, reusable_chunks):
+    """
+    Find byte ranges of the chunks which can't be reused from a previous zchunk file.
+
+    Adjacent missing chunks are merged into one range to keep the number of requests low.
+
+    Args:
+        header (ZchunkHeader): the header of a new zchunk file
+        reusable_chunks (dict): chunks of a previous file keyed by their checksum and length
+
+    Returns:
+        list: tuples of the first and the last byte of each range
+
+    """
+    ranges = []
+    for chunk in header.all_chunks():
+        if not chunk.length or (chunk.checksum, chunk.length) in reusable_chunks:
+            continue
+        end = chunk.start + chunk.length - 1
+        if ranges and ranges[-1][1] + 1 == chunk.start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((chunk.start, end))
+    return ranges
+
+
+def read_reusable_chunks(previous_file, chunk_checksum_type):
+    """
+    Index chunks of a previous zchunk file by their checksum and length.
+
+    Args:
+        previous_file (file): a previous version of the zchunk file opened in binary mode, or None
+        chunk_checksum_type (int): zchunk checksum type of chunks of the new file
+
+    Returns:
+        dict: chunks of the previous file which can be reused
+
+    """
+    if not previous_file:
+        return {}
+    try:
+        previous_header = ZchunkHeader.from_file(previous_file)
+    except ValueError as exc:
+        log.warning(_("Previous zchunk file can't be reused: {}").format(exc))
+        return {}
+    if previous_header.chunk_checksum_type != chunk_checksum_type:
+        return {}
+    return {
+        (chunk.checksum, chunk.length): chunk
+        for chunk in previous_header.all_chunks() if chunk.length
+    }
+
+
+async def download_zchunk(remote, url, record, previous_file=None):
+    """
+    Download a zchunk file, reusing the chunks of its previous version.
+
+    The header is downloaded first, then only the chunks which are not in the previous file are
+    requested with HTTP range requests. Every chunk and the whole file are verified.
+
+    Args:
+        remote (RpmRemote): the remote to download the file with
+        url (str): URL of the zchunk file
+        record (createrepo_c.RepomdRecord): the repomd record of the zchunk file
+        previous_file (file): a previous version of the file opened in binary mode, or None
+
+    Raises:
+        ValueError: If the file can't be put together or it doesn't match the record.
+
+    Returns:
+        str: path to the downloaded zchunk file
+
+    """
+    if not record.size_header:
+        raise ValueError(_("Size of the zchunk header is not known"))
+    downloader = remote.get_downloader(url=url, byte_range=(0, record.size_header - 1))
+    result = await downloader.run()
+    with open(result.path, 'rb') as header_file:
+        header = ZchunkHeader.from_file(header_file)
+    if record.checksum_header and header.checksum != record.checksum_header:
+        raise ValueError(_("zchunk header of {} does not match repomd.xml").format(url))
+
+    reusable_chunks = read_reusable_chunks(previous_file, header.chunk_checksum_type)
+    ranges = missing_ranges(header, reusable_chunks)
+    results = await asyncio.gather(*[
+        remote.get_downloader(url=url, byte_range=byte_range).run() for byte_range in ranges
+    ])
+    downloaded_parts = {byte_range[0]: result.path for byte_range, result in zip(ranges, results)}
+    downloaded_size = header.size + sum(end - start + 1 for start, end in ranges)
+    log.info(_("Downloaded {downloaded} of {total} bytes of {url}").format(
+        downloaded=downloaded_size, total=header.file_size, url=url
+    ))
+    return await asyncio.get_event_loop().run_in_executor(
+        None, assemble_zchunk, url, record, header, downloaded_parts, reusable_chunks, previous_file
+    )
+
+
+def assemble_zchunk(url, record, header, downloaded_parts, reusable_chunks, previous_file=None):
+    """
+    Put a zchunk file together from downloaded parts and chunks of its previous version.
+
+    Args:
+        url (str): URL of the zchunk file
+        record (createrepo_c.RepomdRecord): the repomd record of the zchunk file
+        header (ZchunkHeader): the header of the zchunk file
+        downloaded_parts (dict): paths to the downloaded ranges keyed by their first byte
+        reusable_chunks (dict): chunks of the previous file keyed by their checksum and length
+        previous_file (file): a previous version of the file opened in binary mode, or None
+
+    Raises:
+        ValueError: If a chunk or the whole file doesn't match.
+
+    Returns:
+        str: path to the zchunk file
+
+    """
+    checksum = hashlib.new(record.checksum_type)
+    zck_path = tempfile.NamedTemporaryFile(dir=os.getcwd(), suffix='.zck', delete=False).name
+    with open(zck_path, 'wb') as zck_file:
+        zck_file.write(header.data)
+        checksum.update(header.data)
+        part_file, part_start = None, None
+        for chunk in header.all_chunks():
+            if chunk.start in downloaded_parts:
+                if part_file:
+                    part_file.close()
+                part_file, part_start = open(downloaded_parts[chunk.start], 'rb'), chunk.start
+            reusable_chunk = reusable_chunks.get((chunk.checksum, chunk.length))
+            if not chunk.length:
+                data = b''
+            elif reusable_chunk:
+                previous_file.seek(reusable_chunk.start)
+                data = previous_file.read(reusable_chunk.length)
+            else:
+                part_file.seek(chunk.start - part_start)
+                data = part_file.read(chunk.length)
+            if chunk.length and zchunk_digest(header.chunk_checksum_type, data) != chunk.checksum:
+                raise ValueError(_("zchunk chunk checksum of {} does not match").format(url))
+            zck_file.write(data)
+            checksum.update(data)
+        if part_file:
+            part_file.close()
+
+    if checksum.hexdigest() != record.checksum:
+        raise ValueError(_("Checksum of {} does not match repomd.xml").format(url))
+    return zck_path
+
+
+def decompress_zchunk(zck_path, record):
+    """
+    Decompress a zchunk file.
+
+    Args:
+        zck_path (str): path to the zchunk file
+        record (createrepo_c.RepomdRecord): the repomd record of the zchunk file
+
+    Raises:
+        ValueError: If the file can't be decompressed or it doesn't match the record.
+
+    Returns:
+        str: path to the decompressed file
+
+    """
+    path = tempfile.NamedTemporaryFile(dir=os.getcwd(), delete=False).name
+    checksum = hashlib.new(record.checksum_open_type or record.checksum_type)
+    with open(zck_path, 'rb') as zck_file, open(path, 'wb') as decompressed_file:
+        header = ZchunkHeader.from_file(zck_file)
+        if header.compression_type == ZCK_COMPRESSION_NONE:
+            decompressor = None
+        elif header.compression_type == ZCK_COMPRESSION_ZSTD:
+            decompressor = zstandard.ZstdDecompressor()
+            if header.dict_chunk.length:
+                zck_file.seek(header.dict_chunk.start)
+                dict_data = decompressor.decompress(
+                    zck_file.read(header.dict_chunk.length),
+                    max_output_size=header.dict_chunk.uncompressed_length
+                )
+                decompressor = zstandard.ZstdDecompressor(
+                    dict_data=zstandard.ZstdCompressionDict(dict_data)
+                )
+        else:
+            raise ValueError(
+                _("Unsupported zchunk compression type: {}").format(header.compression_type)
+            )
+
+        for chunk in header.chunks:
+            if not chunk.length:
+                continue
+            zck_file.seek(chunk.start)
+            data = zck_file.read(chunk.length)
+            if decompressor:
+                try:
+                    data = decompressor.decompress(
+                        data, max_output_size=chunk.uncompressed_length
+                    )
+                except zstandard.ZstdError as exc:
+                    raise ValueError(_("Unable to decompress {}: {}").format(zck_path, exc))
+            decompressed_file.write(data)
+            checksum.update(data)
+
+    if record.checksum_open and checksum.hexdigest() != record.checksum_open:
+        raise ValueError(_("Checksum of decompressed {} does not match repomd.xml").format(
+            record.location_href
+        ))
+    return path
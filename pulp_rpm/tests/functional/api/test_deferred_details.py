@@ -0,0 +1,231 @@
+# coding=utf-8
+"""Tests for packages synced without their files and changelogs."""
+import gzip
+import os
+import unittest
+from xml.etree import ElementTree
+
+from pulp_smash import api, config
+from pulp_smash.utils import http_get
+from pulp_smash.pulp3.utils import (
+    delete_orphans,
+    gen_distribution,
+    gen_repo,
+    get_content,
+    modify_repo,
+)
+
+from pulp_rpm.tests.functional.constants import (
+    RPM_CONTENT_PATH,
+    RPM_NAMESPACES,
+    RPM_PACKAGE_CONTENT_NAME,
+    RPM_UNSIGNED_FIXTURE_URL,
+)
+from pulp_rpm.tests.functional.utils import (
+    gen_rpm_client,
+    gen_rpm_remote,
+    monitor_task,
+    rpm_copy,
+)
+from pulp_rpm.tests.functional.utils import set_up_module as setUpModule  # noqa:F401
+from pulp_rpm.tests.functional.utils import PulpTestCase
+
+from pulpcore.client.pulp_rpm import (
+    DistributionsRpmApi,
+    PublicationsRpmApi,
+    RepositoriesRpmApi,
+    RpmRepositorySyncURL,
+    RemotesRpmApi,
+    RpmRpmPublication,
+)
+
+
+def read_metadata(base_url, data_type):
+    """Read a type of metadata of a published repository.
+
+    Args:
+        base_url(string):
+            The URL of the repository.
+        data_type(string):
+            The type of the metadata in repomd.xml, e.g. 'filelists'.
+
+    Returns (xml.etree.ElementTree.Element):
+        The parsed metadata.
+    """
+    repomd = ElementTree.fromstring(http_get(os.path.join(base_url, 'repodata/repomd.xml')))
+    namespace = RPM_NAMESPACES['metadata/repo']
+    for data_elem in repomd.findall('{{{}}}data'.format(namespace)):
+        if data_elem.get('type') == data_type:
+            href = data_elem.find('{{{}}}location'.format(namespace)).get('href')
+            break
+    content = http_get(os.path.join(base_url, href))
+    try:
+        content = gzip.decompress(content)
+    except OSError:
+        # the metadata isn't compressed, or it was decompressed on the way
+        pass
+    return ElementTree.fromstring(content)
+
+
+def get_files(filelists):
+    """Get files of each package in filelists metadata.
+
+    Args:
+        filelists(xml.etree.ElementTree.Element):
+            The parsed filelists metadata.
+
+    Returns (dict):
+        The sorted files of each package with its pkgId as a key.
+    """
+    namespace = RPM_NAMESPACES['metadata/filelists']
+    return {
+        package_elem.get('pkgid'): sorted(
+            file_elem.text for file_elem in package_elem.findall('{{{}}}file'.format(namespace))
+        )
+        for package_elem in filelists.findall('{{{}}}package'.format(namespace))
+    }
+
+
+class DeferredPackageDetailsTestCase(PulpTestCase):
+    """Verify packages synced with the RPM_DEFER_PACKAGE_DETAILS setting.
+
+    The tests are skipped when the setting isn't enabled on the Pulp server.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Create class-wide variables."""
+        cls.cfg = config.get_config()
+        cls.client = gen_rpm_client()
+        cls.api_client = api.Client(cls.cfg, api.json_handler)
+        cls.repo_api = RepositoriesRpmApi(cls.client)
+        cls.remote_api = RemotesRpmApi(cls.client)
+        cls.publications = PublicationsRpmApi(cls.client)
+        cls.distributions = DistributionsRpmApi(cls.client)
+        cls.upstream_files = get_files(read_metadata(RPM_UNSIGNED_FIXTURE_URL, 'filelists'))
+
+    def setUp(self):
+        """Remove packages filled in by other tests."""
+        delete_orphans(self.cfg)
+
+    def sync_deferred(self, repo):
+        """Sync a repository on demand, so that details of its packages are deferred.
+
+        Args:
+            repo:
+                The repository to sync.
+
+        Returns:
+            The synced repository.
+        """
+        remote = self.remote_api.create(gen_rpm_remote(policy='on_demand'))
+        self.addCleanup(self.remote_api.delete, remote.pulp_href)
+
+        repository_sync_data = RpmRepositorySyncURL(remote=remote.pulp_href)
+        sync_response = self.repo_api.sync(repo.pulp_href, repository_sync_data)
+        monitor_task(sync_response.task)
+        repo = self.repo_api.read(repo.pulp_href)
+
+        packages = get_content(repo.to_dict())[RPM_PACKAGE_CONTENT_NAME]
+        if not any(package['deferred_details'] for package in packages):
+            raise unittest.SkipTest('RPM_DEFER_PACKAGE_DETAILS is not enabled')
+        for package in packages:
+            self.assertTrue(package['deferred_details'])
+            self.assertEqual(package['files'], [])
+            self.assertEqual(package['changelogs'], [])
+        return repo
+
+    def create_repo(self):
+        """Create a repository which is deleted when the test ends."""
+        repo = self.repo_api.create(gen_repo())
+        self.addCleanup(self.repo_api.delete, repo.pulp_href)
+        return repo
+
+    def publish(self, repo):
+        """Publish and distribute a repository.
+
+        Returns:
+            The finished publish task, or a dict describing the failed one.
+        """
+        publish_data = RpmRpmPublication(repository=repo.pulp_href, compression_type='none')
+        publish_response = self.publications.create(publish_data)
+        created_resources = monitor_task(publish_response.task)
+        if isinstance(created_resources, dict):
+            return created_resources
+        self.addCleanup(self.publications.delete, created_resources[0])
+
+        body = gen_distribution()
+        body['publication'] = created_resources[0]
+        distribution_response = self.distributions.create(body)
+        created_resources = monitor_task(distribution_response.task)
+        distribution = self.distributions.read(created_resources[0])
+        self.addCleanup(self.distributions.delete, distribution.pulp_href)
+        return distribution.base_url
+
+    def assert_details_filled(self, repo):
+        """Assert that packages of a repository have the files of the upstream packages."""
+        repo = self.repo_api.read(repo.pulp_href)
+        for package in get_content(repo.to_dict())[RPM_PACKAGE_CONTENT_NAME]:
+            with self.subTest(package=package['location_href']):
+                self.assertFalse(package['deferred_details'])
+                self.assertEqual(
+                    sorted(path + name for _, path, name in package['files']),
+                    self.upstream_files[package['pkgId']]
+                )
+
+    def test_publish(self):
+        """Publish deferred packages.
+
+        1. Sync a repository on demand.
+        2. Publish it.
+        3. Assert that published filelists are the same as upstream ones.
+        4. Assert that the packages have their files now.
+        """
+        repo = self.sync_deferred(self.create_repo())
+        base_url = self.publish(repo)
+
+        self.assertEqual(get_files(read_metadata(base_url, 'filelists')), self.upstream_files)
+        self.assert_details_filled(repo)
+
+    def test_copy_with_dependency_solving(self):
+        """Copy deferred packages with dependency solving.
+
+        1. Sync a repository on demand.
+        2. Copy all of its packages with dependency solving to another repository.
+        3. Assert that the packages have their files now.
+        """
+        repo = self.sync_deferred(self.create_repo())
+        dest_repo = self.create_repo()
+
+        rpm_content = self.api_client.get(
+            f'{RPM_CONTENT_PATH}?repository_version={repo.latest_version_href}'
+        )
+        config = [{
+            'source_repo_version': repo.latest_version_href,
+            'dest_repo': dest_repo.pulp_href,
+            'content': [package['pulp_href'] for package in rpm_content['results']],
+        }]
+        rpm_copy(self.cfg, config, recursive=True)
+
+        self.assert_details_filled(dest_repo)
+
+    def test_removed_metadata(self):
+        """Publish deferred packages which kept metadata was removed.
+
+        1. Sync a repository on demand.
+        2. Add its packages to another repository.
+        3. Delete the synced repository and orphans, which removes the kept metadata.
+        4. Assert that publishing the other repository fails.
+        """
+        # the repository is deleted by the test
+        repo = self.sync_deferred(self.repo_api.create(gen_repo()))
+        other_repo = self.create_repo()
+        packages = get_content(repo.to_dict())[RPM_PACKAGE_CONTENT_NAME]
+        modify_repo(self.cfg, other_repo.to_dict(), add_units=packages)
+
+        monitor_task(self.repo_api.delete(repo.pulp_href).task)
+        delete_orphans(self.cfg)
+
+        task = self.publish(self.repo_api.read(other_repo.pulp_href))
+        self.assertIsInstance(task, dict)
+        self.assertIn('Files and changelogs', task['error']['description'])
@@ -1,6 +1,8 @@
 # coding=utf-8
 """Tests that publish rpm plugin repositories."""
 import gzip
+import hashlib
+import lzma
 import os
 from tempfile import NamedTemporaryFile
 from random import choice
@@ -20,6 +22,7 @@ from pulp_smash.pulp3.utils import (
 
 from pulp_rpm.tests.functional.constants import (
     RPM_NAMESPACES,
+    RPM_ADVISORY_CONTENT_NAME,
     RPM_PACKAGE_CONTENT_NAME,
     RPM_KICKSTART_FIXTURE_URL,
     RPM_KICKSTART_REPOSITORY_ROOT_CONTENT,
@@ -587,3 +590,242 @@ class PublishDirectoryLayoutTestCase(PulpTestCase):
         self.addCleanup(self.distributions.delete, distribution.pulp_href)
 
         return distribution.to_dict()['base_url']
+
+
+def get_repomd_records(base_url):
+    """Get the records of repomd.xml of a distributed repository.
+
+    Args:
+        base_url(string):
+            RPM distribution base_url.
+
+    Returns (dict):
+        The location, checksum type, checksum and open checksum of each type of metadata.
+    """
+    repomd = ElementTree.fromstring(
+        http_get(os.path.join(base_url, 'repodata/repomd.xml'))
+    )
+    namespace = RPM_NAMESPACES['metadata/repo']
+    data_xpath = '{{{}}}data'.format(namespace)
+    location_xpath = '{{{}}}location'.format(namespace)
+    checksum_xpath = '{{{}}}checksum'.format(namespace)
+    open_checksum_xpath = '{{{}}}open-checksum'.format(namespace)
+
+    records = {}
+    for data_elem in repomd.findall(data_xpath):
+        open_checksum_elem = data_elem.find(open_checksum_xpath)
+        records[data_elem.get('type')] = {
+            'href': data_elem.find(location_xpath).get('href'),
+            'checksum_type': data_elem.find(checksum_xpath).get('type'),
+            'checksum': data_elem.find(checksum_xpath).text,
+            'open_checksum': open_checksum_elem.text if open_checksum_elem is not None else None,
+        }
+    return records
+
+
+class PublicationOptionsTestCase(PulpTestCase):
+    """Publish repositories with different options and verify the published metadata."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Create class-wide variables."""
+        delete_orphans()
+        cls.cfg = config.get_config()
+        cls.client = gen_rpm_client()
+        cls.repo_api = RepositoriesRpmApi(cls.client)
+        cls.remote_api = RemotesRpmApi(cls.client)
+        cls.publications = PublicationsRpmApi(cls.client)
+        cls.distributions = DistributionsRpmApi(cls.client)
+        cls.remote = cls.remote_api.create(gen_rpm_remote())
+
+    @classmethod
+    def tearDownClass(cls):
+        """Clean class-wide variables."""
+        cls.remote_api.delete(cls.remote.pulp_href)
+
+    def create_repo(self):
+        """Create a repository and sync it.
+
+        Returns:
+            The synced repository.
+        """
+        repo = self.repo_api.create(gen_repo())
+        self.addCleanup(self.repo_api.delete, repo.pulp_href)
+
+        repository_sync_data = RpmRepositorySyncURL(remote=self.remote.pulp_href)
+        sync_response = self.repo_api.sync(repo.pulp_href, repository_sync_data)
+        monitor_task(sync_response.task)
+        return self.repo_api.read(repo.pulp_href)
+
+    def publish(self, repo, **kwargs):
+        """Publish and distribute the latest version of a repository.
+
+        Args:
+            repo:
+                The repository to publish.
+            kwargs:
+                Options of the publication.
+
+        Returns (string):
+            RPM distribution base_url.
+        """
+        publish_data = RpmRpmPublication(repository=repo.pulp_href, **kwargs)
+        publish_response = self.publications.create(publish_data)
+        created_resources = monitor_task(publish_response.task)
+        publication_href = created_resources[0]
+        self.addCleanup(self.publications.delete, publication_href)
+
+        body = gen_distribution()
+        body["publication"] = publication_href
+        distribution_response = self.distributions.create(body)
+        created_resources = monitor_task(distribution_response.task)
+        distribution = self.distributions.read(created_resources[0])
+        self.addCleanup(self.distributions.delete, distribution.pulp_href)
+
+        return distribution.base_url
+
+    def test_reused_metadata_is_identical(self):
+        """Test that reused metadata is the same as metadata created from scratch.
+
+        1. Sync and publish a repository.
+        2. Remove an advisory and publish the new version, package metadata is reused.
+        3. Publish another repository with the same content, nothing can be reused.
+        4. Verify that both publications have the same metadata.
+        """
+        repo = self.create_repo()
+        first_records = get_repomd_records(self.publish(repo))
+
+        advisory = choice(get_content(repo.to_dict())[RPM_ADVISORY_CONTENT_NAME])
+        modify_repo(self.cfg, repo.to_dict(), remove_units=[advisory])
+        repo = self.repo_api.read(repo.pulp_href)
+        reused_records = get_repomd_records(self.publish(repo))
+
+        other_repo = self.repo_api.create(gen_repo())
+        self.addCleanup(self.repo_api.delete, other_repo.pulp_href)
+        units = [unit for units in get_content(repo.to_dict()).values() for unit in units]
+        modify_repo(self.cfg, other_repo.to_dict(), add_units=units)
+        other_repo = self.repo_api.read(other_repo.pulp_href)
+        new_records = get_repomd_records(self.publish(other_repo))
+
+        self.assertEqual(reused_records['primary']['href'], first_records['primary']['href'])
+        self.assertNotEqual(
+            reused_records['updateinfo']['open_checksum'],
+            first_records['updateinfo']['open_checksum']
+        )
+        self.assertEqual(reused_records.keys(), new_records.keys())
+        for record_type, record in reused_records.items():
+            # sqlite databases are created from the xml metadata compared here
+            if record_type.endswith('_db'):
+                continue
+            with self.subTest(record_type=record_type):
+                new_record = new_records[record_type]
+                self.assertEqual(
+                    record['open_checksum'] or record['checksum'],
+                    new_record['open_checksum'] or new_record['checksum']
+                )
+
+    def test_changed_options_invalidate_reuse(self):
+        """Test that metadata isn't reused when an option which changes it is changed."""
+        repo = self.create_repo()
+        default_records = get_repomd_records(self.publish(repo))
+        no_sqlite_records = get_repomd_records(self.publish(repo, sqlite_metadata=False))
+        sqlite_records = get_repomd_records(self.publish(repo))
+        gz_records = get_repomd_records(self.publish(repo, compression_type='gz'))
+        sha512_records = get_repomd_records(
+            self.publish(repo, compression_type='gz', metadata_checksum_type='sha512')
+        )
+
+        for record_type in ('primary_db', 'filelists_db', 'other_db'):
+            with self.subTest(record_type=record_type):
+                self.assertTrue(default_records[record_type]['href'].endswith('.bz2'))
+                self.assertNotIn(record_type, no_sqlite_records)
+                self.assertTrue(sqlite_records[record_type]['href'].endswith('.bz2'))
+                self.assertTrue(gz_records[record_type]['href'].endswith('.gz'))
+        for record_type, record in sha512_records.items():
+            with self.subTest(record_type=record_type):
+                self.assertEqual(record['checksum_type'], 'sha512')
+
+    def test_sqlite_metadata(self):
+        """Test that sqlite databases are published unless sqlite_metadata is false."""
+        repo = self.create_repo()
+        default_records = get_repomd_records(self.publish(repo))
+        no_sqlite_records = get_repomd_records(self.publish(repo, sqlite_metadata=False))
+
+        for record_type in ('primary', 'filelists', 'other'):
+            with self.subTest(record_type=record_type):
+                self.assertIn(record_type, default_records)
+                self.assertIn(record_type + '_db', default_records)
+                self.assertIn(record_type, no_sqlite_records)
+        self.assertFalse(
+            [record_type for record_type in no_sqlite_records if record_type.endswith('_db')]
+        )
+
+    def test_compression_type(self):
+        """Test that metadata is compressed with the chosen compression_type.
+
+        Metadata which can be decompressed here is verified against its open checksum.
+        """
+        repo = self.create_repo()
+        decompress = {'gz': read_xml_gz, 'xz': lzma.decompress, 'none': bytes}
+        suffixes = {'gz': '.gz', 'xz': '.xz', 'zstd': '.zst', 'none': ''}
+
+        for compression_type, suffix in suffixes.items():
+            base_url = self.publish(repo, compression_type=compression_type)
+            records = get_repomd_records(base_url)
+            for record_type in ('primary_db', 'filelists_db', 'other_db'):
+                with self.subTest(compression_type=compression_type, record_type=record_type):
+                    href = records[record_type]['href']
+                    self.assertTrue(href.endswith('.sqlite' + suffix))
+            for record_type in ('primary', 'filelists', 'other', 'updateinfo'):
+                with self.subTest(compression_type=compression_type, record_type=record_type):
+                    href = records[record_type]['href']
+                    self.assertTrue(href.endswith('.xml' + suffix))
+                    if compression_type not in decompress:
+                        continue
+                    content = decompress[compression_type](
+                        http_get(os.path.join(base_url, href))
+                    )
+                    self.assertEqual(
+                        hashlib.sha256(content).hexdigest(),
+                        records[record_type]['open_checksum'] or records[record_type]['checksum']
+                    )
+
+    def test_package_checksum_type(self):
+        """Test that pkgIds are checksums of the published packages of package_checksum_type.
+
+        The pkgIds in filelists and other metadata have to match the ones in primary.
+        """
+        repo = self.create_repo()
+        base_url = self.publish(repo, package_checksum_type='sha512', compression_type='none')
+        records = get_repomd_records(base_url)
+        metadata = {
+            record_type: ElementTree.fromstring(
+                http_get(os.path.join(base_url, records[record_type]['href']))
+            )
+            for record_type in ('primary', 'filelists', 'other')
+        }
+
+        common_namespace = RPM_NAMESPACES['metadata/common']
+        package_xpath = '{{{}}}package'.format(common_namespace)
+        checksum_xpath = '{{{}}}checksum'.format(common_namespace)
+        location_xpath = '{{{}}}location'.format(common_namespace)
+        pkgids = []
+        for package_elem in metadata['primary'].findall(package_xpath):
+            checksum_elem = package_elem.find(checksum_xpath)
+            location_href = package_elem.find(location_xpath).get('href')
+            with self.subTest(location_href=location_href):
+                self.assertEqual(checksum_elem.get('type'), 'sha512')
+                self.assertEqual(
+                    checksum_elem.text,
+                    hashlib.sha512(http_get(os.path.join(base_url, location_href))).hexdigest()
+                )
+            pkgids.append(checksum_elem.text)
+
+        for record_type in ('filelists', 'other'):
+            with self.subTest(record_type=record_type):
+                namespace = RPM_NAMESPACES['metadata/{}'.format(record_type)]
+                package_elems = metadata[record_type].findall('{{{}}}package'.format(namespace))
+                self.assertEqual(
+                    sorted(package_elem.get('pkgid') for package_elem in package_elems),
+                    sorted(pkgids)
+                )
@@ -4,6 +4,8 @@ import os
 import unittest
 from random import choice
 
+import requests
+
 from django.utils.dateparse import parse_datetime
 
 from pulp_smash import cli, config
@@ -41,6 +43,7 @@ from pulp_rpm.tests.functional.constants import (
     RPM_MIRROR_LIST_BAD_FIXTURE_URL,
     RPM_MODULAR_FIXTURE_SUMMARY,
     RPM_MODULAR_FIXTURE_URL,
+    RPM_MODULES_CONTENT_NAME,
     RPM_PACKAGE_CONTENT_NAME,
     RPM_PACKAGE_COUNT,
     RPM_RICH_WEAK_FIXTURE_URL,
@@ -170,6 +173,45 @@ class BasicSyncTestCase(PulpTestCase):
         self.assertDictEqual(get_content_summary(repo.to_dict()), RPM_MODULAR_FIXTURE_SUMMARY)
         self.assertDictEqual(get_added_content_summary(repo.to_dict()), RPM_MODULAR_FIXTURE_SUMMARY)
 
+    def test_sync_modular_packages(self):
+        """Sync RPM modular content and verify the packages of modulemds.
+
+        Each modulemd is related to the packages of the repository listed in its
+        artifacts. Syncing the same modulemds into another repository neither
+        loses nor duplicates the relations.
+        """
+        body = gen_rpm_remote(RPM_MODULAR_FIXTURE_URL)
+        remote = self.remote_api.create(body)
+        self.addCleanup(self.remote_api.delete, remote.pulp_href)
+
+        synced_modulemds = []
+        for _ in range(2):
+            repo, remote = self.do_test(remote=remote)
+            self.addCleanup(self.repo_api.delete, repo.pulp_href)
+            content = get_content(repo.to_dict())
+            synced_modulemds.append({
+                modulemd['pulp_href']: modulemd['packages']
+                for modulemd in content[RPM_MODULES_CONTENT_NAME]
+            })
+
+        package_hrefs = {
+            '{name}-{epoch}:{version}-{release}.{arch}'.format(**package): package['pulp_href']
+            for package in content[RPM_PACKAGE_CONTENT_NAME]
+        }
+        modulemds, existing_modulemds = synced_modulemds
+        self.assertEqual(modulemds.keys(), existing_modulemds.keys())
+        self.assertTrue(any(modulemds.values()))
+        for modulemd in content[RPM_MODULES_CONTENT_NAME]:
+            with self.subTest(modulemd=modulemd['pulp_href']):
+                expected_packages = sorted(
+                    package_hrefs[nevra] for nevra in modulemd['artifacts']
+                    if nevra in package_hrefs
+                )
+                self.assertEqual(sorted(modulemds[modulemd['pulp_href']]), expected_packages)
+                self.assertEqual(
+                    sorted(existing_modulemds[modulemd['pulp_href']]), expected_packages
+                )
+
     def test_checksum_constraint(self):
         """Verify checksum constraint test case.
 
@@ -651,6 +693,38 @@ class BasicSyncTestCase(PulpTestCase):
         # check that sync was optimized
         self.assertTrue(optimized)
 
+    def test_optimize_conditional_request(self):
+        """Sync without any metadata download when repomd.xml is not modified.
+
+        Do the following:
+
+        1. Sync (a repo and a remote will be created automatically).
+        2. Sync again.
+        3. Assert an "Optimizing Sync" progress report is present and metadata
+           wasn't downloaded, repomd.xml was requested conditionally.
+        4. Sync again with flag "optimize=False".
+        5. Assert metadata was downloaded.
+        """
+        response = requests.head(os.path.join(RPM_UNSIGNED_FIXTURE_URL, 'repodata/repomd.xml'))
+        if not {'ETag', 'Last-Modified'} & set(response.headers):
+            raise unittest.SkipTest('The fixtures server does not support conditional requests')
+
+        repo, remote = self.do_test()
+        self.addCleanup(self.repo_api.delete, repo.pulp_href)
+        self.addCleanup(self.remote_api.delete, remote.pulp_href)
+
+        report_list = self.sync(repository=repo, remote=remote)
+        self.assertTrue(self.optimize_report(progress_reports=report_list))
+        self.assertNotIn(
+            'downloading.metadata', [report.code for report in report_list]
+        )
+
+        report_list = self.sync(repository=repo, remote=remote, optimize=False)
+        self.assertFalse(self.optimize_report(progress_reports=report_list))
+        self.assertIn(
+            'downloading.metadata', [report.code for report in report_list]
+        )
+
     def test_sync_advisory_new_version(self):
         """Sync a repository and re-sync with newer version of Advisory.
 
@@ -823,6 +897,37 @@ class BasicSyncTestCase(PulpTestCase):
 
         self.assertIn(error_msg, task_result['error']['description'])
 
+    def test_sync_advisory_relations(self):
+        """Sync advisories which already exist into another repository.
+
+        The references and package lists of the existing advisories must be
+        neither lost nor duplicated.
+        """
+        body = gen_rpm_remote(RPM_REFERENCES_UPDATEINFO_URL)
+        remote = self.remote_api.create(body)
+        self.addCleanup(self.remote_api.delete, remote.pulp_href)
+
+        synced_advisories = []
+        for _ in range(2):
+            repo, remote = self.do_test(remote=remote)
+            self.addCleanup(self.repo_api.delete, repo.pulp_href)
+            synced_advisories.append({
+                advisory['id']: advisory
+                for advisory in get_content(repo.to_dict())[RPM_ADVISORY_CONTENT_NAME]
+            })
+        advisories, existing_advisories = synced_advisories
+
+        self.assertEqual(advisories.keys(), existing_advisories.keys())
+        self.assertTrue(any(advisory['references'] for advisory in advisories.values()))
+        for advisory_id, advisory in advisories.items():
+            with self.subTest(advisory_id=advisory_id):
+                existing_advisory = existing_advisories[advisory_id]
+                self.assertEqual(advisory['pulp_href'], existing_advisory['pulp_href'])
+                self.assertEqual(
+                    len(advisory['references']), len(existing_advisory['references'])
+                )
+                self.assertEqual(advisory['pkglist'], existing_advisory['pkglist'])
+
     def test_sync_advisory_incomplete_pgk_list(self):
         """Test failure sync advisories.
 
@@ -0,0 +1,13 @@
+# coding=utf-8
+"""Offline benchmarks of the rpm plugin.
+
+The benchmarks don't need a running Pulp, only its database. They generate
+synthetic repodata and run the parts of the plugin which process it, e.g.::
+
+    export RPM_BENCHMARK_PACKAGES=20000 RPM_BENCHMARK_RESULTS=/tmp
+    django-admin test --noinput -p "benchmark_*.py" pulp_rpm.tests.performance.offline
+
+The results are printed, or saved as JSON into the directory set by
+``RPM_BENCHMARK_RESULTS``. Results of two runs with the same parameters, e.g. of
+two commits, can be compared with ``pulp_rpm.tests.performance.offline.compare``.
+"""
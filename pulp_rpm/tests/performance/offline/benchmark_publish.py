@@ -0,0 +1,297 @@
+# coding=utf-8
+"""Offline benchmark of publishing of a repository."""
+import hashlib
+import os
+import shutil
+import tempfile
+
+import createrepo_c as cr
+import libcomps
+
+from django.test import TestCase, override_settings
+
+from pulpcore.plugin.models import Artifact, Content, ContentArtifact
+
+from pulp_rpm.app.advisory import hash_update_record
+from pulp_rpm.app.models import (
+    Modulemd,
+    Package,
+    PackageGroup,
+    RpmPublication,
+    RpmRepository,
+    UpdateCollection,
+    UpdateCollectionPackage,
+    UpdateRecord,
+    UpdateReference,
+)
+from pulp_rpm.app.tasks.publishing import (
+    PreviousPublication,
+    PublicationData,
+    create_repomd_xml,
+)
+from pulp_rpm.tests.performance.offline.fixtures import gen_modulemds, gen_packages, gen_updates
+from pulp_rpm.tests.performance.offline.utils import Benchmark, get_parameters
+
+
+def seed_packages(packages):
+    """Save packages as if they were synced with the on_demand policy.
+
+    :param packages: a list of ``createrepo_c.Package``
+    :returns: a list of pks of the saved packages
+    """
+    pks = []
+    content_artifacts = []
+    for pkg in packages:
+        package = Package(**Package.createrepo_to_dict(pkg))
+        package.save()
+        pks.append(package.pk)
+        content_artifacts.append(ContentArtifact(
+            content=package, artifact=None, relative_path=os.path.basename(pkg.location_href)
+        ))
+    ContentArtifact.objects.bulk_create(content_artifacts, batch_size=1000)
+    return pks
+
+
+def seed_updates(updates):
+    """Save advisories with their collections and references.
+
+    :param updates: a list of ``createrepo_c.UpdateRecord``
+    :returns: a list of pks of the saved advisories
+    """
+    pks = []
+    for update in updates:
+        update_record = UpdateRecord(**UpdateRecord.createrepo_to_dict(update))
+        update_record.digest = hash_update_record(update)
+        update_record.save()
+        pks.append(update_record.pk)
+        for collection in update.collections:
+            update_collection = UpdateCollection(**UpdateCollection.createrepo_to_dict(collection))
+            update_collection.save()
+            update_collection.update_record.add(update_record)
+            UpdateCollectionPackage.objects.bulk_create([
+                UpdateCollectionPackage(
+                    update_collection=update_collection,
+                    **UpdateCollectionPackage.createrepo_to_dict(package)
+                ) for package in collection.packages
+            ])
+        UpdateReference.objects.bulk_create([
+            UpdateReference(update_record=update_record, **UpdateReference.createrepo_to_dict(ref))
+            for ref in update.references
+        ])
+    return pks
+
+
+def seed_modulemds(modulemds, working_dir):
+    """Save modulemds with their snippets as artifacts.
+
+    :param modulemds: a list of dicts with fields of ``Modulemd`` and its yaml ``snippet``
+    :param working_dir: a directory for the snippets before they are saved as artifacts
+    :returns: a list of pks of the saved modulemds
+    """
+    pks = []
+    for modulemd_data in modulemds:
+        snippet = modulemd_data.pop('snippet')
+        snippet_path = os.path.join(working_dir, '{}.yaml'.format(modulemd_data['name']))
+        with open(snippet_path, 'w') as snippet_file:
+            snippet_file.write(snippet)
+        artifact = Artifact.init_and_validate(snippet_path)
+        artifact.save()
+        modulemd = Modulemd(**modulemd_data)
+        modulemd.save()
+        pks.append(modulemd.pk)
+        ContentArtifact.objects.create(
+            content=modulemd, artifact=artifact,
+            relative_path='{}snippet'.format(modulemd_data['name'])
+        )
+    return pks
+
+
+def seed_groups(packages, count, packages_per_group=20):
+    """Save package groups of packages.
+
+    :param packages: a list of ``createrepo_c.Package`` the groups refer to
+    :param count: number of groups
+    :param packages_per_group: number of packages in each group
+    :returns: a list of pks of the saved groups
+    """
+    pks = []
+    for index in range(count):
+        group_id = 'group-{}'.format(index)
+        group = PackageGroup(
+            id=group_id,
+            name='Synthetic group {}'.format(index),
+            description='Synthetic group {} for benchmarks.'.format(index),
+            packages=[
+                {
+                    'name': packages[(index * packages_per_group + offset) % len(packages)].name,
+                    'type': libcomps.PACKAGE_TYPE_MANDATORY,
+                    'basearchonly': False,
+                    'requires': '',
+                } for offset in range(packages_per_group)
+            ],
+            digest=hashlib.sha256(group_id.encode()).hexdigest(),
+        )
+        group.save()
+        pks.append(group.pk)
+    return pks
+
+
+class PublishBenchmark(TestCase):
+    """Measure publishing of a repository version with synthetic content.
+
+    Sizes of the content are set by the ``RPM_BENCHMARK_PACKAGES``, ``RPM_BENCHMARK_FILES``,
+    ``RPM_BENCHMARK_CHANGELOGS``, ``RPM_BENCHMARK_ADVISORIES``, ``RPM_BENCHMARK_MODULES`` and
+    ``RPM_BENCHMARK_GROUPS`` environment variables.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Store artifacts in a temporary directory and seed the database."""
+        cls.parameters = get_parameters(
+            packages=5000, files=20, changelogs=10, advisories=1000, modules=100, groups=100
+        )
+        cls.benchmark = Benchmark('publish', cls.parameters)
+        cls.working_dir = tempfile.mkdtemp()
+        cls.media_root = override_settings(MEDIA_ROOT=os.path.join(cls.working_dir, 'media'))
+        cls.media_root.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Save the results and remove the artifacts."""
+        super().tearDownClass()
+        cls.media_root.disable()
+        shutil.rmtree(cls.working_dir)
+        cls.benchmark.save()
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a repository version with the synthetic content."""
+        packages = gen_packages(
+            cls.parameters['packages'], cls.parameters['files'], cls.parameters['changelogs']
+        )
+        content_pks = seed_packages(packages)
+        content_pks += seed_updates(gen_updates(packages, cls.parameters['advisories']))
+        content_pks += seed_modulemds(
+            gen_modulemds(packages, cls.parameters['modules']), cls.working_dir
+        )
+        content_pks += seed_groups(packages, cls.parameters['groups'])
+        cls.total = len(content_pks)
+
+        repository = RpmRepository.objects.create(name='benchmark')
+        with repository.new_version() as new_version:
+            new_version.add_content(Content.objects.filter(pk__in=content_pks))
+        cls.repository_version = new_version
+
+    def setUp(self):
+        """Create a publication and work in a temporary directory like a task does."""
+        self.publication = RpmPublication.objects.create(
+            repository_version=self.repository_version
+        )
+        self.content = self.repository_version.content
+        self.checksum_types = {'original': {}}
+
+        cwd = os.getcwd()
+        os.chdir(tempfile.mkdtemp(dir=self.working_dir))
+        self.addCleanup(os.chdir, cwd)
+
+    def test_publish(self):
+        """Measure populating of a publication and creation of its repodata."""
+        publication_data = PublicationData(self.publication)
+        with self.benchmark.measure('PublicationData.populate', self.total):
+            publication_data.populate()
+
+        with self.benchmark.measure('create_repomd_xml', self.total):
+            create_repomd_xml(
+                self.content, self.publication, self.checksum_types, publication_data.repomdrecords
+            )
+
+    def test_incremental_publish(self):
+        """Measure creation of repodata which reuses all metadata of a previous publication."""
+        create_repomd_xml(self.content, self.publication, self.checksum_types, [])
+        self.publication.complete = True
+        self.publication.save()
+
+        publication = RpmPublication.objects.create(repository_version=self.repository_version)
+        with self.benchmark.measure('create_repomd_xml.incremental', self.total):
+            previous_publication = PreviousPublication.find(publication)
+            create_repomd_xml(
+                self.content, publication, self.checksum_types, [],
+                previous_publication=previous_publication
+            )
+        self.assertEqual(
+            publication.published_metadata.count(), self.publication.published_metadata.count()
+        )
+
+    def test_published_artifacts(self):
+        """Measure creation of published artifacts."""
+        publication_data = PublicationData(self.publication)
+        with self.benchmark.measure('publish_artifacts', self.parameters['packages']):
+            publication_data.publish_artifacts(self.content)
+
+    def test_package_repodata(self):
+        """Measure the XML writers, the sqlite databases and compression separately."""
+        total = self.parameters['packages']
+        packages = Package.objects.filter(pk__in=self.content)
+        with self.benchmark.measure('Package.to_createrepo_c', total):
+            pkgs = [package.to_createrepo_c() for package in packages.iterator()]
+
+        xml_paths = ['primary.xml', 'filelists.xml', 'other.xml']
+        with self.benchmark.measure('xml_writers', total):
+            xml_files = [
+                xml_file_class(path, cr.NO_COMPRESSION) for xml_file_class, path in zip(
+                    (cr.PrimaryXmlFile, cr.FilelistsXmlFile, cr.OtherXmlFile), xml_paths
+                )
+            ]
+            for xml_file in xml_files:
+                xml_file.set_num_of_pkgs(total)
+            for pkg in pkgs:
+                for xml_file in xml_files:
+                    xml_file.add_pkg(pkg)
+            for xml_file in xml_files:
+                xml_file.close()
+
+        db_paths = ['primary.sqlite', 'filelists.sqlite', 'other.sqlite']
+        with self.benchmark.measure('sqlite_dbs', total):
+            dbs = [
+                db_class(path) for db_class, path in zip(
+                    (cr.PrimarySqlite, cr.FilelistsSqlite, cr.OtherSqlite), db_paths
+                )
+            ]
+            for pkg in pkgs:
+                for db in dbs:
+                    db.add_pkg(pkg)
+            for db in dbs:
+                db.close()
+
+        with self.benchmark.measure('compression.xml.gz', total):
+            for path in xml_paths:
+                cr.compress_file(path, '{}.gz'.format(path), cr.GZ_COMPRESSION)
+
+        with self.benchmark.measure('compression.sqlite.bz2', total):
+            for path in db_paths:
+                cr.compress_file(path, '{}.bz2'.format(path), cr.BZ2_COMPRESSION)
+
+    def test_other_repodata(self):
+        """Measure generation of updateinfo.xml, modules.yaml and comps.xml."""
+        update_records = UpdateRecord.objects.filter(pk__in=self.content)
+        with self.benchmark.measure('updateinfo', self.parameters['advisories']):
+            upd_xml = cr.UpdateInfoXmlFile('updateinfo.xml.gz')
+            for update_record in update_records.iterator():
+                upd_xml.add_chunk(cr.xml_dump_updaterecord(update_record.to_createrepo_c()))
+            upd_xml.close()
+
+        modulemds = Modulemd.objects.filter(pk__in=self.content)
+        with self.benchmark.measure('modules', self.parameters['modules']):
+            with open('modules.yaml', 'wb') as mod_yml:
+                for modulemd in modulemds.iterator():
+                    mod_yml.write(modulemd._artifacts.get().file.read())
+
+        groups = PackageGroup.objects.filter(pk__in=self.content)
+        with self.benchmark.measure('comps', self.parameters['groups']):
+            comps = libcomps.Comps()
+            for group in groups.iterator():
+                comps.groups.append(group.pkg_grp_to_libcomps())
+            comps.toxml_f('comps.xml', xml_options={
+                "default_explicit": True, "empty_groups": True, "uservisible_explicit": True
+            })
@@ -0,0 +1,158 @@
+# coding=utf-8
+"""Offline benchmark of parsing of repodata during a sync."""
+import asyncio
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from pulpcore.plugin.download import DownloadResult
+
+from pulp_rpm.app.models import RpmRemote, RpmRepository
+from pulp_rpm.app.modulemd import mmdlib, parse_defaults, parse_module_streams
+from pulp_rpm.app.tasks.synchronizing import ModulesMetadataParser, RpmFirstStage
+from pulp_rpm.tests.performance.offline.fixtures import (
+    gen_modules_yaml,
+    gen_packages,
+    gen_updates,
+    write_repodata,
+)
+from pulp_rpm.tests.performance.offline.utils import Benchmark, get_parameters
+
+REMOTE_URL = 'https://example.com/benchmark/'
+
+
+class DiscardingQueue:
+    """An output queue of a stage which counts and drops the content."""
+
+    def __init__(self):
+        """Initialize the count."""
+        self.count = 0
+
+    async def put(self, item):
+        """Count the content."""
+        self.count += 1
+
+
+@mock.patch('pulp_rpm.app.tasks.synchronizing.ProgressReport')
+class SyncBenchmark(TestCase):
+    """Measure parsing of synthetic repodata by the first stage of a sync.
+
+    Sizes of the fixtures are set by the ``RPM_BENCHMARK_PACKAGES``, ``RPM_BENCHMARK_FILES``,
+    ``RPM_BENCHMARK_CHANGELOGS``, ``RPM_BENCHMARK_ADVISORIES`` and ``RPM_BENCHMARK_MODULES``
+    environment variables.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Generate the repodata."""
+        super().setUpClass()
+        cls.parameters = get_parameters(
+            packages=5000, files=20, changelogs=10, advisories=1000, modules=100
+        )
+        cls.benchmark = Benchmark('sync', cls.parameters)
+        cls.working_dir = tempfile.mkdtemp()
+        packages = gen_packages(
+            cls.parameters['packages'], cls.parameters['files'], cls.parameters['changelogs']
+        )
+        cls.paths = write_repodata(
+            cls.working_dir,
+            packages,
+            gen_updates(packages, cls.parameters['advisories']),
+            gen_modules_yaml(packages, cls.parameters['modules']),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        """Save the results and remove the repodata."""
+        cls.benchmark.save()
+        shutil.rmtree(cls.working_dir)
+        super().tearDownClass()
+
+    def setUp(self):
+        """Create the first stage of a sync with an output queue which drops the content."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        repository = RpmRepository.objects.create(name='benchmark')
+        remote = RpmRemote(name='benchmark', url=REMOTE_URL)
+        self.stage = RpmFirstStage(remote, repository, deferred_download=True)
+        self.stage._out_q = DiscardingQueue()
+        self.stage.data.remote_url = REMOTE_URL
+
+    def tearDown(self):
+        """Close the event loop."""
+        self.loop.close()
+
+    def parse_repodata(self, spool_path, pkgids):
+        """Parse spooled packages, filelists.xml and other.xml into a list of packages."""
+        async def collect():
+            return [package async for package in RpmFirstStage.parse_repodata(
+                spool_path, self.paths['filelists'], self.paths['other'], pkgids
+            )]
+
+        return self.loop.run_until_complete(collect())
+
+    def test_parse_packages(self, progress_report):
+        """Measure parsing of packages and creation of their declarative content."""
+        total = self.parameters['packages']
+        spool_path = os.path.join(self.working_dir, 'primary.spool')
+        with self.benchmark.measure('spool_packages', total):
+            locations = self.loop.run_until_complete(
+                RpmFirstStage.spool_packages(self.paths['primary'], spool_path)
+            )
+
+        with self.benchmark.measure('parse_repodata', total):
+            packages = self.parse_repodata(spool_path, set(locations))
+        self.assertEqual(len(packages), total)
+
+        async def iterate():
+            for package in packages:
+                yield package
+
+        with self.benchmark.measure('_parse_packages', total):
+            self.loop.run_until_complete(self.stage._parse_packages(iterate(), total))
+        self.assertEqual(self.stage._out_q.count, total)
+
+    def test_parse_advisories(self, progress_report):
+        """Measure parsing of advisories and creation of their declarative content."""
+        total = self.parameters['advisories']
+        with self.benchmark.measure('parse_updateinfo', total):
+            updates = self.loop.run_until_complete(
+                RpmFirstStage.parse_updateinfo(self.paths['updateinfo'])
+            )
+        self.assertEqual(len(updates), total)
+
+        with self.benchmark.measure('_parse_advisories', total):
+            self.loop.run_until_complete(self.stage._parse_advisories(updates))
+        self.assertEqual(self.stage._out_q.count, total)
+
+    def test_parse_modulemds(self, progress_report):
+        """Measure parsing of modulemds and modulemd defaults."""
+        total = self.parameters['modules']
+        with open(self.paths['modules']) as modules_file:
+            modules_yaml = modules_file.read()
+
+        with self.benchmark.measure('modulemd_index', total):
+            modulemd_index = mmdlib.ModuleIndex.new()
+            modulemd_index.update_from_string(modules_yaml, True)
+
+        module_names = modulemd_index.get_module_names()
+        with self.benchmark.measure('parse_module_streams', total):
+            parse_module_streams(module_names, modulemd_index)
+
+        with self.benchmark.measure('parse_defaults', total):
+            parse_defaults(modulemd_index)
+
+        self.stage.data.modulemd_results = DownloadResult(
+            url=REMOTE_URL + 'repodata/modules.yaml', artifact_attributes={},
+            path=self.paths['modules'], headers=None
+        )
+        self.stage.data.modules_url = self.stage.data.modulemd_results.url
+        parser = ModulesMetadataParser(self.stage.data)
+        # snippets of modulemds are stored as artifacts
+        with override_settings(MEDIA_ROOT=os.path.join(self.working_dir, 'media')):
+            with self.benchmark.measure('ModulesMetadataParser.parse', total):
+                self.loop.run_until_complete(parser.parse())
+        self.assertEqual(len(self.stage.data.modulemd_list), total)
@@ -0,0 +1,59 @@
+# coding=utf-8
+"""Compare results of an offline benchmark from two runs, e.g. of two commits.
+
+Usage::
+
+    python -m pulp_rpm.tests.performance.offline.compare before.json after.json [threshold]
+
+Stages which are slower by more than the threshold (0.2 by default, i.e. 20 %) are reported
+as regressions and the exit code is 1.
+"""
+import json
+import sys
+
+DEFAULT_THRESHOLD = 0.2
+
+
+def compare(before, after, threshold=DEFAULT_THRESHOLD):
+    """Compare wall times of stages of two runs of a benchmark.
+
+    :param before: results of the first run as loaded from its JSON
+    :param after: results of the second run as loaded from its JSON
+    :param threshold: a relative slowdown which is considered a regression
+    :returns: a tuple of a list of report lines and a list of stages which regressed
+    """
+    if before['parameters'] != after['parameters']:
+        raise ValueError('The benchmarks were run with different parameters.')
+
+    lines = []
+    regressions = []
+    for stage, result in sorted(after['results'].items()):
+        previous = before['results'].get(stage)
+        if not previous or not previous['wall_time']:
+            lines.append('{}: {:.4f}s (new)'.format(stage, result['wall_time']))
+            continue
+        change = result['wall_time'] / previous['wall_time'] - 1
+        lines.append('{}: {:.4f}s -> {:.4f}s ({:+.1%})'.format(
+            stage, previous['wall_time'], result['wall_time'], change
+        ))
+        if change > threshold:
+            regressions.append(stage)
+    return lines, regressions
+
+
+def main(argv):
+    """Print the comparison and exit with 1 if any stage regressed."""
+    with open(argv[1]) as before_file, open(argv[2]) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+    threshold = float(argv[3]) if len(argv) > 3 else DEFAULT_THRESHOLD
+
+    lines, regressions = compare(before, after, threshold)
+    print('\n'.join(lines))
+    if regressions:
+        print('Regressions: {}'.format(', '.join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,244 @@
+# coding=utf-8
+"""Synthetic repodata for the offline benchmarks."""
+import hashlib
+import os
+
+import createrepo_c as cr
+
+MODULEMD_TEMPLATE = """---
+document: modulemd
+version: 2
+data:
+  name: {name}
+  stream: "1.0"
+  version: 20200801000000
+  context: deadbeef
+  arch: x86_64
+  summary: Synthetic module {name}
+  description: >-
+    Synthetic module {name} for benchmarks.
+  license:
+    module:
+    - MIT
+  dependencies:
+  - buildrequires:
+      platform: [el8]
+    requires:
+      platform: [el8]
+  profiles:
+    default:
+      rpms:
+{profile_rpms}
+  artifacts:
+    rpms:
+{artifact_rpms}
+...
+"""
+
+MODULEMD_DEFAULTS_TEMPLATE = """---
+document: modulemd-defaults
+version: 1
+data:
+  module: {name}
+  stream: "1.0"
+  profiles:
+    "1.0": [default]
+...
+"""
+
+
+def gen_packages(count, files=10, changelogs=10):
+    """Generate createrepo_c packages.
+
+    :param count: number of packages
+    :param files: number of files of each package
+    :param changelogs: number of changelogs of each package
+    :returns: a list of ``createrepo_c.Package``
+    """
+    packages = []
+    for index in range(count):
+        name = 'pkg-{}'.format(index)
+        pkg = cr.Package()
+        pkg.name = name
+        pkg.epoch = '0'
+        pkg.version = '1.0'
+        pkg.release = '1'
+        pkg.arch = 'x86_64'
+        pkg.pkgId = hashlib.sha256(name.encode()).hexdigest()
+        pkg.checksum_type = 'sha256'
+        pkg.summary = 'Synthetic package {}'.format(name)
+        pkg.description = 'Synthetic package {} for benchmarks.'.format(name)
+        pkg.url = 'https://example.com/{}'.format(name)
+        pkg.rpm_license = 'MIT'
+        pkg.rpm_group = 'Unspecified'
+        pkg.rpm_buildhost = 'localhost'
+        pkg.rpm_sourcerpm = '{}-1.0-1.src.rpm'.format(name)
+        pkg.location_href = 'Packages/p/{}-1.0-1.x86_64.rpm'.format(name)
+        pkg.size_package = 1024
+        pkg.size_installed = 4096
+        pkg.size_archive = 4096
+        pkg.time_file = 1596240000
+        pkg.time_build = 1596240000
+        pkg.rpm_header_start = 4504
+        pkg.rpm_header_end = 8000
+        pkg.provides = [(name, 'EQ', '0', '1.0', '1', False)]
+        if index:
+            pkg.requires = [('pkg-{}'.format(index - 1), None, None, None, None, False)]
+        pkg.files = [
+            ('', '/usr/share/{}/'.format(name), 'file-{}'.format(file_index))
+            for file_index in range(files)
+        ]
+        pkg.changelogs = [
+            ('Packager <packager@example.com> - 1.0-{}'.format(changelog_index),
+             1596240000 - changelog_index * 86400,
+             '- Change number {}'.format(changelog_index))
+            for changelog_index in range(changelogs)
+        ]
+        packages.append(pkg)
+    return packages
+
+
+def gen_updates(packages, count, packages_per_update=5):
+    """Generate createrepo_c advisories of packages.
+
+    :param packages: a list of ``createrepo_c.Package`` the advisories refer to
+    :param count: number of advisories
+    :param packages_per_update: number of packages in each advisory
+    :returns: a list of ``createrepo_c.UpdateRecord``
+    """
+    updates = []
+    for index in range(count):
+        update = cr.UpdateRecord()
+        update.id = 'RHSA-2020:{:04d}'.format(index)
+        update.title = 'Synthetic advisory {}'.format(index)
+        update.type = 'security'
+        update.status = 'final'
+        update.version = '1'
+        update.severity = 'Moderate'
+        update.release = '1'
+        update.rights = 'Copyright 2020'
+        update.summary = 'Synthetic advisory {}'.format(index)
+        update.description = 'Synthetic advisory {} for benchmarks.'.format(index)
+        update.solution = 'Update the packages.'
+        update.pushcount = '1'
+        update.issued_date = 1596240000
+        update.updated_date = 1596240000
+
+        collection = cr.UpdateCollection()
+        collection.name = 'collection-{}'.format(index)
+        collection.shortname = 'collection-{}'.format(index)
+        for offset in range(packages_per_update):
+            pkg = packages[(index * packages_per_update + offset) % len(packages)]
+            collection_pkg = cr.UpdateCollectionPackage()
+            collection_pkg.name = pkg.name
+            collection_pkg.epoch = pkg.epoch
+            collection_pkg.version = pkg.version
+            collection_pkg.release = pkg.release
+            collection_pkg.arch = pkg.arch
+            collection_pkg.src = pkg.rpm_sourcerpm
+            collection_pkg.filename = os.path.basename(pkg.location_href)
+            collection_pkg.sum = pkg.pkgId
+            collection_pkg.sum_type = cr.SHA256
+            collection.append(collection_pkg)
+        update.append_collection(collection)
+
+        reference = cr.UpdateReference()
+        reference.href = 'https://example.com/{}'.format(update.id)
+        reference.id = update.id
+        reference.type = 'self'
+        reference.title = update.title
+        update.append_reference(reference)
+        updates.append(update)
+    return updates
+
+
+def gen_modulemds(packages, count, packages_per_module=5):
+    """Generate modulemds of packages.
+
+    :param packages: a list of ``createrepo_c.Package`` the modulemds refer to
+    :param count: number of modulemds
+    :param packages_per_module: number of packages of each modulemd
+    :returns: a list of dicts with fields of ``Modulemd`` and its yaml ``snippet``
+    """
+    modulemds = []
+    for index in range(count):
+        name = 'module-{}'.format(index)
+        module_packages = [
+            packages[(index * packages_per_module + offset) % len(packages)]
+            for offset in range(packages_per_module)
+        ]
+        artifacts = [
+            '{}-{}:{}-{}.{}'.format(pkg.name, pkg.epoch, pkg.version, pkg.release, pkg.arch)
+            for pkg in module_packages
+        ]
+        modulemds.append({
+            'name': name,
+            'stream': '1.0',
+            'version': '20200801000000',
+            'context': 'deadbeef',
+            'arch': 'x86_64',
+            'artifacts': artifacts,
+            'dependencies': [{'platform': ['el8']}],
+            'snippet': MODULEMD_TEMPLATE.format(
+                name=name,
+                profile_rpms='\n'.join(
+                    '      - {}'.format(pkg.name) for pkg in module_packages
+                ),
+                artifact_rpms='\n'.join('    - {}'.format(nevra) for nevra in artifacts),
+            ),
+        })
+    return modulemds
+
+
+def gen_modules_yaml(packages, count, packages_per_module=5):
+    """Generate modules.yaml with modulemds and their defaults.
+
+    :param packages: a list of ``createrepo_c.Package`` the modulemds refer to
+    :param count: number of modulemds
+    :param packages_per_module: number of packages of each modulemd
+    :returns: the content of modules.yaml
+    """
+    documents = []
+    for modulemd in gen_modulemds(packages, count, packages_per_module):
+        documents.append(modulemd['snippet'])
+        documents.append(MODULEMD_DEFAULTS_TEMPLATE.format(name=modulemd['name']))
+    return ''.join(documents)
+
+
+def write_repodata(path, packages, updates=(), modules_yaml=None):
+    """Write repodata of a repository.
+
+    :param path: a directory to write the repodata into
+    :param packages: a list of ``createrepo_c.Package``
+    :param updates: a list of ``createrepo_c.UpdateRecord``
+    :param modules_yaml: the content of modules.yaml, or None
+    :returns: a dict with paths of the metadata files with their type as a key
+    """
+    paths = {
+        'primary': os.path.join(path, 'primary.xml.gz'),
+        'filelists': os.path.join(path, 'filelists.xml.gz'),
+        'other': os.path.join(path, 'other.xml.gz'),
+        'updateinfo': os.path.join(path, 'updateinfo.xml.gz'),
+    }
+    pri_xml = cr.PrimaryXmlFile(paths['primary'])
+    fil_xml = cr.FilelistsXmlFile(paths['filelists'])
+    oth_xml = cr.OtherXmlFile(paths['other'])
+    for xml_file in (pri_xml, fil_xml, oth_xml):
+        xml_file.set_num_of_pkgs(len(packages))
+    for pkg in packages:
+        pri_xml.add_pkg(pkg)
+        fil_xml.add_pkg(pkg)
+        oth_xml.add_pkg(pkg)
+    for xml_file in (pri_xml, fil_xml, oth_xml):
+        xml_file.close()
+
+    upd_xml = cr.UpdateInfoXmlFile(paths['updateinfo'])
+    for update in updates:
+        upd_xml.add_chunk(cr.xml_dump_updaterecord(update))
+    upd_xml.close()
+
+    if modules_yaml is not None:
+        paths['modules'] = os.path.join(path, 'modules.yaml')
+        with open(paths['modules'], 'w') as modules_file:
+            modules_file.write(modules_yaml)
+    return paths
@@ -0,0 +1,127 @@
+# coding=utf-8
+"""Utilities for the offline benchmarks."""
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+from contextlib import contextmanager
+
+import createrepo_c as cr
+
+RESULTS_DIR_VARIABLE = 'RPM_BENCHMARK_RESULTS'
+PARAMETER_VARIABLE_PREFIX = 'RPM_BENCHMARK_'
+
+
+def get_parameters(**defaults):
+    """Get sizes of the benchmark fixtures, overridden by environment variables.
+
+    E.g. the ``packages`` parameter is overridden by ``RPM_BENCHMARK_PACKAGES``.
+
+    :param defaults: default values of the parameters
+    :returns: a dict with the parameters
+    """
+    return {
+        name: int(os.environ.get(PARAMETER_VARIABLE_PREFIX + name.upper(), default))
+        for name, default in defaults.items()
+    }
+
+
+def current_rss():
+    """Get the resident set size of the current process in bytes."""
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize()
+
+
+class MemorySampler(threading.Thread):
+    """Sample the resident set size of the current process to find its peak."""
+
+    def __init__(self, interval=0.01):
+        """Initialize the sampler.
+
+        :param interval: number of seconds between samples
+        """
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss()
+        self._stopped = threading.Event()
+
+    def run(self):
+        """Sample until stopped."""
+        while not self._stopped.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def stop(self):
+        """Stop sampling and take the last sample."""
+        self._stopped.set()
+        self.join()
+        self.peak = max(self.peak, current_rss())
+
+
+class Benchmark:
+    """Measure stages of a benchmark and save the results as JSON.
+
+    The results are written into ``<name>.json`` in the directory set by the
+    ``RPM_BENCHMARK_RESULTS`` environment variable, or printed if it's not set.
+    """
+
+    def __init__(self, name, parameters):
+        """Initialize the benchmark.
+
+        :param name: name of the benchmark
+        :param parameters: sizes of the fixtures the benchmark is run with
+        """
+        self.name = name
+        self.parameters = parameters
+        self.results = {}
+
+    @contextmanager
+    def measure(self, stage, items):
+        """Measure wall time, CPU time and peak memory of a stage while in the context.
+
+        CPU time and memory are the ones of the whole process, processes started by the
+        stage are not included.
+
+        :param stage: name of the stage
+        :param items: number of items the stage processes
+        """
+        sampler = MemorySampler()
+        rss_before = sampler.peak
+        sampler.start()
+        wall_started, cpu_started = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - wall_started
+            cpu_time = time.process_time() - cpu_started
+            sampler.stop()
+        self.results[stage] = {
+            'items': items,
+            'wall_time': round(wall_time, 4),
+            'cpu_time': round(cpu_time, 4),
+            'items_per_second': round(items / wall_time, 1) if wall_time else None,
+            'peak_rss': sampler.peak,
+            'peak_rss_increase': sampler.peak - rss_before,
+        }
+
+    def as_dict(self):
+        """Get the results with everything needed to compare them with other runs."""
+        return {
+            'benchmark': self.name,
+            'parameters': self.parameters,
+            'python': sys.version.split()[0],
+            'createrepo_c': cr.VERSION,
+            'results': self.results,
+        }
+
+    def save(self):
+        """Save the results as JSON."""
+        results = json.dumps(self.as_dict(), indent=2, sort_keys=True)
+        results_dir = os.environ.get(RESULTS_DIR_VARIABLE)
+        if results_dir:
+            with open(os.path.join(results_dir, '{}.json'.format(self.name)), 'w') as results_file:
+                results_file.write(results)
+        else:
+            print(results)
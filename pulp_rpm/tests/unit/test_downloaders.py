@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest.mock import Mock
+
+from aiohttp.client_exceptions import ClientPayloadError, ClientResponseError
+
+from django.test import TestCase
+
+from pulpcore.plugin.exceptions import DigestValidationError
+
+from pulp_rpm.app.downloaders import RpmDownloader
+
+
+URL = 'http://example.com/repo/Packages/b/bear-4.1-1.noarch.rpm'
+LOCATION_HREF = 'Packages/b/bear-4.1-1.noarch.rpm'
+MIRRORS = ['http://a.example.com/', 'http://b.example.com/']
+DATA = b'bear package'
+
+
+class Response:
+    """A response which sends chunks of data, or raises an error instead of a chunk."""
+
+    def __init__(self, status, chunks):
+        """Store the status and the chunks of the body."""
+        self.status = status
+        self.headers = {}
+        self.content = self
+        self._chunks = list(chunks)
+
+    async def __aenter__(self):
+        """Return the response."""
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Do nothing."""
+
+    def raise_for_status(self):
+        """Raise an error for an error status."""
+        if self.status >= 400:
+            raise ClientResponseError(Mock(), (), status=self.status)
+
+    async def read(self, size):
+        """Return the next chunk of the body."""
+        chunk = self._chunks.pop(0) if self._chunks else b''
+        if isinstance(chunk, Exception):
+            raise chunk
+        return chunk
+
+    async def release(self):
+        """Do nothing."""
+
+
+class Session:
+    """A session which responds to each URL with a response from `responses`."""
+
+    def __init__(self, responses):
+        """Store the status and the chunks of the response for each URL."""
+        self.responses = responses
+        self.requested = []
+
+    def get(self, url, **kwargs):
+        """Record the URL and respond."""
+        self.requested.append(url)
+        return Response(*self.responses[url])
+
+
+class TestMirrorFailover(TestCase):
+    """Test downloading a file from the next mirror when the download from a mirror fails."""
+
+    def setUp(self):
+        """Set up an event loop and work in a temporary directory, as a task does."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+
+        working_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, working_dir)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(working_dir)
+
+    def download(self, first_response):
+        """
+        Download the file from the mirrors, the first one responds with `first_response`.
+
+        Returns:
+            tuple: the result of the download and the requested URLs
+
+        """
+        session = Session({
+            MIRRORS[0] + LOCATION_HREF: first_response,
+            MIRRORS[1] + LOCATION_HREF: (200, [DATA]),
+        })
+        downloader = RpmDownloader(
+            URL,
+            session=session,
+            expected_digests={'sha256': hashlib.sha256(DATA).hexdigest()},
+            expected_size=len(DATA),
+        )
+        result = self.loop.run_until_complete(downloader.run(
+            extra_data={'mirrors': MIRRORS, 'location_href': LOCATION_HREF}
+        ))
+        return result, session.requested
+
+    def assert_downloaded_from_next_mirror(self, result, requested):
+        """Assert that only the data from the second mirror was downloaded."""
+        self.assertEqual(requested, [mirror + LOCATION_HREF for mirror in MIRRORS])
+        self.assertEqual(result.url, URL)
+        self.assertEqual(result.artifact_attributes['size'], len(DATA))
+        with open(result.path, 'rb') as downloaded_file:
+            self.assertEqual(downloaded_file.read(), DATA)
+
+    def test_status_error(self):
+        """Test that the next mirror is used when a mirror responds with an error status."""
+        self.assert_downloaded_from_next_mirror(*self.download((404, [])))
+
+    def test_truncated_body(self):
+        """Test that the data from a mirror which cut the response short is discarded."""
+        self.assert_downloaded_from_next_mirror(*self.download(
+            (200, [DATA[:4], ClientPayloadError('Response payload is not completed')])
+        ))
+
+    def test_digest_mismatch(self):
+        """Test that the data from a mirror with a different file is discarded."""
+        self.assert_downloaded_from_next_mirror(*self.download((200, [b'lynx package'])))
+
+    def test_all_mirrors_failed(self):
+        """Test that the error of the last mirror is raised when all the mirrors fail."""
+        session = Session({
+            MIRRORS[0] + LOCATION_HREF: (404, []),
+            MIRRORS[1] + LOCATION_HREF: (200, [b'lynx package']),
+        })
+        downloader = RpmDownloader(
+            URL, session=session, expected_digests={'sha256': hashlib.sha256(DATA).hexdigest()}
+        )
+
+        with self.assertRaises(DigestValidationError):
+            self.loop.run_until_complete(downloader.run(
+                extra_data={'mirrors': MIRRORS, 'location_href': LOCATION_HREF}
+            ))
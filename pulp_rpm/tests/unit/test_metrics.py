@@ -0,0 +1,80 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from pulp_rpm.app.metrics import PhaseMetrics
+
+
+class TestPhaseMetrics(TestCase):
+    """Test measuring phases of a task."""
+
+    def setUp(self):
+        """Replace the clocks and the RSS with values which the tests set."""
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.rss = 1000
+        patchers = (
+            patch('pulp_rpm.app.metrics.time.perf_counter', side_effect=lambda: self.wall_time),
+            patch('pulp_rpm.app.metrics.cpu_time', side_effect=lambda: self.cpu_time),
+            patch('pulp_rpm.app.metrics.current_rss', side_effect=lambda: self.rss),
+        )
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.metrics = PhaseMetrics('parsing.packages', 'Packages Parsing Timing')
+
+    def spend(self, wall_time, cpu_time=0.0, rss=0):
+        """Advance the clocks and grow the RSS."""
+        self.wall_time += wall_time
+        self.cpu_time += cpu_time
+        self.rss += rss
+
+    def test_measure(self):
+        """Test that measurements of a phase are summed up."""
+        with self.metrics.measure(items=10):
+            self.spend(2.0, cpu_time=1.5, rss=500)
+        self.spend(100.0, cpu_time=100.0, rss=-300)
+        with self.metrics.measure() as metrics:
+            self.spend(3.0, cpu_time=0.5, rss=100)
+            metrics.items += 40
+
+        self.assertEqual(self.metrics.as_dict(), {
+            'wall_time': 5.0,
+            'process_cpu_time': 2.0,
+            'rss': 1500,
+            'rss_increase': 600,
+            'items_per_second': 10.0,
+        })
+        self.assertEqual(self.metrics.measurements, 2)
+
+    def test_stop_without_start(self):
+        """Test that stopping a phase which isn't measured changes nothing."""
+        self.spend(1.0, cpu_time=1.0, rss=100)
+        self.metrics.stop(items=5)
+
+        self.assertEqual(self.metrics.measurements, 0)
+        self.assertEqual(self.metrics.items, 0)
+        self.assertEqual(self.metrics.wall_time, 0.0)
+        self.assertEqual(self.metrics.rss, 0)
+
+    def test_paused(self):
+        """Test that the time spent while paused is left out."""
+        with self.metrics.measure(items=1):
+            self.spend(1.0)
+            with self.metrics.paused():
+                self.spend(10.0, cpu_time=10.0, rss=2000)
+            self.spend(1.0)
+
+        self.assertEqual(self.metrics.wall_time, 2.0)
+        self.assertEqual(self.metrics.process_cpu_time, 0.0)
+        self.assertEqual(self.metrics.rss_increase, 0)
+        self.assertEqual(self.metrics.rss, 3000)
+        self.assertEqual(self.metrics.items, 1)
+
+    def test_paused_without_measuring(self):
+        """Test that pausing a phase which isn't measured doesn't start measuring it."""
+        with self.metrics.paused():
+            self.spend(1.0)
+
+        self.assertEqual(self.metrics.measurements, 0)
+        self.assertEqual(self.metrics.wall_time, 0.0)
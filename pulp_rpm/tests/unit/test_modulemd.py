@@ -0,0 +1,159 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from pulpcore.plugin.models import Artifact
+
+from pulp_rpm.app import modulemd
+from pulp_rpm.app.modulemd import (
+    _create_snippets,
+    mmdlib,
+    parse_modulemd,
+    parse_modulemd_in_chunks,
+    split_module_index,
+)
+
+
+MODULEMD_TEMPLATE = """---
+document: modulemd
+version: 2
+data:
+  name: {name}
+  stream: "{stream}"
+  version: 20200801000000
+  context: deadbeef
+  arch: noarch
+  summary: Module {name}
+  description: >-
+    Module {name}.
+  license:
+    module:
+    - MIT
+  artifacts:
+    rpms:
+    - {name}-0:1.0-1.noarch
+...
+"""
+
+MODULE_NAMES = ['bear', 'camel', 'dog', 'fox', 'lynx']
+
+
+def create_module_index():
+    """Create an index of modules with two streams each."""
+    module_index = mmdlib.ModuleIndex.new()
+    module_index.update_from_string(''.join(
+        MODULEMD_TEMPLATE.format(name=name, stream=stream)
+        for name in MODULE_NAMES for stream in ('1', '2')
+    ), True)
+    return module_index
+
+
+def without_artifacts(modulemds):
+    """Replace artifacts of modulemds with their sha256 to compare them."""
+    return [
+        dict(modulemd, artifact=modulemd['artifact'].sha256) for modulemd in modulemds
+    ]
+
+
+class TestParseModulemdInChunks(TestCase):
+    """Test parsing modulemds in chunks in separate threads."""
+
+    def setUp(self):
+        """Set up an event loop and work in a temporary directory, as a task does."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+
+        working_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, working_dir)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(working_dir)
+
+        self.module_index = create_module_index()
+
+    @patch('pulp_rpm.app.modulemd.MODULEMD_CHUNK_SIZE', 2)
+    def test_split_module_index(self):
+        """Test that each chunk has an index with all the streams of its modules only."""
+        chunks = split_module_index(MODULE_NAMES, self.module_index)
+
+        self.assertEqual(
+            [chunk_names for chunk_names, _chunk_index in chunks],
+            [['bear', 'camel'], ['dog', 'fox'], ['lynx']]
+        )
+        for chunk_names, chunk_index in chunks:
+            self.assertEqual(sorted(chunk_index.get_module_names()), chunk_names)
+            for name in chunk_names:
+                self.assertEqual(len(chunk_index.get_module(name).get_all_streams()), 2)
+
+    @patch('pulp_rpm.app.modulemd.MODULEMD_CHUNK_SIZE', 1)
+    def test_parse_in_order(self):
+        """Test that modulemds are yielded in order even when a later chunk is parsed first."""
+        def parse_slowly(module_names, module_index):
+            if module_names == ['bear']:
+                time.sleep(0.5)
+            return parse_modulemd(module_names, module_index)
+
+        async def collect():
+            return [
+                modulemd async for modulemd in parse_modulemd_in_chunks(
+                    MODULE_NAMES, self.module_index
+                )
+            ]
+
+        with patch.object(modulemd, 'parse_modulemd', parse_slowly):
+            modulemds = self.loop.run_until_complete(collect())
+
+        self.assertEqual(
+            without_artifacts(modulemds),
+            without_artifacts(parse_modulemd(MODULE_NAMES, create_module_index()))
+        )
+        self.assertEqual(
+            [modulemd['name'] for modulemd in modulemds],
+            [name for name in MODULE_NAMES for _stream in range(2)]
+        )
+
+
+class TestCreateSnippets(TestCase):
+    """Test creating artifacts of modulemd snippets."""
+
+    def setUp(self):
+        """Work in a temporary directory, as a task does."""
+        self.working_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.working_dir)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.working_dir)
+
+        self.snippets = [
+            MODULEMD_TEMPLATE.format(name=name, stream='1') for name in ('bear', 'camel')
+        ]
+
+    def test_existing_artifact(self):
+        """Test that an artifact which is already stored is reused by its sha256."""
+        path = os.path.join(self.working_dir, 'bear.yaml')
+        with open(path, 'w') as snippet_file:
+            snippet_file.write(self.snippets[0])
+        existing_artifact = Artifact.init_and_validate(path)
+        existing_artifact.save()
+
+        artifacts = _create_snippets(self.snippets)
+
+        self.assertEqual(artifacts[0].pk, existing_artifact.pk)
+        self.assertFalse(artifacts[0]._state.adding)
+        self.assertTrue(artifacts[1]._state.adding)
+
+    def test_digests(self):
+        """Test that the digests computed in memory are the ones of the written files."""
+        artifacts = _create_snippets(self.snippets)
+
+        for snippet, artifact in zip(self.snippets, artifacts):
+            validated_artifact = Artifact.init_and_validate(artifact.file.name)
+            self.assertEqual(artifact.size, validated_artifact.size)
+            for digest in Artifact.DIGEST_FIELDS:
+                self.assertEqual(getattr(artifact, digest), getattr(validated_artifact, digest))
+            with open(artifact.file.name) as snippet_file:
+                self.assertEqual(snippet_file.read(), snippet)
@@ -0,0 +1,166 @@
+import os
+import shutil
+import tempfile
+
+import createrepo_c as cr
+
+from django.test import TestCase
+
+from pulpcore.plugin.models import Artifact
+
+from pulp_rpm.app.exceptions import PackageDetailsNotAvailable
+from pulp_rpm.app.models import Package
+from pulp_rpm.app.package_details import (
+    fill_package_details,
+    fill_package_details_from,
+    parse_package_details,
+)
+
+
+REPODATA_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'repodata')
+
+# repodata of 4 packages: bear, camel, dog and fox
+PRIMARY_XML = os.path.join(REPODATA_DIR, 'primary.xml')
+FILELISTS_XML = os.path.join(REPODATA_DIR, 'filelists.xml')
+OTHER_XML = os.path.join(REPODATA_DIR, 'other.xml')
+
+
+def parse_primary():
+    """Parse the fixture primary.xml.
+
+    Returns:
+        dict: createrepo_c packages with their names as keys
+
+    """
+    packages = {}
+
+    def pkgcb(pkg):
+        packages[pkg.name] = pkg
+
+    cr.xml_parse_primary(PRIMARY_XML, pkgcb=pkgcb, do_files=False)
+    return packages
+
+
+def expected_details(pkg):
+    """Parse files and changelogs of a package the way a sync without deferring does."""
+    details = {}
+
+    def newpkgcb(pkgId, name, arch):
+        return pkg if pkgId == pkg.pkgId else None
+
+    cr.xml_parse_filelists(FILELISTS_XML, newpkgcb=newpkgcb)
+    cr.xml_parse_other(OTHER_XML, newpkgcb=newpkgcb)
+    details['files'] = pkg.files
+    details['changelogs'] = pkg.changelogs
+    return details
+
+
+class TestParsePackageDetails(TestCase):
+    """Test parsing files and changelogs of chosen packages."""
+
+    def test_parse_chosen_packages(self):
+        """Test that only the chosen packages are parsed."""
+        packages = parse_primary()
+        pkgids = {packages['camel'].pkgId, packages['fox'].pkgId}
+
+        details = parse_package_details(FILELISTS_XML, OTHER_XML, pkgids)
+
+        self.assertEqual(set(details), pkgids)
+        for name in ('camel', 'fox'):
+            self.assertEqual(details[packages[name].pkgId], expected_details(packages[name]))
+
+    def test_parse_unknown_package(self):
+        """Test that a pkgId which isn't in the metadata is left out."""
+        details = parse_package_details(FILELISTS_XML, OTHER_XML, {'0' * 64})
+
+        self.assertEqual(details, {})
+
+
+class TestFillPackageDetails(TestCase):
+    """Test filling in files and changelogs of packages synced without them."""
+
+    def setUp(self):
+        """Create packages with deferred details and the kept metadata they refer to."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+        self.filelists = self.create_artifact(FILELISTS_XML)
+        self.other = self.create_artifact(OTHER_XML)
+        deferred_details = {'filelists': self.filelists.sha256, 'other': self.other.sha256}
+
+        self.packages = {}
+        for name, pkg in parse_primary().items():
+            package = Package(**Package.createrepo_to_dict(pkg))
+            package.deferred_details = deferred_details
+            package.save()
+            self.packages[name] = package
+
+    def create_artifact(self, path):
+        """Save a copy of a fixture as an artifact, the artifact storage takes the file over."""
+        temp_path = os.path.join(self.temp_dir, os.path.basename(path))
+        shutil.copy(path, temp_path)
+        artifact = Artifact.init_and_validate(temp_path)
+        artifact.save()
+        return artifact
+
+    def assert_filled(self, name):
+        """Assert that a package has the details from the fixture metadata."""
+        package = Package.objects.get(pk=self.packages[name].pk)
+        details = expected_details(parse_primary()[name])
+        self.assertFalse(package.has_deferred_details)
+        self.assertEqual([tuple(file) for file in package.files], details['files'])
+        self.assertEqual(
+            [tuple(changelog) for changelog in package.changelogs], details['changelogs']
+        )
+
+    def test_fill(self):
+        """Test that details of all the given packages are filled in."""
+        fill_package_details(Package.objects.filter(pk__in=[
+            self.packages['bear'].pk, self.packages['dog'].pk
+        ]))
+
+        self.assert_filled('bear')
+        self.assert_filled('dog')
+        for name in ('camel', 'fox'):
+            package = Package.objects.get(pk=self.packages[name].pk)
+            self.assertTrue(package.has_deferred_details)
+            self.assertEqual(package.files, [])
+
+    def test_fill_filled_packages(self):
+        """Test that packages which already have their details are left alone."""
+        Package.objects.filter(pk=self.packages['bear'].pk).update(
+            deferred_details={}, files=[['', '/etc/', 'bear.conf']]
+        )
+
+        fill_package_details(Package.objects.all())
+
+        self.assertEqual(Package.objects.get(pk=self.packages['bear'].pk).files, [
+            ['', '/etc/', 'bear.conf']
+        ])
+        for name in ('camel', 'dog', 'fox'):
+            self.assert_filled(name)
+
+    def test_fill_from(self):
+        """Test that only packages which refer to the given metadata are filled in."""
+        other = self.create_artifact(os.path.join(REPODATA_DIR, 'other-reversed.xml'))
+        Package.objects.filter(pk=self.packages['fox'].pk).update(
+            deferred_details={'filelists': self.filelists.sha256, 'other': other.sha256}
+        )
+
+        fill_package_details_from([other.sha256])
+
+        self.assert_filled('fox')
+        for name in ('bear', 'camel', 'dog'):
+            self.assertTrue(Package.objects.get(pk=self.packages[name].pk).has_deferred_details)
+
+    def test_removed_metadata(self):
+        """Test that an error is raised and nothing is changed when kept metadata is gone."""
+        self.other.delete()
+
+        with self.assertRaises(PackageDetailsNotAvailable) as raised:
+            fill_package_details(Package.objects.all())
+
+        self.assertIn('4 packages', str(raised.exception))
+        for package in Package.objects.all():
+            self.assertTrue(package.has_deferred_details)
+            self.assertEqual(package.files, [])
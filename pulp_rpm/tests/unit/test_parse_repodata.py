@@ -0,0 +1,169 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import createrepo_c as cr
+
+from django.test import TestCase
+
+from pulp_rpm.app.models import Package
+from pulp_rpm.app.tasks.synchronizing import RpmFirstStage, parse_repodata_file
+
+
+REPODATA_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'repodata')
+
+# repodata of 4 packages: bear, camel, dog and fox, other-reversed.xml lists them in reverse
+# and filelists-missing.xml doesn't list dog
+PRIMARY_XML = os.path.join(REPODATA_DIR, 'primary.xml')
+FILELISTS_XML = os.path.join(REPODATA_DIR, 'filelists.xml')
+FILELISTS_MISSING_XML = os.path.join(REPODATA_DIR, 'filelists-missing.xml')
+OTHER_XML = os.path.join(REPODATA_DIR, 'other.xml')
+OTHER_REVERSED_XML = os.path.join(REPODATA_DIR, 'other-reversed.xml')
+
+
+def parse_in_memory(primary_xml_path, filelists_xml_path, other_xml_path):
+    """Parse all the packages at once, the way they were parsed before streaming."""
+    packages = {}
+
+    def pkgcb(pkg):
+        packages[pkg.pkgId] = pkg
+
+    def newpkgcb(pkgId, name, arch):
+        return packages.get(pkgId)
+
+    cr.xml_parse_primary(primary_xml_path, pkgcb=pkgcb, do_files=False)
+    cr.xml_parse_filelists(filelists_xml_path, newpkgcb=newpkgcb)
+    cr.xml_parse_other(other_xml_path, newpkgcb=newpkgcb)
+    return {pkgId: Package.createrepo_to_dict(pkg) for pkgId, pkg in packages.items()}
+
+
+def parse_and_die(repodata_type, xml_path, pkgids, batch_size, queue):
+    """Send the first package of filelists.xml and exit as if the process was killed."""
+    if repodata_type == 'filelists':
+        queue.put(('data', [('0' * 64, {'files': []})]))
+        queue.close()
+        queue.join_thread()
+        os._exit(1)
+    parse_repodata_file(repodata_type, xml_path, pkgids, batch_size, queue)
+
+
+class TestParseRepodata(TestCase):
+    """Test parsing of packages from repodata in separate processes."""
+
+    def setUp(self):
+        """Set up an event loop and spool the packages of the fixture primary.xml."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        self.spool_path = os.path.join(temp_dir, 'primary.spool')
+        self.locations = self.loop.run_until_complete(
+            RpmFirstStage.spool_packages(PRIMARY_XML, self.spool_path)
+        )
+
+    def parse(self, filelists_xml_path, other_xml_path, pkgids=None):
+        """Collect the packages in the order they are yielded."""
+        async def collect():
+            return [package async for package in RpmFirstStage.parse_repodata(
+                self.spool_path, filelists_xml_path, other_xml_path,
+                set(self.locations) if pkgids is None else pkgids
+            )]
+
+        return self.loop.run_until_complete(collect())
+
+    def test_spool_packages(self):
+        """Test that locations of all the packages are returned."""
+        self.assertEqual(
+            sorted(self.locations.values()),
+            ['bear-4.1-1.noarch.rpm', 'camel-0.1-1.noarch.rpm', 'dog-6.1-1.noarch.rpm',
+             'fox-1.1-1.noarch.rpm']
+        )
+
+    @patch('pulp_rpm.app.tasks.synchronizing.PARSE_BATCH_SIZE', 1)
+    def test_merge(self):
+        """Test that each package is yielded with all its data as soon as it is complete."""
+        packages = self.parse(FILELISTS_XML, OTHER_XML)
+
+        self.assertEqual(
+            [package['name'] for package in packages], ['bear', 'camel', 'dog', 'fox']
+        )
+        for package in packages:
+            self.assertEqual(self.locations[package['pkgId']], package['location_href'])
+            self.assertIn(f"/tmp/{package['name']}.txt", [
+                path + name for _type, path, name in package['files']
+            ])
+            self.assertEqual(package['changelogs'][0][2], f"- {package['name']} package")
+
+    @patch('pulp_rpm.app.tasks.synchronizing.PARSE_BATCH_SIZE', 1)
+    def test_merge_out_of_order(self):
+        """Test that packages are held until data from a file in a different order arrive."""
+        packages = self.parse(FILELISTS_XML, OTHER_REVERSED_XML)
+
+        self.assertEqual(
+            sorted(package['name'] for package in packages), ['bear', 'camel', 'dog', 'fox']
+        )
+        # bear is the first one in filelists.xml, but the last one in other-reversed.xml
+        self.assertEqual(packages[-1]['name'], 'bear')
+        for package in packages:
+            self.assertTrue(package['files'])
+            self.assertEqual(package['changelogs'][0][2], f"- {package['name']} package")
+
+    def test_same_as_in_memory(self):
+        """Test that the streamed packages are the same as the ones parsed at once."""
+        for other_xml_path in (OTHER_XML, OTHER_REVERSED_XML):
+            with self.subTest(other_xml=os.path.basename(other_xml_path)):
+                packages = self.parse(FILELISTS_XML, other_xml_path)
+
+                self.assertEqual(
+                    {package['pkgId']: package for package in packages},
+                    parse_in_memory(PRIMARY_XML, FILELISTS_XML, other_xml_path)
+                )
+
+    def test_missing_entry(self):
+        """Test that a package missing in filelists.xml is yielded without files."""
+        packages = self.parse(FILELISTS_MISSING_XML, OTHER_XML)
+
+        self.assertEqual(
+            {package['pkgId']: package for package in packages},
+            parse_in_memory(PRIMARY_XML, FILELISTS_MISSING_XML, OTHER_XML)
+        )
+        dog = next(package for package in packages if package['name'] == 'dog')
+        self.assertEqual(dog['files'], [])
+        self.assertEqual(dog['changelogs'][0][2], '- dog package')
+
+    def test_skip_packages(self):
+        """Test that only the chosen packages are parsed."""
+        pkgids = {pkgId for pkgId, location in self.locations.items() if 'camel' in location}
+
+        packages = self.parse(FILELISTS_XML, OTHER_XML, pkgids)
+
+        self.assertEqual([package['name'] for package in packages], ['camel'])
+        self.assertTrue(packages[0]['files'])
+
+    def test_without_details(self):
+        """Test that packages are yielded from the spool without files and changelogs."""
+        packages = self.parse(None, None)
+
+        self.assertEqual(len(packages), 4)
+        for package in packages:
+            self.assertEqual(package['files'], [])
+            self.assertEqual(package['changelogs'], [])
+
+    @patch('pulp_rpm.app.tasks.synchronizing.parse_repodata_file', parse_and_die)
+    def test_process_died(self):
+        """Test that parsing fails when a parsing process dies without a result."""
+        with self.assertRaises(cr.CreaterepoCError):
+            self.parse(FILELISTS_XML, OTHER_XML)
+
+    def test_invalid_xml(self):
+        """Test that an error of the parser fails the parsing."""
+        invalid_xml_path = os.path.join(os.path.dirname(self.spool_path), 'filelists.xml')
+        with open(FILELISTS_XML) as filelists_xml, open(invalid_xml_path, 'w') as invalid_xml:
+            invalid_xml.write(filelists_xml.read()[:-20])
+
+        with self.assertRaises(cr.CreaterepoCError):
+            self.parse(invalid_xml_path, OTHER_XML)
@@ -0,0 +1,151 @@
+import cProfile
+import os
+import pstats
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage as storage
+from django.test import TestCase, override_settings
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from pulpcore.plugin.models import Task
+
+from pulp_rpm.app.profiling import profile_path, profiled, save_profile
+from pulp_rpm.app.viewsets import ProfileViewSet
+
+
+@profiled
+def synchronize(fail=False):
+    """Stand in for a task."""
+    if fail:
+        raise ValueError('failed')
+    return 'synced'
+
+
+class TestProfiled(TestCase):
+    """Test profiling of tasks listed in RPM_PROFILE_TASKS."""
+
+    @override_settings(RPM_PROFILE_TASKS=[])
+    @patch('pulp_rpm.app.profiling.save_profile')
+    def test_not_listed(self, save):
+        """Test that a task which isn't listed isn't profiled."""
+        self.assertEqual(synchronize(), 'synced')
+        save.assert_not_called()
+
+    @override_settings(RPM_PROFILE_TASKS=['synchronize'])
+    @patch('pulp_rpm.app.profiling.save_profile')
+    def test_listed(self, save):
+        """Test that a listed task is profiled."""
+        self.assertEqual(synchronize(), 'synced')
+        save.assert_called_once()
+        self.assertEqual(save.call_args[0][1], 'synchronize')
+
+    @override_settings(RPM_PROFILE_TASKS=['synchronize'])
+    @patch('pulp_rpm.app.profiling.save_profile')
+    def test_failed_task(self, save):
+        """Test that the profile of a failed task is saved and the error is raised."""
+        with self.assertRaises(ValueError):
+            synchronize(fail=True)
+        save.assert_called_once()
+
+    @override_settings(RPM_PROFILE_TASKS=['synchronize'])
+    @patch('pulp_rpm.app.profiling.save_profile', side_effect=OSError('no space left'))
+    def test_failed_save(self, save):
+        """Test that a profile which can't be saved doesn't fail the task."""
+        self.assertEqual(synchronize(), 'synced')
+
+
+class TestSaveProfile(TestCase):
+    """Test storing profiles of tasks."""
+
+    def setUp(self):
+        """Work in a temporary directory, as a task does."""
+        working_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, working_dir)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(working_dir)
+
+    def create_task(self):
+        """Create a finished task which profile is removed when the test ends."""
+        task = Task.objects.create(state='completed', name='pulp_rpm.app.tasks.synchronize')
+        self.addCleanup(self.delete_profile, task.pk)
+        return task
+
+    def delete_profile(self, task_pk):
+        """Delete a profile of a task from the storage if there is one."""
+        if storage.exists(profile_path(task_pk)):
+            storage.delete(profile_path(task_pk))
+
+    def profile(self):
+        """Profile some work."""
+        profiler = cProfile.Profile()
+        profiler.runcall(sorted, range(100))
+        return profiler
+
+    def test_save(self):
+        """Test that the profile is stored and the temporary file is removed."""
+        task = self.create_task()
+
+        with patch('pulp_rpm.app.profiling.Task.current', return_value=task):
+            stored_path = save_profile(self.profile(), 'synchronize')
+
+        self.assertEqual(stored_path, profile_path(task.pk))
+        self.assertEqual(os.listdir(os.getcwd()), [])
+        with storage.open(stored_path) as profile_file, \
+                tempfile.NamedTemporaryFile() as loaded_file:
+            shutil.copyfileobj(profile_file, loaded_file)
+            loaded_file.flush()
+            self.assertTrue(pstats.Stats(loaded_file.name).stats)
+
+    @override_settings(RPM_PROFILES_KEPT=2)
+    def test_remove_old_profiles(self):
+        """Test that only profiles of the newest existing tasks are kept."""
+        tasks = [self.create_task() for _i in range(4)]
+        for task in tasks[:3]:
+            storage.save(profile_path(task.pk), ContentFile(b'profile'))
+        task_pks = [task.pk for task in tasks]
+        tasks[2].delete()
+
+        with patch('pulp_rpm.app.profiling.Task.current', return_value=tasks[3]):
+            save_profile(self.profile(), 'synchronize')
+
+        for task_pk, kept in zip(task_pks, (False, True, False, True)):
+            with self.subTest(task=task_pk):
+                self.assertEqual(storage.exists(profile_path(task_pk)), kept)
+
+
+class TestProfileViewSet(TestCase):
+    """Test that profiles can be downloaded only by users who can view the task."""
+
+    def setUp(self):
+        """Store a profile of a task."""
+        self.task = Task.objects.create(state='completed', name='pulp_rpm.app.tasks.synchronize')
+        storage.save(profile_path(self.task.pk), ContentFile(b'profile'))
+        self.addCleanup(storage.delete, profile_path(self.task.pk))
+
+    def retrieve(self, user):
+        """Request the profile as a user."""
+        request = APIRequestFactory().get(f'/pulp/api/v3/rpm/profiles/{self.task.pk}/')
+        force_authenticate(request, user)
+        return ProfileViewSet.as_view({'get': 'retrieve'})(request, pk=str(self.task.pk))
+
+    def test_admin(self):
+        """Test that an admin can download the profile."""
+        admin = get_user_model().objects.create(username='admin', is_superuser=True)
+
+        response = self.retrieve(admin)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'profile')
+
+    def test_without_permission(self):
+        """Test that a user who can't view the task can't download the profile."""
+        user = get_user_model().objects.create(username='user')
+
+        response = self.retrieve(user)
+
+        self.assertIn(response.status_code, (403, 404))
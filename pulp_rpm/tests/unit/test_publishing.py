@@ -0,0 +1,139 @@
+import filecmp
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import createrepo_c as cr
+
+from django.test import TestCase
+
+from pulpcore.plugin.models import Artifact, ContentArtifact
+
+from pulp_rpm.app.constants import CHECKSUM_TYPES, PACKAGE_REPODATA
+from pulp_rpm.app.models import Package
+from pulp_rpm.app.tasks.publishing import (
+    annotate_package_pkgids,
+    write_package_metadata,
+    write_package_metadata_file,
+    write_package_metadata_in_parallel,
+)
+
+
+REPODATA_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'repodata')
+
+CHECKSUM_TYPES_ = {'original': {}, 'package': CHECKSUM_TYPES.SHA1}
+# the metadata is left uncompressed to compare it byte for byte
+COMPRESSIONS = (cr.NO_COMPRESSION, cr.NO_COMPRESSION)
+
+
+def write_and_die(name, paths, total_packages, checksum_types, compressions, queue, results):
+    """Exit without a result as if the process writing filelists was killed."""
+    if name == 'filelists':
+        os._exit(1)
+    write_package_metadata_file(
+        name, paths, total_packages, checksum_types, compressions, queue, results
+    )
+
+
+def parse_packages():
+    """Parse the packages of the fixture repodata with their files and changelogs."""
+    packages = {}
+
+    def pkgcb(pkg):
+        packages[pkg.pkgId] = pkg
+
+    def newpkgcb(pkgId, name, arch):
+        return packages.get(pkgId)
+
+    cr.xml_parse_primary(os.path.join(REPODATA_DIR, 'primary.xml'), pkgcb=pkgcb, do_files=False)
+    cr.xml_parse_filelists(os.path.join(REPODATA_DIR, 'filelists.xml'), newpkgcb=newpkgcb)
+    cr.xml_parse_other(os.path.join(REPODATA_DIR, 'other.xml'), newpkgcb=newpkgcb)
+    return packages.values()
+
+
+class TestWritePackageMetadata(TestCase):
+    """Test writing package metadata in the worker and in separate processes."""
+
+    def setUp(self):
+        """Create the fixture packages, bear with an artifact to publish its checksum."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+        for pkg in parse_packages():
+            package = Package(**Package.createrepo_to_dict(pkg))
+            package.save()
+            if package.name == 'bear':
+                artifact_path = os.path.join(self.temp_dir, package.location_href)
+                with open(artifact_path, 'wb') as artifact_file:
+                    artifact_file.write(b'bear')
+                artifact = Artifact.init_and_validate(artifact_path)
+                artifact.save()
+                ContentArtifact.objects.create(
+                    artifact=artifact, content=package, relative_path=package.location_href
+                )
+
+    def write(self, write_function, directory_name, paths=None):
+        """
+        Write the metadata of all the packages to a new directory.
+
+        Returns:
+            tuple: the directory and the repomd records of the written files
+
+        """
+        directory = os.path.join(self.temp_dir, directory_name)
+        os.mkdir(directory)
+        paths = paths or {
+            name: (os.path.join(directory, f'{name}.xml'), os.path.join(directory, f'{name}.db'))
+            for name in PACKAGE_REPODATA
+        }
+        packages = annotate_package_pkgids(
+            Package.objects.order_by('name'), CHECKSUM_TYPES_['package']
+        )
+        records = write_function(
+            packages, packages.count(), paths, CHECKSUM_TYPES_, COMPRESSIONS
+        )
+        return directory, records
+
+    def test_same_as_serial(self):
+        """Test that the metadata written in parallel is the same as the one written serially."""
+        serial_dir, serial_records = self.write(write_package_metadata, 'serial')
+        parallel_dir, parallel_records = self.write(write_package_metadata_in_parallel, 'parallel')
+
+        self.assertEqual(
+            [(record.type, record.checksum, record.location_href) for record in serial_records],
+            [(record.type, record.checksum, record.location_href) for record in parallel_records]
+        )
+        self.assertEqual(len(os.listdir(serial_dir)), 6)
+        self.assertEqual(sorted(os.listdir(serial_dir)), sorted(os.listdir(parallel_dir)))
+        for file_name in os.listdir(serial_dir):
+            with self.subTest(file=file_name):
+                self.assertTrue(filecmp.cmp(
+                    os.path.join(serial_dir, file_name),
+                    os.path.join(parallel_dir, file_name),
+                    shallow=False
+                ))
+
+        primary_xml_name = next(
+            name for name in os.listdir(parallel_dir) if name.endswith('-primary.xml')
+        )
+        with open(os.path.join(parallel_dir, primary_xml_name)) as primary_xml:
+            bear = Package.objects.get(name='bear')
+            self.assertIn(bear.contentartifact_set.get().artifact.sha1, primary_xml.read())
+
+    @patch('pulp_rpm.app.tasks.publishing.write_package_metadata_file', write_and_die)
+    def test_process_died(self):
+        """Test that the publish fails when a writing process dies without a result."""
+        with self.assertRaises(cr.CreaterepoCError):
+            self.write(write_package_metadata_in_parallel, 'parallel')
+
+    def test_write_failed(self):
+        """Test that an error of a writing process fails the publish."""
+        directory = os.path.join(self.temp_dir, 'parallel')
+        paths = {
+            name: (os.path.join(directory, f'{name}.xml'), None) for name in PACKAGE_REPODATA
+        }
+        paths['other'] = (os.path.join(self.temp_dir, 'missing', 'other.xml'), None)
+
+        with self.assertRaises(cr.CreaterepoCError):
+            self.write(write_package_metadata_in_parallel, 'parallel', paths)
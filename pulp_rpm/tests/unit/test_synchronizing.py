@@ -0,0 +1,649 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock, Mock, patch
+
+import createrepo_c as cr
+
+from aiohttp import ClientConnectionError
+
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from pulpcore.plugin.download import DownloadResult
+from pulpcore.plugin.models import Artifact
+
+from pulp_rpm.app import processes
+from pulp_rpm.app.advisory import hash_update_record
+from pulp_rpm.app.models import Package, RpmRemote, RpmRepository, UpdateRecord
+from pulp_rpm.app.tasks.synchronizing import (
+    FetchedMetadata,
+    RpmFirstStage,
+    SyncCheckpoint,
+    create_versions,
+    fetch_remote_urls,
+    get_repomd_validators,
+    parse_repodata_file,
+    rank_mirrors,
+    repodata_exists,
+    sort_probes,
+    store_repomd_validators,
+)
+
+
+REPODATA_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'repodata')
+REPOMD_URL = 'http://example.com/repo/repodata/repomd.xml'
+LAST_MODIFIED = 'Wed, 21 Oct 2015 07:28:00 GMT'
+
+
+def download_result(headers):
+    """Create a result of a repomd.xml download with the response headers."""
+    return DownloadResult(
+        url=REPOMD_URL, artifact_attributes={}, path='repomd.xml', headers=headers
+    )
+
+
+class TestRepomdValidators(TestCase):
+    """Test storing HTTP validators of repomd.xml for conditional requests."""
+
+    def setUp(self):
+        """Create a remote."""
+        self.remote = RpmRemote.objects.create(name='validators', url='http://example.com/repo/')
+
+    def test_store_validators(self):
+        """Test that ETag, Last-Modified and the revision are stored for the URL."""
+        last_updated = self.remote.pulp_last_updated
+        result = download_result({'ETag': '"1"', 'Last-Modified': LAST_MODIFIED})
+        store_repomd_validators(self.remote, REPOMD_URL, result, '1600000000')
+
+        self.remote.refresh_from_db()
+        self.assertEqual(self.remote.metadata_validators, {
+            REPOMD_URL: {'etag': '"1"', 'last_modified': LAST_MODIFIED, 'revision': '1600000000'}
+        })
+        # a changed remote would prevent optimizing the next sync
+        self.assertEqual(self.remote.pulp_last_updated, last_updated)
+
+    def test_remove_stale_validators(self):
+        """Test that validators are removed when the server doesn't send them anymore."""
+        store_repomd_validators(
+            self.remote, REPOMD_URL, download_result({'ETag': '"1"'}), '1600000000'
+        )
+        store_repomd_validators(self.remote, REPOMD_URL, download_result({}), '1600000001')
+
+        self.remote.refresh_from_db()
+        self.assertEqual(self.remote.metadata_validators, {})
+
+    def test_get_validators(self):
+        """Test that validators are used only for HTTP when the sync can be optimized."""
+        store_repomd_validators(
+            self.remote, REPOMD_URL, download_result({'ETag': '"1"'}), '1600000000'
+        )
+        validators = {'etag': '"1"', 'revision': '1600000000'}
+        optimizable = 'pulp_rpm.app.tasks.synchronizing.is_sync_optimizable'
+
+        with patch(optimizable, return_value=True):
+            self.assertEqual(get_repomd_validators(self.remote, None, REPOMD_URL), validators)
+            self.assertIsNone(
+                get_repomd_validators(self.remote, None, 'file:///repo/repodata/repomd.xml')
+            )
+        with patch(optimizable, return_value=False):
+            self.assertIsNone(get_repomd_validators(self.remote, None, REPOMD_URL))
+
+
+@patch('pulp_rpm.app.tasks.synchronizing.ProgressReport')
+class TestParseKnownPackages(TransactionTestCase):
+    """
+    Test that packages which are already in Pulp are not parsed again.
+
+    Known packages are queried in threads of the executor with their own database connections,
+    so the packages are committed rather than created in a transaction of the test.
+    """
+
+    def setUp(self):
+        """Set up an event loop and a repository to sync."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+        self.repository = RpmRepository.objects.create(name='known')
+        self.remote = RpmRemote.objects.create(name='known', url='http://example.com/repo/')
+
+    def parse_packages(self):
+        """
+        Parse packages of the fixture repodata by the first stage of a sync.
+
+        Returns:
+            tuple: the packages sent to the next stage and pkgIds which files and changelogs
+                were parsed for
+
+        """
+        stage = RpmFirstStage(self.remote, self.repository, deferred_download=False)
+        stage._out_q = asyncio.Queue()
+        stage.data.remote_url = self.remote.url
+        stage.data.metadata_pb = Mock()
+        results = [
+            SimpleNamespace(path=os.path.join(REPODATA_DIR, f'{repodata_type}.xml'))
+            for repodata_type in ('primary', 'filelists', 'other')
+        ]
+
+        with patch.object(processes, 'start_process', wraps=processes.start_process) as start:
+            self.loop.run_until_complete(stage.parse_packages(results))
+
+        parsed_pkgids = set()
+        for call in start.call_args_list:
+            if call[0][0] is parse_repodata_file:
+                parsed_pkgids |= call[0][3]
+        packages = []
+        while not stage._out_q.empty():
+            packages.append(stage._out_q.get_nowait().content)
+        return packages, parsed_pkgids
+
+    def test_resync(self, progress_report):
+        """Test that a re-sync relates the same packages without parsing their details."""
+        packages, parsed_pkgids = self.parse_packages()
+        self.assertEqual(len(packages), 4)
+        self.assertEqual(parsed_pkgids, {package.pkgId for package in packages})
+        for package in packages:
+            self.assertTrue(package.files)
+            package.save()
+
+        known_packages, parsed_pkgids = self.parse_packages()
+
+        self.assertEqual(parsed_pkgids, set())
+        self.assertEqual(
+            sorted(package.pk for package in known_packages),
+            sorted(package.pk for package in packages)
+        )
+
+    def test_resync_new_package(self, progress_report):
+        """Test that only the package which isn't in Pulp yet is parsed on a re-sync."""
+        packages, parsed_pkgids = self.parse_packages()
+        for package in packages:
+            package.save()
+        camel = Package.objects.get(name='camel')
+        camel.delete()
+
+        packages, parsed_pkgids = self.parse_packages()
+
+        self.assertEqual(parsed_pkgids, {camel.pkgId})
+        self.assertEqual(len(packages), 4)
+        camel = next(package for package in packages if package.name == 'camel')
+        self.assertTrue(camel.files)
+        self.assertTrue(camel.changelogs)
+
+
+class TestSyncCheckpoint(TransactionTestCase):
+    """
+    Test keeping metadata files and saved content of a failed sync for a retried one.
+
+    Kept files are looked up in threads of the executor with their own database connections, so
+    the kept artifacts are committed rather than created in a transaction of the test.
+    """
+
+    def setUp(self):
+        """Create a repository and work in a temporary directory, as a task does."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+
+        working_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, working_dir)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(working_dir)
+
+        self.remote = RpmRemote.objects.create(name='checkpoint', url='http://example.com/repo/')
+        self.repository = RpmRepository.objects.create(name='checkpoint')
+
+    def checkpoint(self, repository=None, revision='1'):
+        """Start a checkpoint of a sync of a repository."""
+        repository = RpmRepository.objects.get(pk=(repository or self.repository).pk)
+        checkpoint = SyncCheckpoint(repository, self.remote)
+        checkpoint.start(self.remote.url, revision)
+        return checkpoint
+
+    def download(self, checkpoint, name, data):
+        """
+        Download a metadata file with the checkpoint, the download writes the data.
+
+        Returns:
+            tuple: the result of the download and the mock of the remote downloader
+
+        """
+        url = f'{self.remote.url}repodata/{name}'
+
+        async def run():
+            path = os.path.join(os.getcwd(), name)
+            with open(path, 'wb') as downloaded_file:
+                downloaded_file.write(data)
+            return DownloadResult(url=url, artifact_attributes={}, path=path, headers=None)
+
+        downloader = Mock(run=run)
+        with patch.object(self.remote, 'get_downloader', return_value=downloader) as get:
+            result = self.loop.run_until_complete(checkpoint.get_downloader(url).run())
+        return result, get
+
+    def test_keep_and_resume(self):
+        """Test that a retried sync takes the kept files and the saved content."""
+        checkpoint = self.checkpoint()
+        self.download(checkpoint, 'primary.xml', b'primary')
+        content_pk = str(uuid.uuid4())
+        checkpoint.record_saved([SimpleNamespace(content=SimpleNamespace(pk=content_pk))])
+
+        checkpoint.keep()
+
+        checkpoint = self.checkpoint()
+        result, get_downloader = self.download(checkpoint, 'primary.xml', b'changed')
+        get_downloader.assert_not_called()
+        with open(result.path, 'rb') as kept_file:
+            self.assertEqual(kept_file.read(), b'primary')
+        self.assertEqual(checkpoint.get_resumed_content(), [content_pk])
+
+        # the sync fails again, everything is kept for the next one
+        checkpoint.keep()
+        checkpoint = self.checkpoint()
+        self.assertIsNotNone(checkpoint.get_kept(f'{self.remote.url}repodata/primary.xml'))
+        self.assertEqual(checkpoint.get_resumed_content(), [content_pk])
+
+    def test_other_revision(self):
+        """Test that nothing is resumed for a different revision of the metadata."""
+        checkpoint = self.checkpoint()
+        self.download(checkpoint, 'primary.xml', b'primary')
+        checkpoint.keep()
+
+        checkpoint = self.checkpoint(revision='2')
+        result, get_downloader = self.download(checkpoint, 'primary.xml', b'changed')
+
+        get_downloader.assert_called_once()
+        with open(result.path, 'rb') as downloaded_file:
+            self.assertEqual(downloaded_file.read(), b'changed')
+        self.assertEqual(checkpoint.get_resumed_content(), [])
+
+    def test_successful_sync(self):
+        """Test that a successful sync keeps nothing."""
+        checkpoint = self.checkpoint()
+        self.download(checkpoint, 'primary.xml', b'primary')
+
+        SyncCheckpoint.clear([checkpoint.repository])
+
+        self.assertFalse(Artifact.objects.filter(
+            sha256=hashlib.sha256(b'primary').hexdigest()
+        ).exists())
+        self.assertEqual(RpmRepository.objects.get(pk=self.repository.pk).sync_checkpoint, {})
+
+    def test_clear(self):
+        """Test that kept files are deleted unless a checkpoint of another repository keeps them."""
+        other_repository = RpmRepository.objects.create(name='checkpoint-other')
+        checkpoint = self.checkpoint()
+        self.download(checkpoint, 'primary.xml', b'primary')
+        self.download(checkpoint, 'other.xml', b'other')
+        checkpoint.keep()
+        other_checkpoint = self.checkpoint(other_repository)
+        self.download(other_checkpoint, 'primary.xml', b'primary')
+        other_checkpoint.keep()
+
+        SyncCheckpoint.clear([RpmRepository.objects.get(pk=self.repository.pk)])
+
+        self.assertEqual(RpmRepository.objects.get(pk=self.repository.pk).sync_checkpoint, {})
+        self.assertFalse(Artifact.objects.filter(
+            sha256=hashlib.sha256(b'other').hexdigest()
+        ).exists())
+        self.assertTrue(Artifact.objects.filter(
+            sha256=hashlib.sha256(b'primary').hexdigest()
+        ).exists())
+
+        SyncCheckpoint.clear([RpmRepository.objects.get(pk=other_repository.pk)])
+
+        self.assertFalse(Artifact.objects.filter(
+            sha256=hashlib.sha256(b'primary').hexdigest()
+        ).exists())
+
+
+class TestRankMirrors(TestCase):
+    """Test probing and ranking mirrors of a mirror list feed."""
+
+    def setUp(self):
+        """Create a remote with a mirror list feed and work in a temporary directory."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+
+        self.working_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.working_dir)
+
+        self.remote = RpmRemote.objects.create(
+            name='mirrors', url='http://example.com/mirrorlist'
+        )
+        # mirror URLs with the latency and the revision of repomd.xml, or the error, of each
+        self.mirrors = {
+            'http://a.example.com/': (0.3, '2'),
+            'http://b.example.com/': (0.1, '1'),
+            'http://c.example.com/': (0.2, '2'),
+            'http://down.example.com/': ClientConnectionError(),
+            'http://html.example.com/': (0.1, None),
+        }
+
+    def get_downloader(self, url, timeout):
+        """Create a downloader of repomd.xml of a mirror from self.mirrors."""
+        mirror_url = url[:-len('repodata/repomd.xml')]
+        probe = self.mirrors[mirror_url]
+        self.assertEqual(timeout, settings.RPM_MIRROR_PROBE_TIMEOUT)
+
+        async def run():
+            if isinstance(probe, Exception):
+                raise probe
+            path = os.path.join(self.working_dir, f'{uuid.uuid4()}.xml')
+            with open(path, 'w') as repomd_file:
+                if probe[1] is None:
+                    repomd_file.write('<html><body>Not Found</body></html>')
+                else:
+                    repomd = cr.Repomd()
+                    repomd.revision = probe[1]
+                    repomd_file.write(repomd.xml_dump())
+            return DownloadResult(url=url, artifact_attributes={}, path=path, headers=None)
+
+        return Mock(run=run, latency=None if isinstance(probe, Exception) else probe[0])
+
+    def rank(self, mirror_list=None):
+        """
+        Rank the mirrors of the remote.
+
+        Returns:
+            tuple: the ranked mirror URLs, the fetched metadata and the mock of read_mirror_list
+
+        """
+        fetched_metadata = FetchedMetadata()
+        with patch.object(RpmRemote, 'get_downloader', side_effect=self.get_downloader), \
+                patch('pulp_rpm.app.tasks.synchronizing.read_mirror_list',
+                      side_effect=mirror_list or (lambda remote: list(self.mirrors))) as read:
+            mirrors = rank_mirrors(self.remote, fetched_metadata)
+        return mirrors, fetched_metadata, read
+
+    def store_ranking(self, mirrors, age=0):
+        """Store a ranking of mirrors on the remote as if a previous sync ranked them."""
+        self.remote.mirror_ranking = {
+            'url': self.remote.url, 'ranked_at': time.time() - age, 'mirrors': mirrors
+        }
+        self.remote.save()
+
+    def test_sort_probes(self):
+        """Test that the newest mirrors go first, ordered by their latency."""
+        probes = [
+            ('http://a.example.com/', 0.3, '2'),
+            ('http://b.example.com/', 0.1, '1'),
+            ('http://c.example.com/', 0.2, '2'),
+            ('http://d.example.com/', None, '2'),
+        ]
+
+        self.assertEqual(sort_probes(probes), [
+            'http://d.example.com/', 'http://c.example.com/', 'http://a.example.com/',
+            'http://b.example.com/',
+        ])
+        self.assertEqual(sort_probes([]), [])
+
+    def test_rank(self):
+        """Test that unavailable mirrors and mirrors without a revision are left out."""
+        mirrors, fetched_metadata, _read = self.rank()
+
+        expected = ['http://c.example.com/', 'http://a.example.com/', 'http://b.example.com/']
+        self.assertEqual(mirrors, expected)
+        self.remote.refresh_from_db()
+        self.assertEqual(self.remote.mirror_ranking['mirrors'], expected)
+        for mirror_url in expected:
+            self.assertIsNotNone(fetched_metadata.get(f'{mirror_url}repodata/repomd.xml'))
+        self.assertIsNone(fetched_metadata.get('http://html.example.com/repodata/repomd.xml'))
+
+    def test_reuse_ranking(self):
+        """Test that a recent ranking is reused without the mirrors which became unavailable."""
+        self.store_ranking(
+            ['http://a.example.com/', 'http://down.example.com/', 'http://b.example.com/']
+        )
+
+        mirrors, _fetched_metadata, read = self.rank()
+
+        self.assertEqual(mirrors, ['http://a.example.com/', 'http://b.example.com/'])
+        read.assert_not_called()
+        self.remote.refresh_from_db()
+        self.assertIn('http://down.example.com/', self.remote.mirror_ranking['mirrors'])
+
+    def test_expired_ranking(self):
+        """Test that the mirrors are ranked again when the ranking is older than the TTL."""
+        self.store_ranking(['http://a.example.com/'], age=settings.RPM_MIRROR_RANKING_TTL + 1)
+
+        mirrors, _fetched_metadata, read = self.rank()
+
+        read.assert_called_once()
+        self.assertEqual(mirrors[0], 'http://c.example.com/')
+        self.remote.refresh_from_db()
+        self.assertEqual(self.remote.mirror_ranking['mirrors'], mirrors)
+
+    def test_concurrent_ranking(self):
+        """Test that a ranking stored by a sync which started later is not overwritten."""
+        def read_mirror_list(remote):
+            # another sync ranks the mirrors while this one probes them
+            RpmRemote.objects.filter(pk=remote.pk).update(mirror_ranking={
+                'url': remote.url,
+                'ranked_at': time.time() + 1,
+                'mirrors': ['http://b.example.com/'],
+            })
+            return list(self.mirrors)
+
+        mirrors, _fetched_metadata, _read = self.rank(read_mirror_list)
+
+        self.assertEqual(mirrors[0], 'http://c.example.com/')
+        self.remote.refresh_from_db()
+        self.assertEqual(self.remote.mirror_ranking['mirrors'], ['http://b.example.com/'])
+
+
+def create_update(title='Bear update', updated_date=datetime(2020, 8, 1)):
+    """Create an advisory as parsed from updateinfo.xml."""
+    update = cr.UpdateRecord()
+    update.id = 'RHSA-2020:0001'
+    update.type = 'security'
+    update.version = '1'
+    update.title = title
+    update.issued_date = datetime(2020, 7, 1)
+    update.updated_date = updated_date
+    collection = cr.UpdateCollection()
+    collection.shortname = 'bear'
+    package = cr.UpdateCollectionPackage()
+    package.name = 'bear'
+    package.version = '4.1'
+    package.release = '1'
+    package.epoch = '0'
+    package.arch = 'noarch'
+    package.filename = 'bear-4.1-1.noarch.rpm'
+    collection.append(package)
+    update.append_collection(collection)
+    return update
+
+
+@patch('pulp_rpm.app.tasks.synchronizing.ProgressReport')
+class TestParseAdvisories(TestCase):
+    """Test that only advisories which have changed since the last sync are parsed in full."""
+
+    def setUp(self):
+        """Set up an event loop and a repository with an advisory in its latest version."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+        self.repository = RpmRepository.objects.create(name='advisories')
+        self.remote = RpmRemote.objects.create(name='advisories', url='http://example.com/repo/')
+
+    def add_advisory(self, update):
+        """Save an advisory and add it to a new version of the repository."""
+        update_record = UpdateRecord(**UpdateRecord.createrepo_to_dict(update))
+        update_record.digest = hash_update_record(update)
+        update_record.save()
+        with self.repository.new_version() as new_version:
+            new_version.add_content(UpdateRecord.objects.filter(pk=update_record.pk))
+        return update_record
+
+    def parse_advisories(self, updates):
+        """
+        Parse advisories by the first stage of a sync.
+
+        Returns:
+            tuple: the declarative content sent to the next stage and the mock of
+                hash_update_record
+
+        """
+        stage = RpmFirstStage(self.remote, self.repository, deferred_download=False)
+        stage._out_q = asyncio.Queue()
+        with patch(
+            'pulp_rpm.app.tasks.synchronizing.hash_update_record', wraps=hash_update_record
+        ) as hash_update:
+            self.loop.run_until_complete(stage._parse_advisories(updates))
+        dcs = []
+        while not stage._out_q.empty():
+            dcs.append(stage._out_q.get_nowait())
+        return dcs, hash_update
+
+    def test_unchanged(self, progress_report):
+        """Test that an unchanged advisory is taken as it is stored."""
+        update_record = self.add_advisory(create_update())
+
+        dcs, _hash_update = self.parse_advisories([create_update()])
+
+        self.assertEqual(len(dcs), 1)
+        self.assertEqual(dcs[0].content.pk, update_record.pk)
+        self.assertEqual(dcs[0].extra_data, {'collections': {}, 'references': []})
+
+    def test_changed_with_same_key(self, progress_report):
+        """Test that an advisory changed without a new date or version is parsed again."""
+        update_record = self.add_advisory(create_update())
+        update = create_update(title='Fixed bear update')
+
+        dcs, hash_update = self.parse_advisories([update])
+
+        hash_update.assert_called_once_with(update)
+        self.assertTrue(dcs[0].content._state.adding)
+        self.assertNotEqual(dcs[0].content.digest, update_record.digest)
+        self.assertEqual(dcs[0].content.digest, hash_update_record(update))
+        self.assertEqual(len(dcs[0].extra_data['collections']), 1)
+
+    def test_without_updated_date(self, progress_report):
+        """Test that advisories without the updated date are matched by their digest."""
+        self.add_advisory(create_update(updated_date=None))
+        update = create_update(title='Fixed bear update', updated_date=None)
+
+        dcs, hash_update = self.parse_advisories([create_update(updated_date=None), update])
+
+        self.assertEqual(hash_update.call_count, 2)
+        self.assertFalse(dcs[0].content._state.adding)
+        self.assertTrue(dcs[1].content._state.adding)
+        self.assertEqual(dcs[1].content.digest, hash_update_record(update))
+
+
+@patch('pulp_rpm.app.tasks.synchronizing.WorkingDirectory', MagicMock())
+class TestCreateVersions(TestCase):
+    """Test creating versions of a repository and of its sub-repositories at once."""
+
+    def setUp(self):
+        """Set up an event loop."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+        self.events = []
+
+    def declarative_version(self, name, pipeline):
+        """Create a declarative version of a new repository which runs the pipeline."""
+        async def create_pipeline(new_version):
+            await pipeline(name)
+
+        repository = RpmRepository.objects.create(name=name)
+        return Mock(repository=repository, create_pipeline=create_pipeline)
+
+    async def fail(self, name):
+        """Fail a pipeline."""
+        self.events.append(f'{name} started')
+        await asyncio.sleep(0)
+        raise ValueError('failed')
+
+    async def wait(self, name):
+        """Run a pipeline until it is cancelled."""
+        self.events.append(f'{name} started')
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            self.events.append(f'{name} cancelled')
+            raise
+
+    @override_settings(RPM_SYNC_CONCURRENCY=2)
+    def test_failed_pipeline(self):
+        """Test that a failed pipeline cancels the others and no version is created."""
+        declarative_versions = [
+            self.declarative_version('waiting', self.wait),
+            self.declarative_version('failing', self.fail),
+            # waits for a free slot of RPM_SYNC_CONCURRENCY
+            self.declarative_version('queued', self.wait),
+        ]
+
+        with self.assertRaises(ValueError):
+            create_versions(declarative_versions)
+
+        self.assertEqual(self.events, ['waiting started', 'failing started', 'waiting cancelled'])
+        for dv in declarative_versions:
+            with self.subTest(repository=dv.repository.name):
+                self.assertFalse(dv.repository.versions.filter(number__gt=0).exists())
+                dv.first_stage.checkpoint.keep.assert_called_once_with()
+
+
+class TestFetchedMetadata(TestCase):
+    """Test that metadata files are downloaded only once during a sync."""
+
+    def setUp(self):
+        """Set up an event loop and create a remote."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+        self.remote = RpmRemote.objects.create(name='fetched', url='http://example.com/repo/')
+
+    def get_downloader(self, path='repomd.xml'):
+        """Patch the remote to create downloaders which return a result with the path."""
+        result = DownloadResult(url=REPOMD_URL, artifact_attributes={}, path=path, headers={})
+
+        async def run():
+            return result
+
+        downloader = Mock(run=run, fetch=Mock(return_value=result))
+        return patch.object(self.remote, 'get_downloader', return_value=downloader)
+
+    def test_fetch_once(self):
+        """Test that repomd.xml is downloaded once when several parts of a sync need it."""
+        fetched_metadata = FetchedMetadata()
+
+        with self.get_downloader() as get_downloader:
+            self.assertEqual(
+                fetch_remote_urls(self.remote, fetched_metadata), [self.remote.url]
+            )
+            self.assertTrue(repodata_exists(self.remote, self.remote.url, fetched_metadata))
+            result = self.loop.run_until_complete(fetched_metadata.run(self.remote, REPOMD_URL))
+
+        get_downloader.assert_called_once_with(url=REPOMD_URL)
+        self.assertEqual(result.path, 'repomd.xml')
+
+    def test_fetch_other_url(self):
+        """Test that each URL is downloaded."""
+        fetched_metadata = FetchedMetadata()
+
+        with self.get_downloader() as get_downloader:
+            fetched_metadata.fetch(self.remote, REPOMD_URL)
+            fetched_metadata.fetch(self.remote, 'http://example.com/other/repodata/repomd.xml')
+
+        self.assertEqual(get_downloader.call_count, 2)
+
+    def test_not_modified(self):
+        """Test that a response without a file, e.g. 304 Not Modified, isn't cached."""
+        fetched_metadata = FetchedMetadata()
+
+        with self.get_downloader(path=None) as get_downloader:
+            fetched_metadata.fetch(self.remote, REPOMD_URL)
+            fetched_metadata.fetch(self.remote, REPOMD_URL)
+
+        self.assertEqual(get_downloader.call_count, 2)
+        self.assertIsNone(fetched_metadata.get(REPOMD_URL))
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+
+from types import SimpleNamespace
+
+from django.test import TestCase
+
+from pulp_rpm.app.zchunk import (
+    ZchunkHeader,
+    decompress_zchunk,
+    download_zchunk,
+    missing_ranges,
+    read_compressed_int,
+    read_reusable_chunks,
+)
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# primary.xml of 29 packages; in the second version a package is updated, one is removed and
+# one is added, every package is a separate chunk
+ZCK_V1 = os.path.join(FIXTURES_DIR, 'primary-1.xml.zck')
+ZCK_V2 = os.path.join(FIXTURES_DIR, 'primary-2.xml.zck')
+
+ZCK_V2_HEADER_SIZE = 686
+ZCK_V2_HEADER_CHECKSUM = '58d693e49c39cbe2a588eddd7dca8457ded4feb7fa653ce873409938ddc4478f'
+ZCK_V2_SHA256 = 'd3ad728ad0d076c3d6b16cdb004a8f159261b8d6c981929256d1df452382e469'
+ZCK_V2_OPEN_SHA256 = '4e15bc6f86cb802d20658fae9d781a3a1b851587ab5d828b7156add9682f72e1'
+
+
+def repomd_record(**kwargs):
+    """Create a stand-in for the createrepo_c.RepomdRecord of the second fixture."""
+    attributes = dict(
+        type='primary_zck',
+        location_href='repodata/primary.xml.zck',
+        checksum=ZCK_V2_SHA256,
+        checksum_type='sha256',
+        checksum_open=ZCK_V2_OPEN_SHA256,
+        checksum_open_type='sha256',
+        checksum_header=ZCK_V2_HEADER_CHECKSUM,
+        size_header=ZCK_V2_HEADER_SIZE,
+    )
+    attributes.update(kwargs)
+    return SimpleNamespace(**attributes)
+
+
+class RangeRemote:
+    """A remote which serves byte ranges of a local file and records the requested ranges."""
+
+    def __init__(self, path):
+        """Read the served file."""
+        with open(path, 'rb') as served_file:
+            self.data = served_file.read()
+        self.requested_ranges = []
+
+    def get_downloader(self, url, byte_range):
+        """Create a downloader of one byte range."""
+        remote = self
+
+        class Downloader:
+            async def run(self):
+                remote.requested_ranges.append(byte_range)
+                path = tempfile.NamedTemporaryFile(dir=os.getcwd(), delete=False).name
+                with open(path, 'wb') as part_file:
+                    part_file.write(remote.data[byte_range[0]:byte_range[1] + 1])
+                return SimpleNamespace(path=path)
+
+        return Downloader()
+
+
+class TestZchunkHeader(TestCase):
+    """Test parsing of zchunk headers."""
+
+    def test_read_compressed_int(self):
+        """Test that integers are read 7 bits per byte with the last byte marked."""
+        self.assertEqual(read_compressed_int(b'\x85', 0), (5, 1))
+        self.assertEqual(read_compressed_int(b'\x00\x2c\x82', 1), (300, 3))
+        with self.assertRaises(ValueError):
+            read_compressed_int(b'\x2c\x02', 0)
+
+    def test_parse_header(self):
+        """Test that the header and the index of chunks are parsed."""
+        with open(ZCK_V2, 'rb') as zck_file:
+            header = ZchunkHeader.from_file(zck_file)
+        self.assertEqual(header.size, ZCK_V2_HEADER_SIZE)
+        self.assertEqual(header.checksum, ZCK_V2_HEADER_CHECKSUM)
+        self.assertEqual(header.file_size, os.path.getsize(ZCK_V2))
+        # the xml header, 29 packages and the closing tag
+        self.assertEqual(len(header.chunks), 31)
+        self.assertTrue(header.dict_chunk.length)
+        self.assertEqual(header.chunks[0].start, header.dict_chunk.start + header.dict_chunk.length)
+
+    def test_invalid_header(self):
+        """Test that a truncated, corrupted or foreign file is refused."""
+        with open(ZCK_V2, 'rb') as zck_file:
+            data = zck_file.read()
+        with self.assertRaises(ValueError):
+            ZchunkHeader(data[:ZCK_V2_HEADER_SIZE - 1])
+        corrupted = bytearray(data)
+        corrupted[ZCK_V2_HEADER_SIZE - 20] ^= 0xff
+        with self.assertRaises(ValueError):
+            ZchunkHeader(bytes(corrupted))
+        with self.assertRaises(ValueError):
+            ZchunkHeader(b'<?xml version="1.0" encoding="UTF-8"?>')
+
+    def test_missing_ranges(self):
+        """Test that only the changed chunks of a new version are missing."""
+        with open(ZCK_V1, 'rb') as previous_file, open(ZCK_V2, 'rb') as zck_file:
+            header = ZchunkHeader.from_file(zck_file)
+            reusable_chunks = read_reusable_chunks(previous_file, header.chunk_checksum_type)
+        ranges = missing_ranges(header, reusable_chunks)
+        missing_size = sum(end - start + 1 for start, end in ranges)
+
+        # the updated and the added package
+        self.assertEqual(len(ranges), 2)
+        self.assertLess(missing_size, (header.file_size - header.size) / 4)
+        self.assertEqual(missing_ranges(header, {}), [(header.size, header.file_size - 1)])
+
+
+class TestZchunkDownload(TestCase):
+    """Test that zchunk files are put together from a previous version and downloaded ranges."""
+
+    def setUp(self):
+        """Work in a temporary directory."""
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def download(self, remote, record, previous_path=None):
+        """Download the second fixture with the remote."""
+        download = asyncio.get_event_loop().run_until_complete
+        if not previous_path:
+            return download(download_zchunk(remote, 'primary.xml.zck', record))
+        with open(previous_path, 'rb') as previous_file:
+            return download(download_zchunk(remote, 'primary.xml.zck', record, previous_file))
+
+    def assert_file_sha256(self, path, sha256):
+        """Assert the sha256 checksum of a file."""
+        with open(path, 'rb') as checked_file:
+            self.assertEqual(hashlib.sha256(checked_file.read()).hexdigest(), sha256)
+
+    def test_download_with_previous_version(self):
+        """Test that only the changed chunks are downloaded and the file is identical."""
+        remote = RangeRemote(ZCK_V2)
+        zck_path = self.download(remote, repomd_record(), ZCK_V1)
+
+        self.assert_file_sha256(zck_path, ZCK_V2_SHA256)
+        self.assertEqual(remote.requested_ranges[0], (0, ZCK_V2_HEADER_SIZE - 1))
+        self.assertEqual(len(remote.requested_ranges), 3)
+
+    def test_download_without_previous_version(self):
+        """Test that the whole file is downloaded when there is no previous version."""
+        remote = RangeRemote(ZCK_V2)
+        zck_path = self.download(remote, repomd_record())
+
+        self.assert_file_sha256(zck_path, ZCK_V2_SHA256)
+        self.assertEqual(remote.requested_ranges, [
+            (0, ZCK_V2_HEADER_SIZE - 1), (ZCK_V2_HEADER_SIZE, os.path.getsize(ZCK_V2) - 1)
+        ])
+
+    def test_download_mismatch(self):
+        """Test that a file which doesn't match repomd.xml is refused."""
+        with self.assertRaises(ValueError):
+            self.download(RangeRemote(ZCK_V2), repomd_record(checksum_header='0' * 64), ZCK_V1)
+        with self.assertRaises(ValueError):
+            self.download(RangeRemote(ZCK_V2), repomd_record(checksum='0' * 64), ZCK_V1)
+        with self.assertRaises(ValueError):
+            self.download(RangeRemote(ZCK_V2), repomd_record(size_header=None))
+
+    def test_decompress(self):
+        """Test that the decompressed file is the primary metadata."""
+        path = decompress_zchunk(ZCK_V2, repomd_record())
+
+        self.assert_file_sha256(path, ZCK_V2_OPEN_SHA256)
+        with open(path, 'rb') as xml_file:
+            xml = xml_file.read()
+        self.assertTrue(xml.startswith(b'<?xml version="1.0" encoding="UTF-8"?>'))
+        self.assertTrue(xml.endswith(b'</metadata>\n'))
+        self.assertEqual(xml.count(b'<package type="rpm">'), 29)
+        with self.assertRaises(ValueError):
+            decompress_zchunk(ZCK_V2, repomd_record(checksum_open='0' * 64))